@@ -1,29 +1,60 @@
-from flask import Flask, request, jsonify, render_template, Response
-import pickle
-import numpy as np
+from flask import Flask, request, jsonify, render_template, Response, send_file, url_for
 from urllib.parse import urlparse
 import os
 from flask_cors import CORS
 import logging
-from feature_extractor import extract_url_features
+import json
+import time
+from feature_extractor import extract_url_features, extract_url_features_many
+from model_registry import (ModelRegistry, IncompatibleModel, DEFAULT_REGISTRY_DIR, LEGACY_MODEL_PATHS,
+                            import_legacy_model, read_active, list_versions, read_manifest)
+from verdict_cache import VerdictCache, normalize_url
+from domain_index import DomainIndex, BLOCKED, ALLOWED
+from domain_filter import FilterPublisher
+from db import ConnectionPool, DB_CONFIG
+from blob_store import BlobStore, DEFAULT_SCREENSHOT_DIR
+from report_queries import parse_report_filters, fetch_reports_page, REPORT_STATUSES
+from report_queue import ReportQueue, QueueFull
+from scorer import MIN_CONFIDENCE
+from micro_batcher import MicroBatcher
+from log_config import configure_logging, sample_request, log_stats
+from metrics import REGISTRY, SharedMetrics, StatsGauges, CONTENT_TYPE as METRICS_CONTENT_TYPE, timed
 import mysql.connector
 from mysql.connector import Error
 import base64
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, 
-                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# Configure logging (level, format and sampling come from the environment)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Per-stage latencies and verdict counters, exposed at /metrics. Hot-path
+# children are looked up here once so recording is a single cheap call
+STAGE_SECONDS = REGISTRY.histogram(
+    'phishing_api_stage_seconds', "Time spent in each step of handling a prediction", ('stage',))
+STAGE_PARSE = STAGE_SECONDS.labels('parse_request')
+STAGE_DOMAIN_INDEX = STAGE_SECONDS.labels('domain_index')
+STAGE_VERDICT_CACHE = STAGE_SECONDS.labels('verdict_cache')
+STAGE_EXTRACT = STAGE_SECONDS.labels('extract_features')
+# Scaling and the model are folded into one matrix product, timed together
+STAGE_SCORE = STAGE_SECONDS.labels('score')
+REQUEST_SECONDS = REGISTRY.histogram(
+    'phishing_api_request_seconds', "Time to answer prediction requests", ('endpoint',))
+REQUEST_PREDICT = REQUEST_SECONDS.labels('predict')
+REQUEST_PREDICT_BATCH = REQUEST_SECONDS.labels('predict_batch')
+DB_SECONDS = REGISTRY.histogram(
+    'phishing_api_db_seconds', "Time spent in database calls, including pool checkout", ('operation',))
+PREDICTIONS = REGISTRY.counter(
+    'phishing_api_predictions', "URLs answered, by verdict", ('verdict',))
+VERDICT_COUNTERS = {verdict: PREDICTIONS.labels(verdict) for verdict in ('Phishing', 'Legitimate')}
+VERDICT_ERRORS = PREDICTIONS.labels('error')
+OVERRIDES = REGISTRY.counter(
+    'phishing_api_verdict_overrides', "Verdicts not taken from the model score, by rule", ('rule',))
+OVERRIDE_LOW_CONFIDENCE = OVERRIDES.labels('low_confidence')
+OVERRIDE_ALLOWLIST = OVERRIDES.labels('allowlist')
+OVERRIDE_BLOCKLIST = OVERRIDES.labels('blocklist')
+
 # Get the current directory
 current_dir = os.path.dirname(os.path.abspath(__file__))
-# Define paths relative to the current directory
-model_path = os.path.join(current_dir, 'model.pkl')
-scaler_path = os.path.join(current_dir, 'scaler.pkl')
-
-# Also check for model in parent directory if not found in current directory
-parent_model_path = os.path.join(os.path.dirname(current_dir), 'model.pkl')
-parent_scaler_path = os.path.join(os.path.dirname(current_dir), 'scaler.pkl')
 
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev_key_only")
@@ -37,50 +68,593 @@ CORS(app, resources={
     }
 })
 
-# Database configuration
-DB_CONFIG = {
-    'host': os.environ.get('DB_HOST', 'localhost'),
-    'user': os.environ.get('DB_USER', 'root'),
-    'password': os.environ.get('DB_PASSWORD', ''),
-    'database': os.environ.get('DB_NAME', 'webpagePhishingDetector'),
-}
+# Shared connection pool used by every database call
+db_pool = ConnectionPool(
+    lambda: mysql.connector.connect(**DB_CONFIG),
+    size=int(os.environ.get('DB_POOL_SIZE', 10)),
+    timeout=float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+    ping_after=float(os.environ.get('DB_POOL_PING_AFTER', 5)),
+)
 
-# Automatically migrate screenshot column to LONGBLOB for large attachments
-try:
-    mig_conn = mysql.connector.connect(**DB_CONFIG)
-    mig_cur = mig_conn.cursor()
-    mig_cur.execute("ALTER TABLE phishing_reports MODIFY screenshot LONGBLOB")
-    mig_conn.commit()
-    logger.info("Migrated screenshot column to LONGBLOB")
-except Error as e:
-    logger.info(f"Screenshot column migration skipped: {e}")
-finally:
+# Schema changes applied automatically at startup; each one is skipped
+# (and logged) if it was already applied or the database is unreachable
+SCHEMA_MIGRATIONS = [
+    # Screenshot column to LONGBLOB for large legacy attachments
+    ("screenshot column to LONGBLOB",
+     "ALTER TABLE phishing_reports MODIFY screenshot LONGBLOB"),
+    # Screenshots now live in the blob store; rows only keep their hash
+    ("screenshot_hash column",
+     "ALTER TABLE phishing_reports ADD COLUMN screenshot_hash CHAR(64) NULL AFTER screenshot"),
+    # Indexed host of each reported URL for the admin domain filter
+    ("domain column on phishing_reports",
+     "ALTER TABLE phishing_reports ADD COLUMN domain varchar(255) GENERATED ALWAYS AS ("
+     "LEFT(REGEXP_REPLACE(REGEXP_REPLACE(REGEXP_REPLACE("
+     "LOWER(url), '^https?://(www\\\\.)?', ''), '/.*$', ''), '^[^/]*@', ''), 255)) STORED"),
+    # Composite indexes backing keyset pagination of /admin/reports
+    ("reported_at index",
+     "ALTER TABLE phishing_reports ADD KEY idx_reported_at (reported_at, id)"),
+    ("status index",
+     "ALTER TABLE phishing_reports ADD KEY idx_status_reported_at (status, reported_at, id)"),
+    ("domain index",
+     "ALTER TABLE phishing_reports ADD KEY idx_domain_reported_at (domain, reported_at, id)"),
+    # One row per normalized URL, keyed by its SHA-256; duplicate reports
+    # increment report_count. Rows from before this are keyed by
+    # migrate_url_hashes.py, which also merges their duplicates
+    ("url_hash column on phishing_reports",
+     "ALTER TABLE phishing_reports ADD COLUMN normalized_url TEXT NULL AFTER url, "
+     "ADD COLUMN url_hash BINARY(32) NULL AFTER normalized_url, "
+     "ADD COLUMN report_count INT NOT NULL DEFAULT 1, "
+     "ADD COLUMN last_reported_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP AFTER reported_at, "
+     "ADD UNIQUE KEY uq_url_hash (url_hash)"),
+    # Tickets handed out by the report queue, resolved to the URL's row once written
+    ("report_tickets table",
+     "CREATE TABLE IF NOT EXISTS report_tickets (ticket CHAR(32) NOT NULL, url_hash BINARY(32) NOT NULL, "
+     "created_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (ticket))"),
+    # Counter bumped by every review status change, so each worker knows
+    # when to re-read the Blacklisted URLs
+    ("listing_version table",
+     "CREATE TABLE IF NOT EXISTS listing_version (id TINYINT NOT NULL, version BIGINT NOT NULL DEFAULT 0, "
+     "PRIMARY KEY (id))"),
+    ("listing_version row",
+     "INSERT IGNORE INTO listing_version (id, version) VALUES (1, 0)"),
+]
+
+for description, statement in SCHEMA_MIGRATIONS:
     try:
-        mig_cur.close()
-        mig_conn.close()
-    except:
-        pass
-
-# Load the pre-trained model and scaler
-try:
-    # First try to load from the API directory
+        with db_pool.connection() as mig_conn:
+            mig_cur = mig_conn.cursor()
+            mig_cur.execute(statement)
+            mig_conn.commit()
+            mig_cur.close()
+        logger.info(f"Migrated {description}")
+    except Error as e:
+        logger.info(f"Migration of {description} skipped: {e}")
+
+# Content-addressed storage for report screenshots
+screenshot_store = BlobStore(os.environ.get('SCREENSHOT_DIR', DEFAULT_SCREENSHOT_DIR))
+
+# Reports are queued and written to the database in batches by a background thread
+report_queue = ReportQueue(
+    db_pool,
+    max_size=int(os.environ.get('REPORT_QUEUE_SIZE', 10000)),
+    batch_size=int(os.environ.get('REPORT_BATCH_SIZE', 200)),
+    flush_interval=float(os.environ.get('REPORT_FLUSH_INTERVAL', 0.5)),
+    ticket_ttl=float(os.environ.get('REPORT_TICKET_TTL', 300)),
+)
+
+# Upper bound on the number of URLs accepted by /predict/batch
+MAX_BATCH_SIZE = int(os.environ.get('PREDICT_BATCH_MAX', 10000))
+
+# Opt-in coalescing of concurrent /predict calls into one model call: a URL
+# waits at most PREDICT_MICROBATCH_WAIT seconds (0 disables) for others
+PREDICT_MICROBATCH_WAIT = float(os.environ.get('PREDICT_MICROBATCH_WAIT', 0))
+PREDICT_MICROBATCH_SIZE = int(os.environ.get('PREDICT_MICROBATCH_SIZE', 32))
+# Seconds a coalesced /predict call waits for its batch before failing
+PREDICT_MICROBATCH_TIMEOUT = float(os.environ.get('PREDICT_MICROBATCH_TIMEOUT', 30))
+
+# Batch requests in these formats get NDJSON back
+NDJSON_MIMETYPES = ('application/x-ndjson', 'application/jsonl')
+
+MODEL_UNAVAILABLE = {
+    "error": "Model not available",
+    "message": "The prediction model is not available. Please contact support."
+}
+
+def load_blacklisted_urls():
+    """Return the normalized URL of every report marked Blacklisted."""
+    with timed(DB_SECONDS.labels('load_blacklist')), db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT url, normalized_url FROM phishing_reports WHERE status='Blacklisted'")
+        rows = cursor.fetchall()
+        cursor.close()
+
+    urls = []
+    for url, normalized in rows:
+        if normalized is not None:
+            urls.append(normalized)
+            continue
+        # Rows not yet keyed by migrate_url_hashes.py
+        try:
+            urls.append(normalize_url(url)[0])
+        except ValueError:
+            logger.warning(f"Skipping unparseable blacklisted URL: {url}")
+    return urls
+
+def load_listing_version():
+    """Return the counter set_report_status bumps on every status change."""
+    with timed(DB_SECONDS.labels('listing_version')), db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT version FROM listing_version WHERE id = 1")
+        row = cursor.fetchone()
+        cursor.close()
+    return row[0] if row else 0
+
+# Allowlisted/blocklisted domains and Blacklisted report URLs, checked
+# before the model; the domain files are reloaded when they change, the
+# URLs when any worker changed a report's status
+data_dir = os.path.join(current_dir, 'data')
+domain_index = DomainIndex(
+    os.environ.get('DOMAIN_ALLOWLIST', os.path.join(data_dir, 'allowlist.txt')),
+    os.environ.get('DOMAIN_BLOCKLIST', os.path.join(data_dir, 'blocklist.txt')),
+    url_source=load_blacklisted_urls,
+    version_source=load_listing_version,
+    reload_interval=float(os.environ.get('DOMAIN_INDEX_RELOAD_INTERVAL', 30)),
+)
+
+# Bloom filter snapshots of the domain index, so clients can answer listed
+# URLs without calling /predict. A false positive in the allowed filter
+# skips the model, hence its much lower rate
+domain_filters = FilterPublisher(
+    domain_index,
+    blocked_fp_rate=float(os.environ.get('DOMAIN_FILTER_BLOCKED_FP_RATE', 1e-3)),
+    allowed_fp_rate=float(os.environ.get('DOMAIN_FILTER_ALLOWED_FP_RATE', 1e-6)),
+    history=int(os.environ.get('DOMAIN_FILTER_HISTORY', 16)),
+)
+
+# Domain filter snapshots and deltas are served as raw bytes, versioned by this header
+FILTER_MIMETYPE = 'application/octet-stream'
+FILTER_VERSION_HEADER = 'X-Filter-Version'
+
+# Verdicts for recently checked URLs, keyed by normalized URL
+verdict_cache = VerdictCache(
+    max_size=int(os.environ.get('VERDICT_CACHE_SIZE', 100000)),
+    ttl=float(os.environ.get('VERDICT_CACHE_TTL', 600)),
+)
+
+# Versioned models; a new active version is picked up without a restart
+model_registry_dir = os.environ.get('MODEL_REGISTRY_DIR', DEFAULT_REGISTRY_DIR)
+if read_active(model_registry_dir) is None:
+    # First start with a registry: adopt the loose model.pkl/scaler.pkl
+    for legacy_model_path, legacy_scaler_path in LEGACY_MODEL_PATHS:
+        try:
+            if import_legacy_model(model_registry_dir, legacy_model_path, legacy_scaler_path):
+                break
+        except Exception as e:
+            logger.error(f"Could not import {legacy_model_path} into the model registry: {e}")
+model_registry = ModelRegistry(
+    model_registry_dir,
+    poll_interval=float(os.environ.get('MODEL_REGISTRY_POLL_INTERVAL', 5)),
+    # Cached verdicts came from the replaced model
+    on_swap=verdict_cache.clear,
+)
+
+def apply_verdict_overrides(url, result, confidence):
+    """
+    Apply the confidence threshold override to a model verdict.
+
+    Args:
+        url (str): URL that was checked
+        result (str): Model verdict ('Phishing' or 'Legitimate')
+        confidence (float): Probability of the verdict
+
+    Returns:
+        tuple: (result, confidence) after overrides
+    """
+    # Override the result if confidence is below threshold (lowered from 0.9 to 0.7)
+    # This helps reduce false positives for legitimate sites
+    if confidence < MIN_CONFIDENCE:
+        result = "Phishing"
+        OVERRIDE_LOW_CONFIDENCE.inc()
+        logger.debug("Confidence below %s, flagging as Phishing: %s", MIN_CONFIDENCE, url)
+
+    return result, confidence
+
+def listed_verdict(url, host, cache_key):
+    """
+    Look a URL up in the domain index before running the model.
+
+    Args:
+        url (str): URL that was checked
+        host (str): Lowercase host of the URL
+        cache_key (str): Normalized URL
+
+    Returns:
+        tuple or None: (result, confidence) if the URL is listed
+    """
+    listing = domain_index.lookup(host, cache_key)
+    if listing == BLOCKED:
+        OVERRIDE_BLOCKLIST.inc()
+        logger.debug("Blocklisted URL or domain: %s", url)
+        return "Phishing", 1.0
+    if listing == ALLOWED:
+        OVERRIDE_ALLOWLIST.inc()
+        logger.debug("Allowlisted domain: %s", url)
+        return "Legitimate", 1.0
+    return None
+
+def parse_batch_body(mimetype, body):
+    """
+    Read the list of URLs from a /predict/batch request body.
+
+    Accepts a JSON array, a JSON object with a 'urls' array, or NDJSON with one
+    URL (or {"url": ...} object) per line.
+
+    Args:
+        mimetype (str): Content type of the request
+        body (str): Request body
+
+    Returns:
+        list: Submitted items, not yet validated
+
+    Raises:
+        ValueError: If the body is not one of the accepted shapes
+    """
+    if mimetype in NDJSON_MIMETYPES:
+        items = []
+        for line in body.splitlines():
+            line = line.strip()
+            if line:
+                try:
+                    items.append(json.loads(line))
+                except ValueError:
+                    items.append(None)
+        return items
+
     try:
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
-        with open(scaler_path, 'rb') as f:
-            scaler = pickle.load(f)
-        logger.info("Model and scaler loaded successfully from API directory!")
-    except FileNotFoundError:
-        # If not found, try to load from parent directory
-        with open(parent_model_path, 'rb') as f:
-            model = pickle.load(f)
-        with open(parent_scaler_path, 'rb') as f:
-            scaler = pickle.load(f)
-        logger.info("Model and scaler loaded successfully from parent directory!")
-except Exception as e:
-    logger.error(f"Error loading model or scaler: {e}")
-    model = None
-    scaler = None
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        data = data.get('urls')
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON array of URLs or an object with a 'urls' array")
+    return data
+
+def check_url(url):
+    """
+    Validate a URL and look for a verdict that does not need the model.
+
+    Args:
+        url (str): URL to check
+
+    Returns:
+        tuple: (domain, cache_key, host, verdict); verdict is a (result,
+        confidence) pair for listed and cached URLs, else None
+
+    Raises:
+        ValueError: If the URL has no domain or cannot be normalized
+    """
+    domain = urlparse(url).netloc
+    if not domain:
+        raise ValueError("Invalid URL")
+    cache_key, host = normalize_url(url)
+    # Listed domains skip the model; repeated URLs come from the cache
+    start = time.perf_counter()
+    verdict = listed_verdict(url, host, cache_key)
+    listed = time.perf_counter()
+    STAGE_DOMAIN_INDEX.observe(listed - start)
+    if verdict is None:
+        verdict = verdict_cache.get(cache_key)
+        STAGE_VERDICT_CACHE.observe(time.perf_counter() - listed)
+    return domain, cache_key, host, verdict
+
+def score_urls(entries):
+    """
+    Run the model over URLs without a known verdict and cache the verdicts.
+
+    Args:
+        entries (list): (url, domain, cache_key, host) of each URL
+
+    Returns:
+        list or None: (result, confidence) of each URL, or None if no model
+        is loaded
+    """
+    scorer = model_registry.scorer
+    if scorer is None:
+        logger.error("Model or scaler not loaded. Cannot make prediction.")
+        return None
+
+    # Extract features, then scale and score them in one step
+    start = time.perf_counter()
+    if len(entries) == 1:
+        url_features = extract_url_features(entries[0][0], entries[0][1])
+    else:
+        url_features = extract_url_features_many(
+            [entry[0] for entry in entries], [entry[1] for entry in entries])
+    extracted = time.perf_counter()
+    prediction, confidence = scorer.predict(url_features)
+    STAGE_EXTRACT.observe(extracted - start)
+    STAGE_SCORE.observe(time.perf_counter() - extracted)
+
+    verdicts = []
+    for (url, _, cache_key, host), label, conf in zip(entries, prediction, confidence):
+        # Determine the result based on the prediction
+        result = "Legitimate" if label == 1 else "Phishing"
+        result, conf = apply_verdict_overrides(url, result, float(conf))
+        verdict_cache.put(cache_key, (result, conf), host)
+        verdicts.append((result, conf))
+    return verdicts
+
+def _score_coalesced(entries):
+    """score_urls for the micro-batcher, which needs one result per URL."""
+    verdicts = score_urls(entries)
+    return verdicts if verdicts is not None else [None] * len(entries)
+
+micro_batcher = None
+if PREDICT_MICROBATCH_WAIT > 0:
+    micro_batcher = MicroBatcher(_score_coalesced, max_batch_size=PREDICT_MICROBATCH_SIZE,
+                                 max_wait=PREDICT_MICROBATCH_WAIT, name='predict-batcher',
+                                 result_timeout=PREDICT_MICROBATCH_TIMEOUT,
+                                 metric_prefix='phishing_api_microbatch')
+    REGISTRY.register(micro_batcher.batch_sizes)
+    REGISTRY.register(micro_batcher.queue_delays)
+
+def score_url(url, domain, cache_key, host):
+    """
+    Run the model over one URL, batched with concurrent requests if enabled.
+
+    Returns:
+        tuple or None: (result, confidence), or None if no model is loaded
+    """
+    if micro_batcher is not None:
+        return micro_batcher((url, domain, cache_key, host))
+    verdicts = score_urls([(url, domain, cache_key, host)])
+    return verdicts[0] if verdicts is not None else None
+
+def check_batch(items):
+    """
+    Validate a batch and fill in the verdicts that do not need the model.
+
+    Args:
+        items (list): Submitted items, URLs or {"url": ...} objects
+
+    Returns:
+        tuple: (results, pending); results holds a response entry per item,
+        None where the model is still needed, and pending the (index, url,
+        domain, cache_key, host) of those items
+    """
+    # Validate every URL, keeping per-URL errors inline
+    results = [None] * len(items)
+    pending = []
+    for i, item in enumerate(items):
+        url = item.get('url') if isinstance(item, dict) else item
+        if not isinstance(url, str):
+            results[i] = {"url": url, "error": "Missing 'url'"}
+            continue
+        try:
+            domain, cache_key, host, verdict = check_url(url)
+        except ValueError:
+            results[i] = {"url": url, "error": "Invalid URL"}
+            continue
+        if verdict is not None:
+            result, confidence = verdict
+            results[i] = {"result": result, "confidence": confidence, "url": url}
+            continue
+        pending.append((i, url, domain, cache_key, host))
+    return results, pending
+
+def score_batch(results, pending):
+    """
+    Score the pending items of a batch with one model call.
+
+    Args:
+        results (list): Response entries from check_batch, filled in place
+        pending (list): Pending items from check_batch
+
+    Returns:
+        bool: False if no model is loaded
+    """
+    if not pending:
+        return True
+    # One feature matrix and a single scaler/model call for the whole batch
+    verdicts = score_urls([entry[1:] for entry in pending])
+    if verdicts is None:
+        return False
+    for (i, url, _, _, _), (result, confidence) in zip(pending, verdicts):
+        results[i] = {"result": result, "confidence": confidence, "url": url}
+    return True
+
+def store_screenshot(upload=None, encoded=None):
+    """
+    Store a report's screenshot in the blob store.
+
+    Args:
+        upload (FileStorage, optional): Multipart upload of the image
+        encoded (str, optional): Base64 image from a JSON body
+
+    Returns:
+        str or None: Hash of the stored screenshot, None if there was none
+
+    Raises:
+        ValueError: If the base64 data is invalid
+        OSError: If the blob store cannot be written
+    """
+    if upload is not None and upload.filename:
+        return screenshot_store.put_stream(upload.stream)[0]
+    if encoded:
+        return screenshot_store.put_bytes(base64.b64decode(encoded, validate=True))[0]
+    return None
+
+def find_screenshot(rid):
+    """
+    Locate the screenshot of a report.
+
+    Args:
+        rid (int): Report id
+
+    Returns:
+        tuple or None: (screenshot_hash, legacy_blob) of the report, None if
+        there is no such report
+    """
+    with timed(DB_SECONDS.labels('screenshot_lookup')), db_pool.connection() as conn:
+        cursor = conn.cursor()
+        # Only rows not yet moved to the blob store still carry the image inline
+        cursor.execute(
+            "SELECT screenshot_hash, IF(screenshot_hash IS NULL, screenshot, NULL) "
+            "FROM phishing_reports WHERE id=%s",
+            (rid,)
+        )
+        row = cursor.fetchone()
+        cursor.close()
+    return row
+
+def set_report_status(rid, status):
+    """
+    Change a report's review status and update the verdicts that depend on it.
+
+    Args:
+        rid (int): Report id
+        status (str): New status, one of REPORT_STATUSES
+
+    Raises:
+        mysql.connector.Error: If the database update fails
+    """
+    with timed(DB_SECONDS.labels('status_update')), db_pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE phishing_reports SET status=%s WHERE id=%s",
+            (status, rid)
+        )
+        # Tells the other workers to reload their blocked URLs and cached verdicts
+        cursor.execute("UPDATE listing_version SET version = version + 1 WHERE id = 1")
+        conn.commit()
+
+        cursor.execute("SELECT url FROM phishing_reports WHERE id=%s", (rid,))
+        row = cursor.fetchone()
+        cursor.close()
+
+    if row:
+        cache_key, host = normalize_url(row[0])
+        # Blacklisted URLs are answered by the domain index from now on
+        if status == 'Blacklisted':
+            domain_index.block_url(cache_key)
+        else:
+            domain_index.unblock_url(cache_key)
+        # Reviewed reports change what we know about the URL's domain, so
+        # drop any cached verdicts for it
+        if status in ('Verified', 'Blacklisted'):
+            dropped = verdict_cache.invalidate_host(host)
+            logger.info(f"Invalidated {dropped} cached verdicts for {host}")
+
+def fetch_reports(filters):
+    """
+    Fetch one page of reports for the admin views.
+
+    Args:
+        filters (dict): Parsed filters from parse_report_filters
+
+    Returns:
+        tuple: (reports, next_cursor)
+    """
+    with timed(DB_SECONDS.labels('reports_page')), db_pool.connection() as conn:
+        return fetch_reports_page(conn, filters)
+
+def report_ticket(ticket):
+    """
+    Look up a queued report by its ticket.
+
+    Returns:
+        dict or None: ReportQueue.status of the ticket
+    """
+    with timed(DB_SECONDS.labels('ticket_lookup')):
+        return report_queue.status(ticket)
+
+def count_verdicts(results):
+    """Count /predict/batch response entries by verdict."""
+    for entry in results:
+        counter = VERDICT_COUNTERS.get(entry.get('result'))
+        (counter or VERDICT_ERRORS).inc()
+
+def list_model_versions():
+    """Manifests of every published model version, oldest first."""
+    versions = []
+    for version in list_versions(model_registry_dir):
+        try:
+            versions.append(read_manifest(model_registry_dir, version))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Unreadable manifest for model {version}: {e}")
+    return versions
+
+def refresh_domain_index():
+    """
+    Pick up domain list and report status changes, including other workers'.
+
+    Verdicts this worker cached may depend on a change made elsewhere (see
+    set_report_status), so they are dropped whenever the index reloads.
+    """
+    if domain_index.maybe_reload():
+        verdict_cache.clear()
+
+def watch_domain_index():
+    """
+    Keep the domain index current from a background thread in this process.
+
+    Request handlers call this instead of refresh_domain_index, so a slow or
+    unreachable database delays the next reload rather than the request.
+    """
+    domain_index.watch(on_reload=verdict_cache.clear)
+
+def current_domain_filter():
+    """Snapshot of the domain index as Bloom filters, rebuilt if the lists changed."""
+    watch_domain_index()
+    return domain_filters.current()
+
+def diff_domain_filter(since):
+    """
+    Changes to the domain filter since a version a client has.
+
+    Args:
+        since (str): Version the client has
+
+    Returns:
+        tuple: (current snapshot, delta bytes, or None if the client is up to
+        date or must download the whole snapshot)
+    """
+    snapshot = current_domain_filter()
+    if since == snapshot.version:
+        return snapshot, None
+    return domain_filters.delta(since)
+
+def runtime_stats():
+    """Statistics of the caches, pools and queues behind the API."""
+    return {
+        'verdict_cache': verdict_cache.stats(),
+        'domain_index': domain_index.stats(),
+        'domain_filter': domain_filters.stats(),
+        'db_pool': db_pool.stats(),
+        'report_queue': report_queue.stats(),
+        'model': model_registry.stats(),
+        'micro_batcher': micro_batcher.stats() if micro_batcher is not None else None,
+        'logging': log_stats(),
+    }
+
+# Cache, pool, queue and model statistics, read at scrape time
+REGISTRY.register(StatsGauges('phishing_api', runtime_stats))
+
+# Directory the worker processes of serve.py share so /metrics reports the
+# whole server, whichever worker answers; unset, each process reports its own
+METRICS_DIR = os.environ.get('METRICS_DIR')
+shared_metrics = None
+if METRICS_DIR:
+    shared_metrics = SharedMetrics(REGISTRY, METRICS_DIR, float(os.environ.get('METRICS_WRITE_INTERVAL', 1)))
+
+def render_metrics():
+    """Prometheus text for /metrics: every worker's totals with METRICS_DIR set, else this process's."""
+    if shared_metrics is None:
+        return REGISTRY.render()
+    # Normally started when the worker starts; this covers servers that do not
+    shared_metrics.start()
+    return shared_metrics.render()
 
 @app.route('/', methods=['GET'])
 def index():
@@ -92,129 +666,174 @@ def predict():
         response = app.make_default_options_response()
         return response
 
+    start = time.perf_counter()
     try:
-        logger.debug("Received request headers: %s", request.headers)
-        logger.debug("Received request data: %s", request.get_data())
-        
         # Get the URL from the POST request
         data = request.get_json()
-        logger.debug("Parsed JSON data: %s", data)
+        STAGE_PARSE.observe(time.perf_counter() - start)
         
         if not data or 'url' not in data:
             logger.warning("Missing 'url' in request body")
+            VERDICT_ERRORS.inc()
             return jsonify({"error": "Missing 'url' in request body"}), 400
             
         url = data['url']
-        logger.debug(f"Received URL for analysis: {url}")
         
-        domain = urlparse(url).netloc
+        watch_domain_index()
+        model_registry.maybe_reload()
         
         # Handle invalid URLs
-        if not domain:
+        try:
+            domain, cache_key, host, verdict = check_url(url)
+        except ValueError:
             logger.warning(f"Invalid URL: {url}")
+            VERDICT_ERRORS.inc()
             return jsonify({"error": "Invalid URL"}), 400
-        
-        # For demonstration, if model failed to load
-        if model is None or scaler is None:
-            logger.error("Model or scaler not loaded. Cannot make prediction.")
-            return jsonify({
-                "error": "Model not available", 
-                "message": "The prediction model is not available. Please contact support."
-            }), 500
-        
-        # Extract features and scale them
-        url_features = extract_url_features(url, domain)
-        
-        try:
-            # Try to scale features
-            scaled_features = scaler.transform(url_features)
-        except ValueError as e:
-            logger.error(f"Feature mismatch error: {e}")
-            
-            # Get the expected number of features from the error message
-            import re
-            match = re.search(r'X has (\d+) features, but StandardScaler is expecting (\d+) features', str(e))
-            
-            if match:
-                current_features, expected_features = int(match.group(1)), int(match.group(2))
-                logger.warning(f"Adjusting features from {current_features} to {expected_features}")
-                
-                # If we have more features than expected, truncate
-                if current_features > expected_features:
-                    url_features = url_features[:, :expected_features]
-                    scaled_features = scaler.transform(url_features)
-                # If we have fewer features than expected, pad with zeros
-                else:
-                    padding = np.zeros((url_features.shape[0], expected_features - current_features))
-                    url_features_padded = np.hstack((url_features, padding))
-                    scaled_features = scaler.transform(url_features_padded)
-            else:
-                # If we can't parse the error, return an error response
-                return jsonify({"error": "Feature mismatch", "message": str(e)}), 500
-        
-        # Make the prediction
-        prediction = model.predict(scaled_features)
-        
-        # Get prediction probability if available
-        confidence = 0.95  # Default high confidence
-        if hasattr(model, 'predict_proba'):
-            try:
-                proba = model.predict_proba(scaled_features)
-                # Get the probability of the predicted class
-                confidence = float(proba[0][int(prediction[0])])
-            except Exception as e:
-                logger.warning(f"Could not get prediction probability: {e}")
-        
-        # Determine the result based on the prediction
-        result = "Legitimate" if prediction[0] == 1 else "Phishing"
-        
-        # Override the result if confidence is below threshold (lowered from 0.9 to 0.7)
-        # This helps reduce false positives for legitimate sites
-        if confidence < 0.7:
-            result = "Phishing"
-            logger.info(f"Confidence below 0.7, flagging as Phishing: {url}")
-        
-        # Special handling for known legitimate domains
-        known_legitimate_domains = [
-            "google.com", "scholar.google.com", "nike.com", "www.nike.com",
-            "microsoft.com", "github.com", "amazon.com", "apple.com",
-            "facebook.com", "twitter.com", "linkedin.com", "youtube.com"
-        ]
-        
-        # Check if the domain or any parent domain is in our known legitimate list
-        is_known_legitimate = False
-        parsed_url = urlparse(url)
-        current_domain = parsed_url.netloc
-        
-        # Remove www. prefix if present
-        if current_domain.startswith('www.'):
-            current_domain = current_domain[4:]
-            
-        # Check if the domain or any parent domain is in our known legitimate list
-        for known_domain in known_legitimate_domains:
-            if current_domain == known_domain or current_domain.endswith('.' + known_domain):
-                is_known_legitimate = True
-                break
-                
-        # Override result for known legitimate domains
-        if is_known_legitimate and result == "Phishing":
-            result = "Legitimate"
-            confidence = max(confidence, 0.95)  # Ensure high confidence for known legitimate sites
-            logger.info(f"Overriding prediction for known legitimate domain: {url}")
+
+        if verdict is None:
+            verdict = score_url(url, domain, cache_key, host)
+            if verdict is None:
+                VERDICT_ERRORS.inc()
+                return jsonify(MODEL_UNAVAILABLE), 500
+        result, confidence = verdict
+        VERDICT_COUNTERS[result].inc()
         
         response_data = {
             "result": result,
             "confidence": confidence,
             "url": url
         }
-        logger.info(f"Prediction for {url}: {result} with confidence {confidence:.2f}")
-        logger.debug(f"Sending response: {response_data}")
+        if sample_request():
+            logger.info("Prediction for %s: %s with confidence %.2f", url, result, confidence,
+                        extra={'url': url, 'verdict': result, 'confidence': confidence})
         
         return jsonify(response_data)
     
     except Exception as e:
         logger.error(f"Error in prediction: {e}", exc_info=True)
+        VERDICT_ERRORS.inc()
         return jsonify({"error": str(e)}), 500
+    finally:
+        REQUEST_PREDICT.observe(time.perf_counter() - start)
+
+@app.route('/predict/batch', methods=['POST', 'OPTIONS'])
+def predict_batch():
+    if request.method == 'OPTIONS':
+        return app.make_default_options_response()
+
+    start = time.perf_counter()
+    try:
+        try:
+            items = parse_batch_body(request.mimetype, request.get_data(as_text=True))
+        except ValueError as e:
+            logger.warning(f"Invalid batch request: {e}")
+            return jsonify({"error": str(e)}), 400
+        STAGE_PARSE.observe(time.perf_counter() - start)
+
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({"error": f"Batch too large (max {MAX_BATCH_SIZE} URLs)"}), 413
+
+        watch_domain_index()
+        model_registry.maybe_reload()
+
+        results, pending = check_batch(items)
+        try:
+            if not score_batch(results, pending):
+                return jsonify(MODEL_UNAVAILABLE), 500
+        except Exception as e:
+            logger.error(f"Error in batch prediction: {e}", exc_info=True)
+            return jsonify({"error": str(e)}), 500
+
+        count_verdicts(results)
+        logger.info(f"Batch prediction for {len(items)} URLs ({len(pending)} scored by the model)")
+
+        if request.mimetype in NDJSON_MIMETYPES:
+            body = ''.join(json.dumps(r) + '\n' for r in results)
+            return Response(body, mimetype='application/x-ndjson')
+        return jsonify({"results": results})
+    finally:
+        REQUEST_PREDICT_BATCH.observe(time.perf_counter() - start)
+
+# Runtime statistics
+@app.route('/stats', methods=['GET'])
+def stats():
+    return jsonify(runtime_stats())
+
+# Prometheus metrics of this process, or of every worker with METRICS_DIR set
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+# Reload the allowlist/blocklist files and Blacklisted report URLs
+@app.route('/admin/domains/reload', methods=['POST'])
+def reload_domain_index():
+    domain_index.reload()
+    # Listings may have changed any domain's verdict
+    verdict_cache.clear()
+    return jsonify(domain_index.stats())
+
+# Bloom filters of the listed domains and URLs, for checks without a round trip
+@app.route('/filters/domains', methods=['GET'])
+def domain_filter():
+    snapshot = current_domain_filter()
+    if snapshot.version in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(snapshot.data, mimetype=FILTER_MIMETYPE)
+    response.set_etag(snapshot.version)
+    response.headers[FILTER_VERSION_HEADER] = snapshot.version
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Changes since the version a client has; 404 means fetch the whole filter
+@app.route('/filters/domains/delta', methods=['GET'])
+def domain_filter_delta():
+    since = request.args.get('since', '')
+    snapshot, delta = diff_domain_filter(since)
+    if since == snapshot.version:
+        response = Response(status=304)
+    elif delta is None:
+        response = jsonify({'error': 'Unknown or outdated base version', 'version': snapshot.version,
+                            'filter_url': url_for('domain_filter')})
+        response.status_code = 404
+    else:
+        response = Response(delta, mimetype=FILTER_MIMETYPE)
+    response.headers[FILTER_VERSION_HEADER] = snapshot.version
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Published model versions and the one being served
+@app.route('/admin/models', methods=['GET'])
+def list_models():
+    return jsonify({'serving': model_registry.stats(), 'versions': list_model_versions()})
+
+# Load the version the registry's active pointer names
+@app.route('/admin/models/reload', methods=['POST'])
+def reload_model():
+    model_registry.reload()
+    return jsonify(model_registry.stats())
+
+# Switch to a published version
+@app.route('/admin/models/activate', methods=['POST'])
+def activate_model():
+    data = request.get_json(silent=True) or {}
+    version = data.get('version')
+    if not version or version not in list_versions(model_registry_dir):
+        return jsonify({'error': f"Unknown model version: {version}"}), 404
+    try:
+        model_registry.activate(version)
+    except (IncompatibleModel, ValueError) as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(model_registry.stats())
+
+# Go back to the previously served version
+@app.route('/admin/models/rollback', methods=['POST'])
+def rollback_model():
+    try:
+        model_registry.rollback()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(model_registry.stats())
 
 # Reporting endpoint
 @app.route('/report', methods=['POST', 'OPTIONS'])
@@ -223,49 +842,72 @@ def report():
         response = app.make_default_options_response()
         return response
 
-    data = request.get_json()
+    # Multipart uploads carry the screenshot as raw bytes, JSON bodies as base64
+    upload = None
+    if request.mimetype == 'multipart/form-data':
+        data = request.form
+        upload = request.files.get('screenshot')
+    else:
+        data = request.get_json()
     if not data or 'url' not in data:
         return jsonify({'error': 'Missing url field'}), 400
 
     url = data['url']
     description = data.get('description')
-    screenshot = data.get('screenshot')
 
+    # Store the screenshot outside the table; rows only reference its hash
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        if screenshot:
-            blob = base64.b64decode(screenshot)
-            cursor.execute(
-                "INSERT INTO phishing_reports (url, description, screenshot) VALUES (%s, %s, %s)",
-                (url, description, blob)
-            )
-        else:
-            cursor.execute(
-                "INSERT INTO phishing_reports (url, description) VALUES (%s, %s)",
-                (url, description)
-            )
-        conn.commit()
-        report_id = cursor.lastrowid
-        cursor.close()
-        conn.close()
-        return jsonify({'report_id': report_id, 'status': 'Pending'}), 201
+        screenshot_hash = store_screenshot(upload, data.get('screenshot'))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid screenshot: {e}'}), 400
+    except OSError as e:
+        logger.error(f"Error storing screenshot: {e}", exc_info=True)
+        return jsonify({'error': 'Could not store screenshot'}), 500
+
+    try:
+        ticket = report_queue.submit(url, description, screenshot_hash)
+    except QueueFull as e:
+        logger.warning(f"Rejecting report for {url}: {e}")
+        response = jsonify({'error': 'Too many reports, please retry shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    # The row is written by the report queue; the ticket resolves to its id
+    response = jsonify({'ticket': ticket, 'status': 'queued',
+                        'status_url': url_for('report_ticket_status', ticket=ticket)})
+    response.headers['Location'] = url_for('report_ticket_status', ticket=ticket)
+    return response, 202
+
+# Lookup of a queued report by its ticket
+@app.route('/report/ticket/<ticket>', methods=['GET'])
+def report_ticket_status(ticket):
+    try:
+        state = report_ticket(ticket)
     except Error as e:
-        logger.error(f"Error inserting report: {e}", exc_info=True)
-        # Return actual DB error for debugging
+        logger.error(f"Error looking up report ticket {ticket}: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
+    if state is None:
+        return jsonify({'error': 'Unknown ticket'}), 404
+    return jsonify({'ticket': ticket, **state})
 
 # Screenshot retrieval endpoint
 @app.route('/report/<int:rid>/screenshot', methods=['GET'])
 def get_screenshot(rid):
-    conn = mysql.connector.connect(**DB_CONFIG)
-    cursor = conn.cursor()
-    cursor.execute("SELECT screenshot FROM phishing_reports WHERE id=%s", (rid,))
-    row = cursor.fetchone()
-    cursor.close()
-    conn.close()
-    if row and row[0]:
-        return Response(row[0], mimetype='image/png')
+    row = find_screenshot(rid)
+    if not row:
+        return '', 404
+
+    screenshot_hash, legacy_blob = row
+    if screenshot_hash:
+        path = screenshot_store.path(screenshot_hash)
+        if not os.path.exists(path):
+            logger.error(f"Screenshot {screenshot_hash} of report {rid} is missing from the store")
+            return '', 404
+        # Streams from disk with ETag, conditional GET and Range support
+        return send_file(path, mimetype='image/png', conditional=True,
+                         etag=screenshot_hash, max_age=86400)
+    if legacy_blob:
+        return Response(legacy_blob, mimetype='image/png')
     return '', 404
 
 # Update report status endpoint
@@ -276,19 +918,11 @@ def update_report_status(rid):
 
     data = request.get_json()
     status = data.get('status')
-    if status not in ['Pending', 'Verified', 'Blacklisted']:
+    if status not in REPORT_STATUSES:
         return jsonify({'error': 'Invalid status'}), 400
 
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor()
-        cursor.execute(
-            "UPDATE phishing_reports SET status=%s WHERE id=%s",
-            (status, rid)
-        )
-        conn.commit()
-        cursor.close()
-        conn.close()
+        set_report_status(rid, status)
         return jsonify({'status': status}), 200
     except Error as e:
         logger.error(f"Error updating report status: {e}", exc_info=True)
@@ -298,15 +932,33 @@ def update_report_status(rid):
 @app.route('/admin/reports', methods=['GET'])
 def admin_reports():
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute(
-            "SELECT id, url, description, reported_at, status FROM phishing_reports ORDER BY reported_at DESC"
-        )
-        reports = cursor.fetchall()
-        cursor.close()
-        conn.close()
-        return render_template('reports.html', reports=reports)
+        filters = parse_report_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        reports, next_cursor = fetch_reports(filters)
+        # Keep the filters (but not the position) when linking to other pages
+        page_args = {k: v for k, v in request.args.items() if k != 'cursor'}
+        return render_template('reports.html', reports=reports, next_cursor=next_cursor,
+                               page_args=page_args, statuses=REPORT_STATUSES)
+    except Error as e:
+        logger.error(f"Error fetching reports: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+# Admin reports as JSON, for tooling
+@app.route('/admin/reports.json', methods=['GET'])
+def admin_reports_json():
+    try:
+        filters = parse_report_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        reports, next_cursor = fetch_reports(filters)
+        for r in reports:
+            r['reported_at'] = r['reported_at'].isoformat() if r['reported_at'] else None
+        return jsonify({'reports': reports, 'next_cursor': next_cursor})
     except Error as e:
         logger.error(f"Error fetching reports: {e}", exc_info=True)
         return jsonify({'error': str(e)}), 500
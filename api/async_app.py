@@ -0,0 +1,465 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, request, jsonify, render_template, Response, send_file, url_for
+from quart_cors import cors
+from mysql.connector import Error
+
+# The model, caches, domain index, DB pool and report queue are shared with
+# the Flask app, as are the request handling steps built on them
+import app as core
+from model_registry import IncompatibleModel
+from report_queries import parse_report_filters, REPORT_STATUSES
+from report_queue import QueueFull
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+logger = logging.getLogger(__name__)
+
+# Concurrent feature extraction/inference calls, and how many more may wait for one
+PREDICT_CONCURRENCY = int(os.environ.get('PREDICT_CONCURRENCY', os.cpu_count() or 1))
+PREDICT_BACKLOG = int(os.environ.get('PREDICT_BACKLOG', 64))
+# Concurrent database and disk calls for reports and admin requests
+ADMIN_CONCURRENCY = int(os.environ.get('ADMIN_CONCURRENCY', core.db_pool.size))
+ADMIN_BACKLOG = int(os.environ.get('ADMIN_BACKLOG', 256))
+# Seconds between checks for changed domain lists and model versions
+RELOAD_CHECK_INTERVAL = float(os.environ.get('RELOAD_CHECK_INTERVAL', 1))
+
+class Busy(Exception):
+    """Raised when a lane's workers and backlog are all taken."""
+
+class Lane:
+    """
+    Bounded thread pool for one class of blocking work.
+
+    At most `workers` calls run at once and at most `backlog` more wait for a
+    worker; further calls are rejected with Busy instead of queueing without
+    limit. Prediction and report/admin requests each get their own lane, so a
+    burst of one cannot delay the other.
+    """
+
+    def __init__(self, name, workers, backlog):
+        """
+        Args:
+            name (str): Lane name, used for thread names and stats
+            workers (int): Maximum number of concurrent calls
+            backlog (int): Maximum number of calls waiting for a worker
+        """
+        self.name = name
+        self.workers = workers
+        self.backlog = backlog
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix=f"{name}-lane")
+        # Only touched from the event loop thread, so no lock is needed
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn, *args):
+        """
+        Run fn(*args) on the lane's threads and wait for the result.
+
+        Raises:
+            Busy: If the lane is full
+        """
+        with self._admit():
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def wait(self, submit, *args, timeout=None):
+        """
+        Hand work to something else (e.g. the micro-batcher) and wait for it,
+        counted against the lane's limits.
+
+        submit(*args) must return a concurrent.futures.Future. It is only
+        called once the lane has admitted the call, so rejected work is
+        never started.
+
+        Raises:
+            Busy: If the lane is full
+            asyncio.TimeoutError: If the result takes longer than timeout seconds
+        """
+        with self._admit():
+            return await asyncio.wait_for(asyncio.wrap_future(submit(*args)), timeout)
+
+    @contextlib.contextmanager
+    def _admit(self):
+        if self.in_flight >= self.workers + self.backlog:
+            self.rejected += 1
+            raise Busy(f"{self.name} lane is full ({self.in_flight} calls in flight)")
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.completed += 1
+
+    def shutdown(self):
+        """Wait for running calls to finish and stop the threads."""
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        """Return the lane's limits and counters as a dict."""
+        return {
+            'workers': self.workers,
+            'backlog': self.backlog,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+predict_lane = Lane('predict', PREDICT_CONCURRENCY, PREDICT_BACKLOG)
+admin_lane = Lane('admin', ADMIN_CONCURRENCY, ADMIN_BACKLOG)
+
+app = Quart(__name__)
+app.secret_key = core.app.secret_key
+
+# Same CORS settings as the Flask app
+app = cors(app, allow_origin="*", allow_methods=["GET", "POST", "OPTIONS"],
+           allow_headers=["Content-Type", "Authorization", "Accept"])
+
+async def _watch_for_reloads():
+    """Pick up changed domain lists and model versions off the request path."""
+    while True:
+        await asyncio.sleep(RELOAD_CHECK_INTERVAL)
+        try:
+            await admin_lane.run(core.refresh_domain_index)
+            core.model_registry.maybe_reload()
+        except Busy:
+            pass
+        except Exception as e:
+            logger.error(f"Reload check failed: {e}", exc_info=True)
+
+@app.before_serving
+async def start_background_tasks():
+    if core.shared_metrics is not None:
+        core.shared_metrics.start()
+    app.reload_watcher = asyncio.get_running_loop().create_task(_watch_for_reloads())
+
+@app.after_serving
+async def stop_background_tasks():
+    app.reload_watcher.cancel()
+    # Write reports still queued before the process goes away
+    await asyncio.get_running_loop().run_in_executor(None, core.report_queue.close)
+    predict_lane.shutdown()
+    admin_lane.shutdown()
+
+@app.errorhandler(Busy)
+async def lane_busy(e):
+    logger.warning(f"Rejecting {request.method} {request.path}: {e}")
+    response = jsonify({'error': 'Server busy, please retry shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+@app.route('/', methods=['GET'])
+async def index():
+    return await render_template('index.html')
+
+@app.route('/predict', methods=['POST'])
+async def predict():
+    start = time.perf_counter()
+    try:
+        return await _predict()
+    finally:
+        core.REQUEST_PREDICT.observe(time.perf_counter() - start)
+
+async def _predict():
+    start = time.perf_counter()
+    data = await request.get_json(silent=True)
+    core.STAGE_PARSE.observe(time.perf_counter() - start)
+    if not data or 'url' not in data:
+        logger.warning("Missing 'url' in request body")
+        core.VERDICT_ERRORS.inc()
+        return jsonify({"error": "Missing 'url' in request body"}), 400
+    url = data['url']
+
+    # Listed and cached URLs are answered without leaving the event loop
+    try:
+        domain, cache_key, host, verdict = core.check_url(url)
+    except ValueError:
+        logger.warning(f"Invalid URL: {url}")
+        core.VERDICT_ERRORS.inc()
+        return jsonify({"error": "Invalid URL"}), 400
+
+    if verdict is None:
+        entry = (url, domain, cache_key, host)
+        try:
+            if core.micro_batcher is not None:
+                # Scored on the batcher's thread together with concurrent requests
+                verdict = await predict_lane.wait(core.micro_batcher.submit, entry,
+                                                  timeout=core.micro_batcher.result_timeout)
+            else:
+                verdict = await predict_lane.run(core.score_url, *entry)
+        except Busy:
+            core.VERDICT_ERRORS.inc()
+            raise
+        except Exception as e:
+            logger.error(f"Error in prediction: {e}", exc_info=True)
+            core.VERDICT_ERRORS.inc()
+            return jsonify({"error": str(e)}), 500
+        if verdict is None:
+            core.VERDICT_ERRORS.inc()
+            return jsonify(core.MODEL_UNAVAILABLE), 500
+    result, confidence = verdict
+    core.VERDICT_COUNTERS[result].inc()
+
+    if core.sample_request():
+        logger.info("Prediction for %s: %s with confidence %.2f", url, result, confidence,
+                    extra={'url': url, 'verdict': result, 'confidence': confidence})
+    return jsonify({"result": result, "confidence": confidence, "url": url})
+
+def _classify_batch(mimetype, body):
+    """
+    Parse, check and score a /predict/batch body on a predict lane thread.
+
+    Returns:
+        tuple: (response payload, HTTP status, number of URLs scored by the model)
+    """
+    start = time.perf_counter()
+    try:
+        items = core.parse_batch_body(mimetype, body)
+    except ValueError as e:
+        logger.warning(f"Invalid batch request: {e}")
+        return {"error": str(e)}, 400, 0
+    core.STAGE_PARSE.observe(time.perf_counter() - start)
+    if len(items) > core.MAX_BATCH_SIZE:
+        return {"error": f"Batch too large (max {core.MAX_BATCH_SIZE} URLs)"}, 413, 0
+
+    results, pending = core.check_batch(items)
+    try:
+        if not core.score_batch(results, pending):
+            return core.MODEL_UNAVAILABLE, 500, 0
+    except Exception as e:
+        logger.error(f"Error in batch prediction: {e}", exc_info=True)
+        return {"error": str(e)}, 500, 0
+    core.count_verdicts(results)
+    logger.info(f"Batch prediction for {len(items)} URLs ({len(pending)} scored by the model)")
+    return results, 200, len(pending)
+
+@app.route('/predict/batch', methods=['POST'])
+async def predict_batch():
+    start = time.perf_counter()
+    try:
+        body = await request.get_data(as_text=True)
+        payload, status, _ = await predict_lane.run(_classify_batch, request.mimetype, body)
+        if status != 200:
+            return jsonify(payload), status
+
+        if request.mimetype in core.NDJSON_MIMETYPES:
+            return Response(''.join(json.dumps(r) + '\n' for r in payload), mimetype='application/x-ndjson')
+        return jsonify({"results": payload})
+    finally:
+        core.REQUEST_PREDICT_BATCH.observe(time.perf_counter() - start)
+
+# Runtime statistics
+@app.route('/stats', methods=['GET'])
+async def stats():
+    stats = core.runtime_stats()
+    stats['lanes'] = {'predict': predict_lane.stats(), 'admin': admin_lane.stats()}
+    return jsonify(stats)
+
+# Prometheus metrics of this process, or of every worker with METRICS_DIR set
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    return Response(core.render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+# Reload the allowlist/blocklist files and Blacklisted report URLs
+@app.route('/admin/domains/reload', methods=['POST'])
+async def reload_domain_index():
+    await admin_lane.run(core.domain_index.reload)
+    # Listings may have changed any domain's verdict
+    core.verdict_cache.clear()
+    return jsonify(core.domain_index.stats())
+
+# Bloom filters of the listed domains and URLs, for checks without a round trip
+@app.route('/filters/domains', methods=['GET'])
+async def domain_filter():
+    snapshot = await admin_lane.run(core.domain_filters.current)
+    if snapshot.version in request.if_none_match:
+        response = Response('', status=304)
+    else:
+        response = Response(snapshot.data, mimetype=core.FILTER_MIMETYPE)
+    response.set_etag(snapshot.version)
+    response.headers[core.FILTER_VERSION_HEADER] = snapshot.version
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Changes since the version a client has; 404 means fetch the whole filter
+@app.route('/filters/domains/delta', methods=['GET'])
+async def domain_filter_delta():
+    since = request.args.get('since', '')
+    snapshot, delta = await admin_lane.run(core.diff_domain_filter, since)
+    if since == snapshot.version:
+        response = Response('', status=304)
+    elif delta is None:
+        response = jsonify({'error': 'Unknown or outdated base version', 'version': snapshot.version,
+                            'filter_url': url_for('domain_filter')})
+        response.status_code = 404
+    else:
+        response = Response(delta, mimetype=core.FILTER_MIMETYPE)
+    response.headers[core.FILTER_VERSION_HEADER] = snapshot.version
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# Published model versions and the one being served
+@app.route('/admin/models', methods=['GET'])
+async def list_models():
+    versions = await admin_lane.run(core.list_model_versions)
+    return jsonify({'serving': core.model_registry.stats(), 'versions': versions})
+
+# Load the version the registry's active pointer names
+@app.route('/admin/models/reload', methods=['POST'])
+async def reload_model():
+    await admin_lane.run(core.model_registry.reload)
+    return jsonify(core.model_registry.stats())
+
+# Switch to a published version
+@app.route('/admin/models/activate', methods=['POST'])
+async def activate_model():
+    data = await request.get_json(silent=True) or {}
+    version = data.get('version')
+    if not version or version not in core.list_versions(core.model_registry_dir):
+        return jsonify({'error': f"Unknown model version: {version}"}), 404
+    try:
+        await admin_lane.run(core.model_registry.activate, version)
+    except (IncompatibleModel, ValueError) as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(core.model_registry.stats())
+
+# Go back to the previously served version
+@app.route('/admin/models/rollback', methods=['POST'])
+async def rollback_model():
+    try:
+        await admin_lane.run(core.model_registry.rollback)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(core.model_registry.stats())
+
+# Reporting endpoint
+@app.route('/report', methods=['POST'])
+async def report():
+    # Multipart uploads carry the screenshot as raw bytes, JSON bodies as base64
+    upload = None
+    if request.mimetype == 'multipart/form-data':
+        data = await request.form
+        upload = (await request.files).get('screenshot')
+    else:
+        data = await request.get_json(silent=True)
+    if not data or 'url' not in data:
+        return jsonify({'error': 'Missing url field'}), 400
+
+    url = data['url']
+    description = data.get('description')
+
+    # Store the screenshot outside the table; rows only reference its hash
+    try:
+        screenshot_hash = await admin_lane.run(core.store_screenshot, upload, data.get('screenshot'))
+    except ValueError as e:
+        return jsonify({'error': f'Invalid screenshot: {e}'}), 400
+    except OSError as e:
+        logger.error(f"Error storing screenshot: {e}", exc_info=True)
+        return jsonify({'error': 'Could not store screenshot'}), 500
+
+    try:
+        ticket = core.report_queue.submit(url, description, screenshot_hash)
+    except QueueFull as e:
+        logger.warning(f"Rejecting report for {url}: {e}")
+        response = jsonify({'error': 'Too many reports, please retry shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    # The row is written by the report queue; the ticket resolves to its id
+    status_url = url_for('report_ticket_status', ticket=ticket)
+    response = jsonify({'ticket': ticket, 'status': 'queued', 'status_url': status_url})
+    response.headers['Location'] = status_url
+    return response, 202
+
+# Lookup of a queued report by its ticket
+@app.route('/report/ticket/<ticket>', methods=['GET'])
+async def report_ticket_status(ticket):
+    try:
+        state = await admin_lane.run(core.report_ticket, ticket)
+    except Error as e:
+        logger.error(f"Error looking up report ticket {ticket}: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    if state is None:
+        return jsonify({'error': 'Unknown ticket'}), 404
+    return jsonify({'ticket': ticket, **state})
+
+# Screenshot retrieval endpoint
+@app.route('/report/<int:rid>/screenshot', methods=['GET'])
+async def get_screenshot(rid):
+    row = await admin_lane.run(core.find_screenshot, rid)
+    if not row:
+        return '', 404
+
+    screenshot_hash, legacy_blob = row
+    if screenshot_hash:
+        path = core.screenshot_store.path(screenshot_hash)
+        if not os.path.exists(path):
+            logger.error(f"Screenshot {screenshot_hash} of report {rid} is missing from the store")
+            return '', 404
+        # Streams from disk with ETag, conditional GET and Range support
+        response = await send_file(path, mimetype='image/png', add_etags=False, cache_timeout=86400)
+        response.set_etag(screenshot_hash)
+        return await response.make_conditional(request, accept_ranges=True,
+                                               complete_length=response.content_length)
+    if legacy_blob:
+        return Response(legacy_blob, mimetype='image/png')
+    return '', 404
+
+# Update report status endpoint
+@app.route('/report/<int:rid>/status', methods=['POST'])
+async def update_report_status(rid):
+    data = await request.get_json(silent=True) or {}
+    status = data.get('status')
+    if status not in REPORT_STATUSES:
+        return jsonify({'error': 'Invalid status'}), 400
+
+    try:
+        await admin_lane.run(core.set_report_status, rid, status)
+        return jsonify({'status': status}), 200
+    except Error as e:
+        logger.error(f"Error updating report status: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
+# Admin reports page
+@app.route('/admin/reports', methods=['GET'])
+async def admin_reports():
+    try:
+        filters = parse_report_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        reports, next_cursor = await admin_lane.run(core.fetch_reports, filters)
+    except Error as e:
+        logger.error(f"Error fetching reports: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    # Keep the filters (but not the position) when linking to other pages
+    page_args = {k: v for k, v in request.args.items() if k != 'cursor'}
+    return await render_template('reports.html', reports=reports, next_cursor=next_cursor,
+                                 page_args=page_args, statuses=REPORT_STATUSES)
+
+# Admin reports as JSON, for tooling
+@app.route('/admin/reports.json', methods=['GET'])
+async def admin_reports_json():
+    try:
+        filters = parse_report_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        reports, next_cursor = await admin_lane.run(core.fetch_reports, filters)
+    except Error as e:
+        logger.error(f"Error fetching reports: {e}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+    for r in reports:
+        r['reported_at'] = r['reported_at'].isoformat() if r['reported_at'] else None
+    return jsonify({'reports': reports, 'next_cursor': next_cursor})
+
+if __name__ == '__main__':
+    # Development server; use `python serve.py --async` in production
+    app.run(host='0.0.0.0', port=5000)
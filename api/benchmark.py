@@ -0,0 +1,459 @@
+import os
+import csv
+import sys
+import json
+import time
+import base64
+import hashlib
+import logging
+import pickle
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+import numpy as np
+
+from feature_extractor import extract_url_features, extract_url_features_many
+from scorer import build_scorer, SklearnScorer
+from model_registry import publish_model, LINEAR_NPZ, PICKLE
+from domain_index import DomainIndex
+from verdict_cache import normalize_url
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Corpus of real phishing URLs shipped with the repo
+CORPUS_PATH = os.path.join(ROOT_DIR, '1000-phishing.txt')
+# Labeled URLs shipped with the repo, split into Protocol/Domain/Path columns
+CSV_CORPUS_PATH = os.path.join(ROOT_DIR, 'phishing-urls.csv')
+
+# Shipped model artifacts
+MODEL_PATH = os.path.join(ROOT_DIR, 'model.pkl')
+SCALER_PATH = os.path.join(ROOT_DIR, 'scaler.pkl')
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Domain lists used by the known-domain override
+DATA_DIR = os.path.join(API_DIR, 'data')
+
+# Version of the results file layout
+RESULTS_VERSION = 1
+
+# Results whose value is better when higher; everything else is better lower
+HIGHER_IS_BETTER = ('req/s',)
+
+# Reports sent by the HTTP benchmarks go to this database, never the real one
+BENCHMARK_DB_NAME = os.environ.get('BENCHMARK_DB_NAME', 'phishing_benchmark')
+
+# Run in a fresh interpreter: import the app and serve one /predict
+_COLD_START_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import app
+response = app.app.test_client().post('/predict', json={'url': 'http://example.com/login'})
+assert response.status_code == 200, response.get_data()
+print(time.perf_counter() - start, int('sklearn' in sys.modules))
+"""
+
+def load_corpus(path=CORPUS_PATH):
+    """Load one URL per line from the corpus file."""
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+def load_csv_corpus(path=CSV_CORPUS_PATH):
+    """Load the URLs of phishing-urls.csv, rebuilt from its Protocol, Domain and Path columns."""
+    with open(path, encoding='utf-8', newline='') as f:
+        return [f"{row.get('Protocol') or 'http'}://{row['Domain']}{row.get('Path') or ''}"
+                for row in csv.DictReader(f) if row.get('Domain')]
+
+def best_time(func, repeat):
+    """Return the fastest of repeat runs of func, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def result(value, unit):
+    """One benchmark result as stored in the results file."""
+    return {'value': value, 'unit': unit}
+
+def latency_results(name, latencies, elapsed):
+    """
+    Throughput and latency percentiles of a run of requests.
+
+    Args:
+        name (str): Result name prefix
+        latencies (list): Seconds per request
+        elapsed (float): Wall time of the whole run
+
+    Returns:
+        dict: req/s, p50 and p99 results
+    """
+    latencies = np.asarray(latencies)
+    return {
+        f'{name}.throughput': result(len(latencies) / elapsed, 'req/s'),
+        f'{name}.p50': result(float(np.percentile(latencies, 50)) * 1e3, 'ms'),
+        f'{name}.p99': result(float(np.percentile(latencies, 99)) * 1e3, 'ms'),
+    }
+
+def bench_feature_extraction(urls, repeat=5, corpus='1000-phishing'):
+    """
+    Time the scalar and bulk feature extractors over a list of URLs.
+
+    Args:
+        urls (list): URLs to extract features from
+        repeat (int): Number of runs; the fastest one is reported
+        corpus (str): Corpus name used in the result names
+
+    Returns:
+        dict: Microseconds per URL for each extractor
+    """
+    domains = [urlparse(url).netloc for url in urls]
+
+    def scalar():
+        for url, domain in zip(urls, domains):
+            extract_url_features(url, domain)
+
+    def bulk():
+        extract_url_features_many(urls, domains)
+
+    return {
+        f'extract.scalar.{corpus}': result(best_time(scalar, repeat) / len(urls) * 1e6, 'us/url'),
+        f'extract.bulk.{corpus}': result(best_time(bulk, repeat) / len(urls) * 1e6, 'us/url'),
+    }
+
+def bench_scoring(model, scaler, urls, repeat=5):
+    """
+    Time single-row and whole-corpus scoring with the sklearn and fused scorers.
+
+    Args:
+        model: Fitted classifier
+        scaler: Fitted scaler
+        urls (list): URLs whose features are scored
+        repeat (int): Number of runs; the fastest one is reported
+
+    Returns:
+        dict: Microseconds per URL for each scorer and mode
+    """
+    features = extract_url_features_many(urls)
+    rows = [features[i:i + 1] for i in range(len(features))]
+    results = {}
+    for name, scorer in (('sklearn', SklearnScorer(model, scaler)), ('fused', build_scorer(model, scaler))):
+        def single():
+            for row in rows:
+                scorer.predict(row)
+
+        def batch():
+            scorer.predict(features)
+
+        results[f'score.{name}.single'] = result(best_time(single, repeat) / len(urls) * 1e6, 'us/url')
+        results[f'score.{name}.batch'] = result(best_time(batch, repeat) / len(urls) * 1e6, 'us/url')
+    return results
+
+def bench_known_domains(urls, repeat=5):
+    """
+    Time the known-domain override: URL normalization and the domain index lookup.
+
+    The index is built from the shipped allowlist/blocklist. Corpus URLs
+    are mostly unlisted (a miss walks every parent domain); the allowlisted
+    domains themselves are the hits.
+
+    Args:
+        urls (list): URLs to look up
+        repeat (int): Number of runs; the fastest one is reported
+
+    Returns:
+        dict: Microseconds per URL for normalization, misses and hits
+    """
+    index = DomainIndex(os.path.join(DATA_DIR, 'allowlist.txt'), os.path.join(DATA_DIR, 'blocklist.txt'))
+    normalized = [normalize_url(url) for url in urls]
+    with open(os.path.join(DATA_DIR, 'allowlist.txt'), encoding='utf-8') as f:
+        listed = [line.strip() for line in f if line.strip() and not line.startswith('#')]
+    # As many lookups as for the corpus, cycling through the listed domains
+    hits = [(None, f"www.{listed[i % len(listed)]}") for i in range(len(urls))]
+
+    def normalize():
+        for url in urls:
+            normalize_url(url)
+
+    def lookup(entries):
+        for key, host in entries:
+            index.lookup(host, key)
+
+    return {
+        'override.normalize_url': result(best_time(normalize, repeat) / len(urls) * 1e6, 'us/url'),
+        'override.lookup_miss': result(best_time(lambda: lookup(normalized), repeat) / len(urls) * 1e6, 'us/url'),
+        'override.lookup_hit': result(best_time(lambda: lookup(hits), repeat) / len(urls) * 1e6, 'us/url'),
+    }
+
+def bench_test_client(urls, rounds=3):
+    """
+    Time /predict, /predict/batch and /report through the Flask test client.
+
+    Runs the full request handling without a network or server, so it
+    tracks the app's own per-request cost.
+
+    Args:
+        urls (list): URLs to send
+        rounds (int): Passes over the URLs for the /predict benchmarks
+
+    Returns:
+        dict: Throughput and latency results per endpoint
+    """
+    # The app reads its settings at import time
+    os.environ.setdefault('DB_NAME', BENCHMARK_DB_NAME)
+    os.environ.setdefault('SCREENSHOT_DIR', tempfile.mkdtemp(prefix='benchmark-screenshots-'))
+    import app as app_module
+
+    client = app_module.app.test_client()
+    results = {}
+
+    def run(name, requests):
+        latencies = []
+        start = time.perf_counter()
+        for path, body in requests:
+            t = time.perf_counter()
+            response = client.post(path, json=body)
+            latencies.append(time.perf_counter() - t)
+            if response.status_code >= 300:
+                raise RuntimeError(f"{path} returned {response.status_code}: {response.get_data(as_text=True)}")
+        results.update(latency_results(name, latencies, time.perf_counter() - start))
+
+    # Unique query strings defeat the verdict cache so every request runs the model
+    run('http.client.predict.model', [('/predict', {'url': f"{url}{'&' if '?' in url else '?'}bench={r}"})
+                                       for r in range(rounds) for url in urls])
+    app_module.verdict_cache.clear()
+    for url in urls:
+        client.post('/predict', json={'url': url})
+    run('http.client.predict.cached', [('/predict', {'url': url}) for _ in range(rounds) for url in urls])
+
+    app_module.verdict_cache.clear()
+    batch_seconds = best_time(lambda: client.post('/predict/batch', json={'urls': urls}), rounds)
+    results['http.client.predict_batch'] = result(batch_seconds / len(urls) * 1e6, 'us/url')
+
+    screenshot = base64.b64encode(os.urandom(32 * 1024)).decode()
+    run('http.client.report', [('/report', {'url': url, 'description': 'benchmark'}) for url in urls])
+    run('http.client.report_screenshot', [('/report', {'url': url, 'description': 'benchmark',
+                                                       'screenshot': screenshot}) for url in urls[:200]])
+    return results
+
+def bench_server(port=5056, workers=1, concurrency=4, duration=5.0):
+    """
+    Load /predict and /report on a local serve.py.
+
+    Args:
+        port (int): Port for the server
+        workers (int): Server worker processes
+        concurrency (int): Client processes
+        duration (float): Seconds per endpoint
+
+    Returns:
+        dict: Throughput and latency results per endpoint
+    """
+    from loadtest import run_load, wait_until_up
+
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, WEB_WORKERS=str(workers), WEB_BIND=f"127.0.0.1:{port}", LOG_LEVEL='WARNING')
+    env.setdefault('DB_NAME', BENCHMARK_DB_NAME)
+    env.setdefault('SCREENSHOT_DIR', tempfile.mkdtemp(prefix='benchmark-screenshots-'))
+    server = subprocess.Popen([sys.executable, 'serve.py'], cwd=API_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = {}
+    try:
+        wait_until_up(base_url)
+        urls = load_corpus()
+        for name, path in (('predict', '/predict'), ('report', '/report')):
+            # Warm up before measuring
+            run_load(base_url, concurrency, 1.0, urls, path=path)
+            load = run_load(base_url, concurrency, duration, urls, path=path)
+            results[f'http.server.{name}.throughput'] = result(load['rps'], 'req/s')
+            results[f'http.server.{name}.p50'] = result(load['p50_ms'], 'ms')
+            results[f'http.server.{name}.p99'] = result(load['p99_ms'], 'ms')
+            results[f'http.server.{name}.errors'] = result(load['errors'], 'requests')
+    finally:
+        server.terminate()
+        server.wait(timeout=60)
+    return results
+
+def bench_cold_start(model, scaler, repeat=3):
+    """
+    Time a fresh process from start to its first successful /predict.
+
+    The model is published to a temporary registry once per artifact
+    format, and each run starts a new interpreter that imports the app.
+
+    Args:
+        model: Fitted classifier
+        scaler: Fitted scaler
+        repeat (int): Processes started per format; the fastest one is reported
+
+    Returns:
+        dict: Milliseconds to the first prediction per format, and whether
+        sklearn was imported
+    """
+    results = {}
+    for artifact_format in (PICKLE, LINEAR_NPZ):
+        with tempfile.TemporaryDirectory() as registry:
+            publish_model(model, scaler, registry, artifact_format=artifact_format)
+            env = dict(os.environ, MODEL_REGISTRY_DIR=registry)
+            best_total = best_app = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                output = subprocess.run([sys.executable, '-c', _COLD_START_SCRIPT], cwd=API_DIR, env=env,
+                                        capture_output=True, text=True, check=True).stdout.split()
+                best_total = min(best_total, time.perf_counter() - start)
+                best_app = min(best_app, float(output[0]))
+                sklearn_loaded = output[1] == '1'
+        results[f'cold_start.{artifact_format}.process'] = result(best_total * 1e3, 'ms')
+        results[f'cold_start.{artifact_format}.import_and_predict'] = result(best_app * 1e3, 'ms')
+        results[f'cold_start.{artifact_format}.sklearn_imported'] = result(sklearn_loaded, 'flag')
+    return results
+
+def _file_digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+def environment_info():
+    """Commit, interpreter and machine the results were measured on."""
+    def git(*args):
+        try:
+            return subprocess.run(['git', *args], cwd=ROOT_DIR, capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {
+        'commit': git('rev-parse', 'HEAD'),
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        # Results are only comparable over the same inputs
+        'corpora': {os.path.basename(path): _file_digest(path) for path in (CORPUS_PATH, CSV_CORPUS_PATH)},
+    }
+
+def run_suite(repeat=5, http=True, server=False, cold_start=False):
+    """
+    Run the benchmarks.
+
+    Args:
+        repeat (int): Runs per microbenchmark (the best is reported)
+        http (bool): Include the test-client HTTP benchmarks
+        server (bool): Include the local server benchmarks
+        cold_start (bool): Include the cold start benchmarks
+
+    Returns:
+        dict: {'version', 'environment', 'results'} ready to be saved as JSON
+    """
+    urls = load_corpus()
+    csv_urls = load_csv_corpus()
+    results = {}
+    results.update(bench_feature_extraction(urls, repeat, '1000-phishing'))
+    results.update(bench_feature_extraction(csv_urls, repeat, 'phishing-urls'))
+
+    with open(MODEL_PATH, 'rb') as f:
+        model = pickle.load(f)
+    with open(SCALER_PATH, 'rb') as f:
+        scaler = pickle.load(f)
+    results.update(bench_scoring(model, scaler, urls, repeat))
+    results.update(bench_known_domains(urls, repeat))
+
+    if http:
+        results.update(bench_test_client(urls))
+    if server:
+        results.update(bench_server())
+    if cold_start:
+        results.update(bench_cold_start(model, scaler, min(repeat, 3)))
+
+    return {'version': RESULTS_VERSION, 'environment': environment_info(), 'results': results}
+
+def compare_results(baseline, current, threshold=0.10):
+    """
+    Compare two results files.
+
+    Args:
+        baseline (dict): Earlier run_suite output
+        current (dict): Later run_suite output
+        threshold (float): Relative change counted as a regression
+
+    Returns:
+        tuple: (rows, regressions); each row is (name, unit, baseline value,
+        current value, relative change, regressed)
+    """
+    rows = []
+    regressions = 0
+    for name, new in current['results'].items():
+        old = baseline['results'].get(name)
+        if old is None or old['unit'] != new['unit'] or isinstance(new['value'], bool):
+            continue
+        if not old['value']:
+            continue
+        change = (new['value'] - old['value']) / old['value']
+        # Positive change means worse, whichever way the unit points
+        worse = -change if new['unit'] in HIGHER_IS_BETTER else change
+        regressed = worse > threshold
+        regressions += regressed
+        rows.append((name, new['unit'], old['value'], new['value'], change, regressed))
+    return rows, regressions
+
+def print_results(suite):
+    env = suite['environment']
+    print(f"commit {env['commit'] or 'unknown'}{' (dirty)' if env['dirty'] else ''}, "
+          f"Python {env['python']}, {env['cpus']} CPUs")
+    for name, r in suite['results'].items():
+        value = r['value']
+        if isinstance(value, bool):
+            print(f"{name:45s} {'yes' if value else 'no':>10}")
+        else:
+            print(f"{name:45s} {value:10.2f} {r['unit']}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the scoring pipeline and HTTP endpoints")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per benchmark (best is reported)")
+    parser.add_argument('--no-http', action='store_true', help="skip the test-client HTTP benchmarks")
+    parser.add_argument('--server', action='store_true', help="also load a local serve.py")
+    parser.add_argument('--cold-start', action='store_true',
+                        help="also time fresh processes up to their first /predict")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    parser.add_argument('--compare', metavar='BASELINE', help="compare against an earlier results file")
+    parser.add_argument('--results', metavar='CURRENT',
+                        help="with --compare: compare this results file instead of running the suite")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="relative slowdown reported as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    # Keep per-URL debug logging out of the measurements
+    logging.disable(logging.CRITICAL)
+
+    if args.results:
+        with open(args.results) as f:
+            suite = json.load(f)
+    else:
+        suite = run_suite(args.repeat, http=not args.no_http, server=args.server, cold_start=args.cold_start)
+        print_results(suite)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(suite, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline['environment']['corpora'] != suite['environment']['corpora']:
+            print("Warning: the corpora differ from the baseline's")
+        rows, regressions = compare_results(baseline, suite, args.threshold)
+        print(f"\nAgainst {baseline['environment']['commit'] or args.compare}:")
+        for name, unit, old, new, change, regressed in rows:
+            print(f"{name:45s} {old:10.2f} -> {new:10.2f} {unit:7s} {change:+7.1%}"
+                  f"{'  REGRESSION' if regressed else ''}")
+        print(f"{regressions} regressions beyond {args.threshold:.0%}")
+        sys.exit(1 if regressions else 0)
+    sys.exit(0)
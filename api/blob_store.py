@@ -0,0 +1,104 @@
+import os
+import re
+import hashlib
+import tempfile
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default location of stored screenshots
+DEFAULT_SCREENSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'screenshots')
+
+_DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+
+class BlobStore:
+    """
+    Content-addressed blob store on local disk.
+
+    Each blob is stored once under the SHA-256 of its content, fanned out
+    into two levels of subdirectories (ab/cd/abcd...). Writes go to a
+    temporary file that is renamed into place, so readers never see a
+    partial blob and identical uploads are deduplicated.
+    """
+
+    def __init__(self, root=DEFAULT_SCREENSHOT_DIR):
+        self.root = root
+        self._tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self._tmp_dir, exist_ok=True)
+
+    def path(self, digest):
+        """
+        Return the file path of a blob.
+
+        Raises:
+            ValueError: If digest is not a lowercase hex SHA-256
+        """
+        if not _DIGEST_RE.match(digest):
+            raise ValueError(f"Invalid blob digest: {digest!r}")
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def exists(self, digest):
+        """Check whether a blob is stored."""
+        return os.path.exists(self.path(digest))
+
+    def put_stream(self, stream, chunk_size=64 * 1024):
+        """
+        Store the contents of a binary stream, hashing it while it is written.
+
+        Args:
+            stream: Readable binary file object
+            chunk_size (int): Bytes read per iteration
+
+        Returns:
+            tuple: (hex digest, size in bytes)
+        """
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while True:
+                    chunk = stream.read(chunk_size)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+            digest = sha.hexdigest()
+            self._commit(tmp_path, digest)
+            return digest, size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def put_bytes(self, data):
+        """
+        Store a bytes object.
+
+        Returns:
+            tuple: (hex digest, size in bytes)
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        if self.exists(digest):
+            return digest, len(data)
+        fd, tmp_path = tempfile.mkstemp(dir=self._tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                tmp.write(data)
+            self._commit(tmp_path, digest)
+            return digest, len(data)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _commit(self, tmp_path, digest):
+        """Move a fully written temporary file to its content address."""
+        final_path = self.path(digest)
+        if os.path.exists(final_path):
+            # Duplicate content; keep the existing copy
+            os.remove(tmp_path)
+            return
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(tmp_path, final_path)
@@ -0,0 +1,138 @@
+import math
+import struct
+import hashlib
+
+import numpy as np
+
+# Serialized form: header, then the bit array, bit i in byte i // 8 at
+# position i % 8 (least significant first)
+MAGIC = b'PBF1'
+HEADER = struct.Struct('<4sB3xQ')
+
+# Smallest bit array built, so small lists still get a low false positive rate
+MIN_BITS = 8192
+
+_MASK64 = (1 << 64) - 1
+
+def _key_hashes(key):
+    """Two 64-bit hashes of a key; the second is odd so every probe differs."""
+    digest = hashlib.sha256(key.encode('utf-8', 'surrogatepass')).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:16], 'little') | 1
+
+def num_hashes_for(fp_rate):
+    """Number of probes that gives fp_rate when the filter is sized for it."""
+    return max(1, round(-math.log2(fp_rate)))
+
+def num_bits_for(capacity, fp_rate):
+    """
+    Bit array size for capacity keys at fp_rate.
+
+    Rounded up to a power of two, so the size only changes when the key
+    count doubles and filters of consecutive versions can be diffed.
+    """
+    needed = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+    return max(MIN_BITS, 1 << max(0, needed - 1).bit_length())
+
+class BloomFilter:
+    """
+    Bloom filter over strings.
+
+    Probe i of a key is (h1 + i * h2) mod num_bits, with h1 and h2 the
+    first two little-endian 64-bit words of the key's SHA-256 (h2 forced
+    odd) and the sum taken modulo 2**64, so any client with SHA-256 can
+    reproduce the lookups from the serialized bytes.
+    """
+
+    def __init__(self, num_bits, num_hashes, bits=None):
+        """
+        Args:
+            num_bits (int): Size of the bit array, a multiple of 8
+            num_hashes (int): Probes per key
+            bits (bytes, optional): Bit array to start from
+        """
+        if num_bits % 8:
+            raise ValueError("num_bits must be a multiple of 8")
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        # Lookups index the bytearray (fast for single bytes), bulk updates
+        # go through a numpy view of the same memory
+        self._buffer = bytearray(num_bits // 8) if bits is None else bytearray(bits[:num_bits // 8])
+        if len(self._buffer) != num_bits // 8:
+            raise ValueError("Bit array is shorter than num_bits")
+        self.bits = np.frombuffer(self._buffer, dtype=np.uint8)
+
+    @classmethod
+    def build(cls, keys, fp_rate):
+        """
+        Create a filter sized for keys and add them.
+
+        Args:
+            keys (collection): Strings to add
+            fp_rate (float): Target false positive rate
+
+        Returns:
+            BloomFilter: The filled filter
+        """
+        bloom = cls(num_bits_for(len(keys), fp_rate), num_hashes_for(fp_rate))
+        bloom.update(keys)
+        return bloom
+
+    def update(self, keys):
+        """Add many keys at once, hashing in Python and setting bits with numpy."""
+        keys = list(keys)
+        if not keys:
+            return
+        digests = b''.join(hashlib.sha256(key.encode('utf-8', 'surrogatepass')).digest()[:16] for key in keys)
+        words = np.frombuffer(digests, dtype='<u8').reshape(-1, 2)
+        h1, h2 = words[:, 0], words[:, 1] | np.uint64(1)
+        probes = np.arange(self.num_hashes, dtype=np.uint64)
+        # uint64 arithmetic wraps modulo 2**64, as the lookup does
+        positions = (h1[:, None] + probes[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+        flags = np.zeros(self.num_bits, dtype=bool)
+        flags[positions.ravel()] = True
+        self.bits |= np.packbits(flags, bitorder='little')
+
+    def add(self, key):
+        self.update([key])
+
+    def __contains__(self, key):
+        h1, h2 = _key_hashes(key)
+        bits = self._buffer
+        for i in range(self.num_hashes):
+            position = ((h1 + i * h2) & _MASK64) % self.num_bits
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def fill_ratio(self):
+        """Fraction of bits set."""
+        return int(np.unpackbits(self.bits).sum()) / self.num_bits
+
+    def false_positive_rate(self):
+        """Expected false positive rate at the current fill."""
+        return self.fill_ratio() ** self.num_hashes
+
+    def to_bytes(self):
+        return HEADER.pack(MAGIC, self.num_hashes, self.num_bits) + self.bits.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data, offset=0):
+        """
+        Read a filter written by to_bytes.
+
+        Returns:
+            tuple: (BloomFilter, offset after it)
+
+        Raises:
+            ValueError: If the data is not a complete filter
+        """
+        if len(data) - offset < HEADER.size:
+            raise ValueError("Truncated Bloom filter header")
+        magic, num_hashes, num_bits = HEADER.unpack_from(data, offset)
+        if magic != MAGIC:
+            raise ValueError("Not a Bloom filter")
+        start = offset + HEADER.size
+        end = start + num_bits // 8
+        if len(data) < end:
+            raise ValueError("Truncated Bloom filter")
+        return cls(num_bits, num_hashes, bytes(data[start:end])), end
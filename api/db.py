@@ -0,0 +1,181 @@
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from collections import deque
+
+from mysql.connector.errors import PoolError
+
+logger = logging.getLogger(__name__)
+
+# Database configuration
+DB_CONFIG = {
+    'host': os.environ.get('DB_HOST', 'localhost'),
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', ''),
+    'database': os.environ.get('DB_NAME', 'webpagePhishingDetector'),
+}
+
+class PoolTimeout(PoolError):
+    """Raised when no connection becomes available within the pool timeout."""
+
+def _is_connected(conn):
+    """Default health check: mysql-connector pings the server here."""
+    return conn.is_connected()
+
+class ConnectionPool:
+    """
+    Size-bounded, thread-safe database connection pool.
+
+    Connections are opened lazily up to size and reused most-recently-used
+    first. A connection that sat idle longer than ping_after seconds is
+    health-checked on checkout and replaced if it is dead. Every connection
+    is rolled back when it is released, or dropped if even that fails, so
+    the next user never inherits an open transaction or the read snapshot
+    of a SELECT. After a fork the child starts with an empty pool instead of
+    sharing the parent's sockets.
+    """
+
+    def __init__(self, connect, size=10, timeout=5.0, ping_after=5.0, health_check=_is_connected):
+        """
+        Args:
+            connect (callable): Opens a new DB-API connection
+            size (int): Maximum number of open connections
+            timeout (float): Seconds to wait for a free connection
+            ping_after (float): Idle seconds after which a connection is checked
+            health_check (callable): Returns True if a connection is usable
+        """
+        self._connect = connect
+        self.size = size
+        self.timeout = timeout
+        self.ping_after = ping_after
+        self._health_check = health_check
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Start over with no connections (used at init and after a fork)."""
+        self._pid = os.getpid()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._idle = deque()  # (connection, time it was released)
+        self.in_use = 0
+        self.created = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.failed_checks = 0
+        self.errors = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @contextmanager
+    def connection(self):
+        """
+        Check out a connection for the duration of a with block.
+
+        Raises:
+            PoolTimeout: If no connection is free within the pool timeout
+        """
+        conn = self._checkout()
+        try:
+            yield conn
+        except BaseException:
+            self._release(conn, failed=True)
+            raise
+        self._release(conn)
+
+    def _checkout(self):
+        if os.getpid() != self._pid:
+            with self._lock:
+                if os.getpid() != self._pid:
+                    self._reset()
+
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"No database connection available within {self.timeout}s")
+        waited = time.perf_counter() - start
+
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            idle = self._idle.pop() if self._idle else None
+
+        try:
+            if idle is not None:
+                conn, released_at = idle
+                if time.monotonic() - released_at < self.ping_after or self._check(conn):
+                    return conn
+                with self._lock:
+                    self.failed_checks += 1
+                self._close(conn)
+            conn = self._connect()
+            with self._lock:
+                self.created += 1
+            return conn
+        except BaseException:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+            raise
+
+    def _release(self, conn, failed=False):
+        try:
+            if failed:
+                with self._lock:
+                    self.errors += 1
+            try:
+                # Ends the transaction a SELECT opens too (autocommit is off),
+                # which would otherwise pin the next user to a stale snapshot
+                conn.rollback()
+            except Exception:
+                # The connection is broken; let the next checkout open a new one
+                self._close(conn)
+                conn = None
+            if conn is not None:
+                with self._lock:
+                    self._idle.append((conn, time.monotonic()))
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def _check(self, conn):
+        try:
+            return self._health_check(conn)
+        except Exception:
+            return False
+
+    def _close(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        """Close every idle connection (e.g. before forking workers)."""
+        with self._lock:
+            idle, self._idle = list(self._idle), deque()
+        for conn, _ in idle:
+            self._close(conn)
+
+    def stats(self):
+        """Return pool utilization and wait-time metrics as a dict."""
+        with self._lock:
+            return {
+                'size': self.size,
+                'in_use': self.in_use,
+                'idle': len(self._idle),
+                'utilization': self.in_use / self.size if self.size else 0.0,
+                'created': self.created,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'failed_health_checks': self.failed_checks,
+                'errors': self.errors,
+                'wait_seconds_total': self.wait_total,
+                'wait_seconds_avg': self.wait_total / self.checkouts if self.checkouts else 0.0,
+                'wait_seconds_max': self.wait_max,
+            }
@@ -0,0 +1,201 @@
+import sys
+import time
+import logging
+import argparse
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from db import DB_CONFIG
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Row of domain_analysis_watermark holding the last phishing_features id aggregated
+WATERMARK_JOB = 'domain_analysis'
+
+# Seconds between reading the id horizon and aggregating up to it, so that
+# ids allocated by inserts still in progress have been written by then
+DEFAULT_SETTLE = 2.0
+
+SUSPICIOUS = "has_ip = 1 OR suspicious_tld = 1 OR has_at_symbol = 1 OR is_shortened = 1"
+
+# Per-domain totals of the phishing_features rows in an id range
+AGGREGATE = (
+    "SELECT domain, COUNT(*) AS urls, "
+    f"SUM(CASE WHEN {SUSPICIOUS} THEN 1 ELSE 0 END) AS suspicious, "
+    "SUM(obfuscation_ratio) AS obfuscation, NOW() AS seen "
+    "FROM phishing_features WHERE id > %s AND id <= %s GROUP BY domain"
+)
+
+# Adds the totals of an id range to domain_analysis; the average is a
+# generated column over the running sum, so it stays exact
+UPSERT = (
+    "INSERT INTO domain_analysis (domain, total_urls, suspicious_count, obfuscation_ratio_sum, last_seen) "
+    f"SELECT * FROM ({AGGREGATE}) AS batch "
+    "ON DUPLICATE KEY UPDATE total_urls = total_urls + batch.urls, "
+    "suspicious_count = suspicious_count + batch.suspicious, "
+    "obfuscation_ratio_sum = obfuscation_ratio_sum + batch.obfuscation, "
+    "last_seen = batch.seen"
+)
+
+def _ensure_schema(conn):
+    """
+    Create the watermark table, and bring a domain_analysis built by the
+    old TRUNCATE-and-rebuild procedure onto running sums.
+
+    A database without a watermark gets one with last_id NULL, which makes
+    the next update a full rebuild.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS domain_analysis_watermark ("
+        "job varchar(64) NOT NULL, last_id int NULL, "
+        "updated_at timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, "
+        "PRIMARY KEY (job)) ENGINE=InnoDB"
+    )
+    cursor.execute(
+        "INSERT IGNORE INTO domain_analysis_watermark (job, last_id) VALUES (%s, NULL)", (WATERMARK_JOB,)
+    )
+    conn.commit()
+    try:
+        cursor.execute(
+            "ALTER TABLE domain_analysis "
+            "ADD COLUMN obfuscation_ratio_sum double NOT NULL DEFAULT 0 AFTER suspicious_count"
+        )
+    except mysql.connector.Error as e:
+        if e.errno != errorcode.ER_DUP_FIELDNAME:
+            raise
+    else:
+        cursor.execute(
+            "ALTER TABLE domain_analysis MODIFY avg_obfuscation_ratio float "
+            "GENERATED ALWAYS AS (obfuscation_ratio_sum / total_urls) STORED"
+        )
+        cursor.execute("UPDATE domain_analysis_watermark SET last_id = NULL WHERE job = %s", (WATERMARK_JOB,))
+        conn.commit()
+        logger.info("Migrated domain_analysis to running sums; a full rebuild follows")
+    cursor.close()
+
+def _lock_watermark(cursor):
+    """Lock the watermark row for the rest of the transaction and return last_id."""
+    cursor.execute("SELECT last_id FROM domain_analysis_watermark WHERE job = %s FOR UPDATE", (WATERMARK_JOB,))
+    return cursor.fetchone()[0]
+
+def _set_watermark(cursor, last_id):
+    cursor.execute("UPDATE domain_analysis_watermark SET last_id = %s WHERE job = %s", (last_id, WATERMARK_JOB))
+
+def rebuild(conn, horizon):
+    """
+    Recompute domain_analysis from every phishing_features row up to horizon.
+
+    Runs in one transaction, so readers of the views keep seeing the old
+    totals until it commits rather than an empty table. Like each batch of
+    update_domain_analysis, it first takes a locking read of the whole id
+    range, which waits for inserts into it that have not committed yet.
+
+    Returns:
+        int: Number of feature rows aggregated
+    """
+    cursor = conn.cursor()
+    conn.start_transaction()
+    _lock_watermark(cursor)
+    cursor.execute("SELECT COUNT(*) FROM phishing_features WHERE id > 0 AND id <= %s FOR SHARE", (horizon,))
+    cursor.fetchone()
+    cursor.execute("DELETE FROM domain_analysis")
+    cursor.execute(UPSERT, (0, horizon))
+    cursor.execute("SELECT COUNT(*), COALESCE(SUM(total_urls), 0) FROM domain_analysis")
+    domains, aggregated = cursor.fetchone()
+    _set_watermark(cursor, horizon)
+    conn.commit()
+    cursor.close()
+    logger.info(f"Rebuilt domain_analysis: {domains} domains from {aggregated} feature rows up to {horizon}")
+    return int(aggregated)
+
+def update_domain_analysis(batch_size=5000, settle=DEFAULT_SETTLE, full=False):
+    """
+    Fold phishing_features rows added since the last run into domain_analysis.
+
+    Rows are aggregated in id order, one batch per transaction, and each
+    transaction advances the watermark with the totals it adds, so the job
+    can be interrupted and re-run. Concurrent runs are serialized by the
+    lock on the watermark row. Each batch takes its ids with a locking
+    read, which waits for inserts into that range that have not committed
+    yet, so a row is never passed over because it committed after a
+    higher id. Only appends are picked up; after rows are updated or
+    deleted, rebuild with full=True.
+
+    Args:
+        batch_size (int): Feature rows aggregated per transaction
+        settle (float): Seconds to wait after reading the id horizon
+        full (bool): Recompute every domain instead
+
+    Returns:
+        int: Number of feature rows aggregated
+    """
+    conn = mysql.connector.connect(**DB_CONFIG)
+    aggregated = 0
+    try:
+        _ensure_schema(conn)
+        cursor = conn.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM phishing_features")
+        horizon = cursor.fetchone()[0]
+        conn.commit()
+        time.sleep(settle)
+
+        cursor.execute("SELECT last_id FROM domain_analysis_watermark WHERE job = %s", (WATERMARK_JOB,))
+        if full or cursor.fetchone()[0] is None:
+            conn.commit()
+            cursor.close()
+            return rebuild(conn, horizon)
+        conn.commit()
+
+        while True:
+            conn.start_transaction()
+            last_id = _lock_watermark(cursor)
+            cursor.execute(
+                "SELECT id FROM phishing_features WHERE id > %s AND id <= %s ORDER BY id LIMIT %s FOR SHARE",
+                (last_id, horizon, batch_size)
+            )
+            ids = cursor.fetchall()
+            if not ids:
+                conn.commit()
+                break
+
+            upper = ids[-1][0]
+            cursor.execute(UPSERT, (last_id, upper))
+            _set_watermark(cursor, upper)
+            conn.commit()
+
+            aggregated += len(ids)
+            logger.info(f"Aggregated {aggregated} feature rows (up to {upper})")
+        cursor.close()
+    finally:
+        conn.close()
+    return aggregated
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fold new phishing_features rows into domain_analysis")
+    parser.add_argument('--batch-size', type=int, default=5000, help="feature rows per transaction")
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE,
+                        help="seconds to let in-flight inserts land before aggregating")
+    parser.add_argument('--interval', type=float, default=0,
+                        help="keep running, updating every this many seconds (default: run once)")
+    parser.add_argument('--rebuild', action='store_true',
+                        help="recompute every domain (after phishing_features rows were changed or deleted)")
+    args = parser.parse_args()
+
+    full = args.rebuild
+    while True:
+        try:
+            count = update_domain_analysis(args.batch_size, args.settle, full)
+        except mysql.connector.Error as e:
+            logger.error(f"Domain analysis update failed: {e}")
+            if not args.interval:
+                sys.exit(1)
+        else:
+            logger.info(f"Done: {count} feature rows aggregated")
+            full = False
+        if not args.interval:
+            break
+        time.sleep(args.interval)
@@ -0,0 +1,246 @@
+import zlib
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+
+import numpy as np
+
+from bloom_filter import BloomFilter
+from domain_index import parent_domains, BLOCKED, ALLOWED
+from verdict_cache import normalize_url
+
+logger = logging.getLogger(__name__)
+
+# Serialized snapshot: MAGIC, then the blocked and the allowed filter
+SNAPSHOT_MAGIC = b'PFS1'
+# Serialized delta: DELTA_MAGIC, base and new version (16 bytes each), then
+# per filter a 4-byte length and the zlib-compressed XOR of the bit arrays
+DELTA_MAGIC = b'PFD1'
+VERSION_BYTES = 16
+
+# Keys of the two entry kinds; the prefixes keep them from colliding
+DOMAIN_KEY = 'd:'
+URL_KEY = 'u:'
+
+def snapshot_version(data):
+    """Version of a serialized snapshot: the first bytes of its SHA-256, in hex."""
+    return hashlib.sha256(data).hexdigest()[:VERSION_BYTES * 2]
+
+class FilterSnapshot:
+    """
+    Bloom filters of the domain index, checked the way DomainIndex.lookup does.
+
+    The blocked filter holds blocked domains and the exact normalized URLs
+    of Blacklisted reports; the allowed filter holds allowed domains.
+    Listed URLs are always found; an unlisted URL is reported as listed
+    with each filter's false positive rate.
+    """
+
+    def __init__(self, blocked, allowed, data=None):
+        """
+        Args:
+            blocked (BloomFilter): Blocked domains and URLs
+            allowed (BloomFilter): Allowed domains
+            data (bytes, optional): Serialized form, if already known
+        """
+        self.blocked = blocked
+        self.allowed = allowed
+        self.data = data if data is not None else SNAPSHOT_MAGIC + blocked.to_bytes() + allowed.to_bytes()
+        self.version = snapshot_version(self.data)
+
+    @classmethod
+    def build(cls, allowed_domains, blocked_domains, blocked_urls, blocked_fp_rate, allowed_fp_rate):
+        blocked_keys = [DOMAIN_KEY + d for d in blocked_domains] + [URL_KEY + u for u in blocked_urls]
+        return cls(BloomFilter.build(blocked_keys, blocked_fp_rate),
+                   BloomFilter.build([DOMAIN_KEY + d for d in allowed_domains], allowed_fp_rate))
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Read a snapshot served by the filter endpoint.
+
+        Raises:
+            ValueError: If the data is not a snapshot
+        """
+        data = bytes(data)
+        if not data.startswith(SNAPSHOT_MAGIC):
+            raise ValueError("Not a domain filter snapshot")
+        blocked, offset = BloomFilter.from_bytes(data, len(SNAPSHOT_MAGIC))
+        allowed, offset = BloomFilter.from_bytes(data, offset)
+        if offset != len(data):
+            raise ValueError("Trailing data after domain filter snapshot")
+        return cls(blocked, allowed, data)
+
+    def lookup(self, host, normalized_url=None):
+        """
+        Check a URL, mirroring DomainIndex.lookup.
+
+        Returns:
+            str or None: BLOCKED, ALLOWED, or None when the URL is not listed
+        """
+        if normalized_url is not None and URL_KEY + normalized_url in self.blocked:
+            return BLOCKED
+        allowed = False
+        for domain in parent_domains(host):
+            if DOMAIN_KEY + domain in self.blocked:
+                return BLOCKED
+            allowed = allowed or DOMAIN_KEY + domain in self.allowed
+        return ALLOWED if allowed else None
+
+    def check(self, url):
+        """Normalize a URL and look it up; unparseable URLs are not listed."""
+        try:
+            normalized_url, host = normalize_url(url)
+        except ValueError:
+            return None
+        return self.lookup(host, normalized_url) if host else None
+
+def encode_delta(base, new):
+    """
+    Changes from one snapshot to another, or None if their filters differ in shape.
+
+    Returns:
+        bytes or None: Delta for apply_delta
+    """
+    parts = [DELTA_MAGIC, bytes.fromhex(base.version), bytes.fromhex(new.version)]
+    for old, current in ((base.blocked, new.blocked), (base.allowed, new.allowed)):
+        if (old.num_bits, old.num_hashes) != (current.num_bits, current.num_hashes):
+            return None
+        # Few bits change between versions, so the XOR is mostly zeros and compresses well
+        packed = zlib.compress((old.bits ^ current.bits).tobytes(), 9)
+        parts.append(len(packed).to_bytes(4, 'little'))
+        parts.append(packed)
+    return b''.join(parts)
+
+def apply_delta(base, delta):
+    """
+    Apply a delta from encode_delta to the snapshot it was made against.
+
+    Returns:
+        FilterSnapshot: The new snapshot, verified against its version
+
+    Raises:
+        ValueError: If the delta is malformed, for another base, or does not
+            produce the expected version
+    """
+    delta = bytes(delta)
+    header = len(DELTA_MAGIC) + 2 * VERSION_BYTES
+    if len(delta) < header or not delta.startswith(DELTA_MAGIC):
+        raise ValueError("Not a domain filter delta")
+    base_version = delta[len(DELTA_MAGIC):len(DELTA_MAGIC) + VERSION_BYTES].hex()
+    new_version = delta[len(DELTA_MAGIC) + VERSION_BYTES:header].hex()
+    if base_version != base.version:
+        raise ValueError(f"Delta is against version {base_version}, not {base.version}")
+
+    offset = header
+    filters = []
+    for old in (base.blocked, base.allowed):
+        size = int.from_bytes(delta[offset:offset + 4], 'little')
+        changes = np.frombuffer(zlib.decompress(delta[offset + 4:offset + 4 + size]), dtype=np.uint8)
+        if len(changes) != len(old.bits):
+            raise ValueError("Delta does not match the filter size")
+        filters.append(BloomFilter(old.num_bits, old.num_hashes, (old.bits ^ changes).tobytes()))
+        offset += 4 + size
+
+    snapshot = FilterSnapshot(*filters)
+    if snapshot.version != new_version:
+        raise ValueError("Delta produced an unexpected version")
+    return snapshot
+
+class FilterPublisher:
+    """
+    Serves the domain index as Bloom filter snapshots and deltas between them.
+
+    A snapshot is rebuilt when the index changes, on the first request
+    after the change. Versions are content hashes, so workers with the
+    same lists publish the same versions. The last few snapshots are kept
+    to compute deltas from; clients on an older version download the
+    whole snapshot again.
+    """
+
+    def __init__(self, index, blocked_fp_rate=1e-3, allowed_fp_rate=1e-6, history=16):
+        """
+        Args:
+            index (DomainIndex): Index to publish
+            blocked_fp_rate (float): Target false positive rate of the blocked filter
+            allowed_fp_rate (float): Target false positive rate of the allowed
+                filter; kept low since a false positive skips the model
+            history (int): Past snapshots kept for deltas
+        """
+        self.index = index
+        self.blocked_fp_rate = blocked_fp_rate
+        self.allowed_fp_rate = allowed_fp_rate
+        self.history = history
+        self._source = None
+        self._snapshots = OrderedDict()  # version -> FilterSnapshot, oldest first
+        self._current = None
+        self._fill = {}
+        self._deltas = {}  # base version -> delta to the current snapshot
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.deltas_served = 0
+        self.deltas_missed = 0
+
+    def current(self):
+        """Return the snapshot of the index as it is now."""
+        source = self.index.snapshot()
+        if source is self._source:
+            return self._current
+        with self._lock:
+            source = self.index.snapshot()
+            if source is not self._source:
+                snapshot = FilterSnapshot.build(source.allowed, source.blocked, source.blocked_urls,
+                                                self.blocked_fp_rate, self.allowed_fp_rate)
+                self.builds += 1
+                # A reload that changed nothing keeps the current version and its cached deltas
+                if self._current is None or snapshot.version != self._current.version:
+                    logger.info(f"Domain filter version {snapshot.version}: {len(snapshot.data)} bytes")
+                    self._snapshots.pop(snapshot.version, None)
+                    self._snapshots[snapshot.version] = snapshot
+                    while len(self._snapshots) > self.history:
+                        self._snapshots.popitem(last=False)
+                    self._fill = {'blocked_fill_ratio': snapshot.blocked.fill_ratio(),
+                                  'allowed_fill_ratio': snapshot.allowed.fill_ratio()}
+                    self._deltas = {}
+                    self._current = snapshot
+                # Set last: readers skip the lock once the source matches
+                self._source = source
+            return self._current
+
+    def delta(self, since):
+        """
+        Changes from version since to the current snapshot.
+
+        Returns:
+            tuple: (current snapshot, delta bytes or None when since is not
+            a known version or the filters were resized)
+        """
+        current = self.current()
+        with self._lock:
+            deltas = self._deltas if current is self._current else {}
+            delta = deltas.get(since)
+        if delta is None:
+            base = self._snapshots.get(since)
+            delta = encode_delta(base, current) if base is not None else None
+        with self._lock:
+            if delta is None:
+                self.deltas_missed += 1
+            else:
+                self.deltas_served += 1
+                if current is self._current:
+                    self._deltas[since] = delta
+        return current, delta
+
+    def stats(self):
+        """Return the current version, filter sizes and counters as a dict."""
+        current = self._current
+        stats = {
+            'builds': self.builds,
+            'history': len(self._snapshots),
+            'deltas_served': self.deltas_served,
+            'deltas_missed': self.deltas_missed,
+        }
+        if current is not None:
+            stats.update({'version': current.version, 'bytes': len(current.data), **self._fill})
+        return stats
@@ -0,0 +1,228 @@
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Lookup outcomes
+BLOCKED = 'blocked'
+ALLOWED = 'allowed'
+
+def load_domain_file(path):
+    """
+    Read a domain list file: one domain per line, '#' starts a comment.
+
+    A leading '*.' or '.' is ignored, since every entry already covers its
+    subdomains.
+
+    Args:
+        path (str): File to read
+
+    Returns:
+        set: Lowercase domains (empty if the file does not exist)
+    """
+    domains = set()
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                domain = line.split('#', 1)[0].strip().lower().lstrip('*').lstrip('.')
+                if domain:
+                    domains.add(domain)
+    except FileNotFoundError:
+        logger.info(f"Domain list not found, treating as empty: {path}")
+    return domains
+
+def parent_domains(host):
+    """Yield host and each of its parent domains, e.g. a.b.com, b.com, com."""
+    while host:
+        yield host
+        dot = host.find('.')
+        if dot < 0:
+            return
+        host = host[dot + 1:]
+
+class _Snapshot:
+    """Immutable set of index entries; replaced as a whole on reload."""
+
+    __slots__ = ('allowed', 'blocked', 'blocked_urls')
+
+    def __init__(self, allowed, blocked, blocked_urls):
+        self.allowed = frozenset(allowed)
+        self.blocked = frozenset(blocked)
+        self.blocked_urls = frozenset(blocked_urls)
+
+class DomainIndex:
+    """
+    Allowlist/blocklist index with hashed parent-domain lookups.
+
+    Domain entries match the domain itself and every subdomain, so a lookup
+    costs one set probe per label of the host. Blocked URLs (e.g. reports
+    marked Blacklisted) match only the exact normalized URL. The domain
+    files are re-read when they change, and the blocked URLs when the
+    version source says they changed, without a restart; in a prefork
+    server this is how changes made by another worker reach this one.
+    """
+
+    def __init__(self, allowlist_path, blocklist_path, url_source=None, reload_interval=30.0,
+                 version_source=None):
+        """
+        Args:
+            allowlist_path (str): File of allowed domains
+            blocklist_path (str): File of blocked domains
+            url_source (callable, optional): Returns normalized URLs to block
+            reload_interval (float): Seconds between checks for changes
+            version_source (callable, optional): Returns a value that changes
+                whenever the URL source's result may have, in any process
+        """
+        self.allowlist_path = allowlist_path
+        self.blocklist_path = blocklist_path
+        self.url_source = url_source
+        self.version_source = version_source
+        self.reload_interval = reload_interval
+        self._snapshot = _Snapshot((), (), ())
+        self._mtimes = None
+        self._url_version = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self._watcher_pid = None
+        self._on_reload = None
+        self.reload()
+
+    def lookup(self, host, normalized_url=None):
+        """
+        Check a URL against the index.
+
+        Args:
+            host (str): Lowercase host of the URL
+            normalized_url (str, optional): Normalized URL for exact matches
+
+        Returns:
+            str or None: BLOCKED, ALLOWED, or None when the URL is not listed
+        """
+        snapshot = self._snapshot
+        if normalized_url is not None and normalized_url in snapshot.blocked_urls:
+            return BLOCKED
+        allowed = False
+        for domain in parent_domains(host):
+            if domain in snapshot.blocked:
+                return BLOCKED
+            allowed = allowed or domain in snapshot.allowed
+        return ALLOWED if allowed else None
+
+    def reload(self, include_urls=True):
+        """
+        Rebuild the index from the domain files (and the URL source).
+
+        Args:
+            include_urls (bool): Also re-query the blocked URL source
+        """
+        with self._lock:
+            self._mtimes = self._file_mtimes()
+            allowed = load_domain_file(self.allowlist_path)
+            blocked = load_domain_file(self.blocklist_path)
+            blocked_urls = self._snapshot.blocked_urls
+            if include_urls and self.url_source is not None:
+                try:
+                    # Read first: a change landing during the query shows up as a new version next time
+                    version = self.version_source() if self.version_source is not None else None
+                    blocked_urls = set(self.url_source())
+                    self._url_version = version
+                except Exception as e:
+                    logger.error(f"Could not load blocked URLs, keeping previous set: {e}")
+            self._snapshot = _Snapshot(allowed, blocked, blocked_urls)
+        logger.info(f"Domain index loaded: {len(allowed)} allowed, {len(blocked)} blocked domains, "
+                    f"{len(blocked_urls)} blocked URLs")
+
+    def maybe_reload(self):
+        """
+        Reload whatever changed; checked at most every reload_interval.
+
+        Returns:
+            bool: True if the index was reloaded
+        """
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.reload_interval
+        urls_changed = False
+        if self.version_source is not None and self.url_source is not None:
+            try:
+                urls_changed = self.version_source() != self._url_version
+            except Exception as e:
+                logger.warning(f"Could not check for blocked URL changes: {e}")
+        if not urls_changed and self._file_mtimes() == self._mtimes:
+            return False
+        self.reload(include_urls=urls_changed)
+        return True
+
+    def watch(self, on_reload=None):
+        """
+        Run maybe_reload every reload_interval on a background thread.
+
+        Lookups then never wait on the version source or a reload. Cheap
+        enough to call on every request: the thread is started once per
+        process, and again in a forked child.
+
+        Args:
+            on_reload (callable, optional): Called after each reload
+        """
+        if self._watcher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+            self._on_reload = on_reload
+            threading.Thread(target=self._watch, name='domain-index-watcher', daemon=True).start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.reload_interval)
+            try:
+                if self.maybe_reload() and self._on_reload is not None:
+                    self._on_reload()
+            except Exception as e:
+                logger.error(f"Domain index reload check failed: {e}", exc_info=True)
+
+    def block_url(self, normalized_url):
+        """Add an exact URL to the blocklist."""
+        with self._lock:
+            snapshot = self._snapshot
+            self._snapshot = _Snapshot(snapshot.allowed, snapshot.blocked,
+                                       snapshot.blocked_urls | {normalized_url})
+
+    def unblock_url(self, normalized_url):
+        """Remove an exact URL from the blocklist."""
+        with self._lock:
+            snapshot = self._snapshot
+            self._snapshot = _Snapshot(snapshot.allowed, snapshot.blocked,
+                                       snapshot.blocked_urls - {normalized_url})
+
+    def snapshot(self):
+        """
+        Current entries, replaced by a new object whenever the index changes.
+
+        Returns:
+            object: allowed, blocked and blocked_urls frozensets
+        """
+        return self._snapshot
+
+    def stats(self):
+        """Return the index sizes as a dict."""
+        snapshot = self._snapshot
+        return {
+            'allowed_domains': len(snapshot.allowed),
+            'blocked_domains': len(snapshot.blocked),
+            'blocked_urls': len(snapshot.blocked_urls),
+        }
+
+    def _file_mtimes(self):
+        """Modification times of the domain files (None for missing files)."""
+        mtimes = []
+        for path in (self.allowlist_path, self.blocklist_path):
+            try:
+                mtimes.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                mtimes.append(None)
+        return tuple(mtimes)
@@ -0,0 +1,234 @@
+import os
+import csv
+import sys
+import time
+import logging
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import mysql.connector
+from mysql.connector import errorcode
+
+from db import DB_CONFIG
+from feature_extractor import extract_url_features_many
+from verdict_cache import url_key
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# URLs read per chunk; one chunk is extracted by one worker call and
+# written in one transaction
+DEFAULT_CHUNK_SIZE = 10000
+
+# Rows per multi-row INSERT, keeping statements well under max_allowed_packet
+INSERT_ROWS = 1000
+
+# Hashes per existence query
+LOOKUP_ROWS = 1000
+
+# Longest URL the url column holds
+MAX_URL_LENGTH = 2048
+
+# Progress is logged this often (seconds)
+PROGRESS_INTERVAL = 10.0
+
+# Feature columns of phishing_features, in extract_url_features order
+FEATURE_COLUMNS = (
+    'url_length', 'num_dots', 'uses_https', 'num_special_chars', 'num_digits', 'has_ip',
+    'domain_length', 'num_subdomains', 'is_shortened', 'obfuscation_ratio', 'num_hyphens',
+    'longest_word', 'has_at_symbol', 'has_double_slash', 'suspicious_tld',
+)
+OBFUSCATION_RATIO = FEATURE_COLUMNS.index('obfuscation_ratio')
+
+INSERT = (
+    f"INSERT IGNORE INTO phishing_features (url, normalized_url, url_hash, {', '.join(FEATURE_COLUMNS)}) "
+    f"VALUES (%s, %s, %s{', %s' * len(FEATURE_COLUMNS)})"
+)
+
+def _row_url(row):
+    """Return the URL of a CSV row, rebuilding it from split columns if needed."""
+    url = row.get('URL') or row.get('url')
+    if url:
+        return url
+    if row.get('Domain'):
+        # phishing-urls.csv stores Protocol, Domain and Path separately
+        return f"{row.get('Protocol') or 'http'}://{row['Domain']}{row.get('Path') or ''}"
+    return None
+
+def iter_url_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream the URLs of a list or CSV file (or stdin for '-') in chunks.
+
+    Text input holds one URL per line; blank lines and lines starting with
+    '#' are skipped. CSV files (by extension) need a URL column or
+    Protocol/Domain/Path columns, and quoted fields spanning several lines
+    are not supported.
+
+    Yields:
+        list: URLs
+    """
+    f = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    try:
+        header = None
+        if path.lower().endswith('.csv'):
+            header = next(csv.reader([f.readline().decode('utf-8-sig')]))
+        urls = []
+        for raw in f:
+            line = raw.decode('utf-8', errors='replace').strip()
+            if not line or line.startswith('#'):
+                continue
+            url = _row_url(dict(zip(header, next(csv.reader([line]))))) if header else line
+            if url:
+                urls.append(url)
+            if len(urls) >= chunk_size:
+                yield urls
+                urls = []
+        if urls:
+            yield urls
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+
+def _ensure_schema(conn):
+    """Add the unique url_hash column that INSERT IGNORE deduplicates on."""
+    cursor = conn.cursor()
+    try:
+        # Rows already stored keep a NULL hash until migrate_url_hashes.py keys them
+        cursor.execute(
+            "ALTER TABLE phishing_features "
+            "ADD COLUMN normalized_url varchar(2048) NULL AFTER url, "
+            "ADD COLUMN url_hash binary(32) NULL AFTER normalized_url, "
+            "ADD UNIQUE KEY uq_url_hash (url_hash)"
+        )
+        logger.info("Added url_hash column to phishing_features; run migrate_url_hashes.py for existing rows")
+    except mysql.connector.Error as e:
+        if e.errno != errorcode.ER_DUP_FIELDNAME:
+            raise
+    finally:
+        cursor.close()
+
+def _stored_hashes(cursor, hashes):
+    """Return the subset of hashes already in phishing_features."""
+    stored = set()
+    for start in range(0, len(hashes), LOOKUP_ROWS):
+        part = hashes[start:start + LOOKUP_ROWS]
+        cursor.execute(
+            f"SELECT url_hash FROM phishing_features WHERE url_hash IN ({', '.join(['%s'] * len(part))})", part
+        )
+        stored.update(bytes(row[0]) for row in cursor.fetchall())
+    return stored
+
+def _extract_rows(keyed):
+    """Worker entry point: insert parameters of a batch of (url, normalized URL, hash)."""
+    features = extract_url_features_many([url for url, _, _ in keyed])
+    columns = features.astype(np.int64).tolist()
+    ratios = features[:, OBFUSCATION_RATIO].tolist()
+    rows = []
+    for key, values, ratio in zip(keyed, columns, ratios):
+        values[OBFUSCATION_RATIO] = ratio
+        rows.append((*key, *values))
+    return rows
+
+def load_features(paths, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Compute the features of the URLs in some files and store them in phishing_features.
+
+    URLs are read in chunks, and only those not already stored (by the
+    SHA-256 of the normalized URL in url_hash) are extracted, across a
+    process pool with at most two chunks per worker in flight, so memory
+    stays bounded however large the input is. Each chunk is written with
+    multi-row INSERT IGNORE statements in one transaction while the
+    workers extract the next ones, so a run can be interrupted and simply
+    run again, and concurrent loaders cannot store a URL twice.
+
+    Args:
+        paths (list): URL lists or CSV files ('-' for stdin)
+        workers (int, optional): Worker processes (defaults to the CPU count)
+        chunk_size (int): URLs per chunk
+
+    Returns:
+        dict: URLs read, inserted, skipped (already stored or repeated) and
+            too long, which add up to read; elapsed seconds and rows/sec
+    """
+    workers = workers or os.cpu_count() or 1
+    counts = {'read': 0, 'inserted': 0, 'skipped': 0, 'too_long': 0}
+    conn = mysql.connector.connect(**DB_CONFIG)
+    start = last_report = time.perf_counter()
+    in_flight = deque()
+
+    def finish():
+        nonlocal last_report
+        rows = in_flight.popleft().result()
+        cursor = conn.cursor()
+        inserted = 0
+        for i in range(0, len(rows), INSERT_ROWS):
+            # mysql-connector sends an executemany INSERT as one multi-row statement
+            cursor.executemany(INSERT, rows[i:i + INSERT_ROWS])
+            inserted += cursor.rowcount
+        conn.commit()
+        # Rows ignored were stored by a concurrent loader since the check
+        counts['inserted'] += inserted
+        counts['skipped'] += len(rows) - inserted
+        cursor.close()
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            logger.info(f"{counts['read']} URLs read, {counts['inserted']} inserted, "
+                        f"{counts['read'] / (now - start):.0f} rows/sec")
+
+    try:
+        _ensure_schema(conn)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for path in paths:
+                for urls in iter_url_chunks(path, chunk_size):
+                    counts['read'] += len(urls)
+                    new = {}
+                    kept = 0
+                    for url in urls:
+                        if len(url) > MAX_URL_LENGTH:
+                            counts['too_long'] += 1
+                            continue
+                        kept += 1
+                        normalized, digest = url_key(url)
+                        new.setdefault(digest, (url, normalized, digest))
+                    cursor = conn.cursor()
+                    stored = _stored_hashes(cursor, list(new))
+                    conn.commit()
+                    cursor.close()
+                    keyed = [key for digest, key in new.items() if digest not in stored]
+                    # Repeats within the chunk are skipped like stored URLs
+                    counts['skipped'] += kept - len(keyed)
+                    if not keyed:
+                        continue
+                    in_flight.append(pool.submit(_extract_rows, keyed))
+                    if len(in_flight) >= 2 * workers:
+                        finish()
+            while in_flight:
+                finish()
+    finally:
+        conn.close()
+
+    elapsed = time.perf_counter() - start
+    counts['seconds'] = elapsed
+    counts['rows_per_sec'] = counts['read'] / elapsed if elapsed else 0.0
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compute URL features and load them into phishing_features")
+    parser.add_argument('inputs', nargs='*', default=['-'],
+                        help="URL lists or CSV files ('-' or nothing for stdin)")
+    parser.add_argument('--workers', type=int, help="feature extraction processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="URLs per chunk")
+    args = parser.parse_args()
+
+    try:
+        summary = load_features(args.inputs, args.workers, args.chunk_size)
+    except mysql.connector.Error as e:
+        logger.error(f"Loading features failed: {e}")
+        sys.exit(1)
+    logger.info(f"Done: {summary['read']} URLs read, {summary['inserted']} inserted, "
+                f"{summary['skipped']} skipped, {summary['too_long']} too long, "
+                f"in {summary['seconds']:.1f}s ({summary['rows_per_sec']:.0f} rows/sec)")
@@ -0,0 +1,225 @@
+import os
+import json
+import hashlib
+import logging
+
+import numpy as np
+
+from feature_extractor import NUM_FEATURES, FEATURE_EXTRACTOR_VERSION
+
+logger = logging.getLogger(__name__)
+
+# Default location of the store, next to the API code
+DEFAULT_FEATURE_STORE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'feature_store')
+
+# On-disk column types
+FEATURE_DTYPE = np.float32
+HASH_DTYPE = np.uint64
+LABEL_DTYPE = np.int8
+
+# Bytes before a source offset that must be unchanged to resume the source
+_FINGERPRINT_BYTES = 4096
+
+def hash_urls(urls):
+    """
+    Key URLs by the first 8 bytes of their BLAKE2b digest.
+
+    Returns:
+        numpy.ndarray: uint64 hash of each URL
+    """
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(url.encode('utf-8', 'surrogatepass'), digest_size=8).digest(), 'little')
+         for url in urls),
+        dtype=HASH_DTYPE, count=len(urls)
+    )
+
+def file_fingerprint(path, offset):
+    """Hash of the bytes just before offset, to detect rewritten files."""
+    with open(path, 'rb') as f:
+        f.seek(max(0, offset - _FINGERPRINT_BYTES))
+        return hashlib.sha256(f.read(min(offset, _FINGERPRINT_BYTES))).hexdigest()
+
+class FeatureStore:
+    """
+    Append-only columnar store of extracted URL features.
+
+    Each feature extractor version has its own directory holding three raw
+    column files (features, URL hashes, labels) and a meta.json with the
+    committed row count. Readers memory-map the columns, so loading is
+    zero-copy; writers append rows and then rewrite meta.json, so rows
+    past the committed count (from an interrupted run) are discarded.
+    A URL is stored once; seeing it again with another label updates the
+    label in place.
+    """
+
+    def __init__(self, root=DEFAULT_FEATURE_STORE_DIR, version=FEATURE_EXTRACTOR_VERSION):
+        """
+        Args:
+            root (str): Store directory
+            version (int): Feature extractor version of the stored features
+        """
+        self.version = version
+        self.dir = os.path.join(root, f"v{version}")
+        os.makedirs(self.dir, exist_ok=True)
+        self._paths = {
+            'features': os.path.join(self.dir, 'features.bin'),
+            'hashes': os.path.join(self.dir, 'hashes.bin'),
+            'labels': os.path.join(self.dir, 'labels.bin'),
+        }
+        self._meta_path = os.path.join(self.dir, 'meta.json')
+        self.meta = self._load_meta()
+        self._truncate_uncommitted()
+        self._build_index()
+
+    @property
+    def rows(self):
+        """Number of committed rows."""
+        return self.meta['rows']
+
+    def load(self):
+        """
+        Memory-map the committed rows.
+
+        Returns:
+            tuple: (N x F float32 features, uint64 hashes, int8 labels), read-only
+        """
+        return self._map('features'), self._map('hashes'), self._map('labels')
+
+    def source_offset(self, path):
+        """
+        Byte offset up to which a source file has been stored.
+
+        Returns 0 for new sources and for sources that were rewritten (not
+        just appended to) since, so they are scanned again.
+        """
+        saved = self.meta['sources'].get(os.path.abspath(path))
+        if saved is None:
+            return 0
+        offset, fingerprint = saved
+        if os.path.getsize(path) < offset or file_fingerprint(path, offset) != fingerprint:
+            logger.info(f"{path} changed before its stored position; scanning it again")
+            return 0
+        return offset
+
+    def claim(self, hashes, labels):
+        """
+        Pick out the URLs whose features still need extracting.
+
+        URLs already stored get their label updated if it changed. Claimed
+        URLs count as stored from now on, so later batches do not claim them
+        again while they are being extracted.
+
+        Args:
+            hashes (numpy.ndarray): hash_urls of the batch
+            labels (array-like): Label of each URL
+
+        Returns:
+            numpy.ndarray: Boolean mask of URLs to extract and append
+        """
+        labels = np.asarray(labels, dtype=LABEL_DTYPE)
+        pos = np.searchsorted(self._sorted_hashes, hashes)
+        pos[pos == len(self._sorted_hashes)] = 0
+        found = self._sorted_hashes[pos] == hashes if len(self._sorted_hashes) else np.zeros(len(hashes), bool)
+
+        # Existing rows whose label changed
+        stored_labels = self._map('labels', self._written)
+        rows = self._sorted_rows[pos[found]]
+        changed = stored_labels[rows] != labels[found]
+        self._update_labels(rows[changed], labels[found][changed])
+
+        new = np.zeros(len(hashes), dtype=bool)
+        for i in np.flatnonzero(~found):
+            h = int(hashes[i])
+            row = self._recent.get(h)
+            if row is None:
+                self._recent[h] = -1
+                new[i] = True
+            elif row >= 0 and stored_labels[row] != labels[i]:
+                self._update_labels(np.array([row]), labels[i:i + 1])
+        return new
+
+    def append(self, hashes, features, labels):
+        """Append rows (URLs returned by claim) without committing them."""
+        if not len(hashes):
+            return
+        start = self._written
+        with open(self._paths['features'], 'ab') as f:
+            f.write(np.ascontiguousarray(features, dtype=FEATURE_DTYPE).tobytes())
+        with open(self._paths['hashes'], 'ab') as f:
+            f.write(np.ascontiguousarray(hashes, dtype=HASH_DTYPE).tobytes())
+        with open(self._paths['labels'], 'ab') as f:
+            f.write(np.ascontiguousarray(labels, dtype=LABEL_DTYPE).tobytes())
+        self._written += len(hashes)
+        for row, h in enumerate(hashes.tolist(), start):
+            self._recent[h] = row
+
+    def commit(self, source_offsets=None):
+        """
+        Make appended rows and label updates visible to readers.
+
+        Args:
+            source_offsets (dict, optional): {path: byte offset} stored so far
+        """
+        for path, offset in (source_offsets or {}).items():
+            self.meta['sources'][os.path.abspath(path)] = [offset, file_fingerprint(path, offset)]
+        self.meta['rows'] = self._written
+        tmp_path = f"{self._meta_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(tmp_path, self._meta_path)
+
+        # Fold recently appended URLs into the sorted index once there are many
+        if len(self._recent) > max(100000, len(self._sorted_hashes) // 8):
+            self._build_index()
+
+    def _load_meta(self):
+        try:
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return {'version': self.version, 'num_features': NUM_FEATURES, 'rows': 0,
+                    'label_updates': 0, 'sources': {}}
+        if meta['num_features'] != NUM_FEATURES:
+            raise ValueError(f"Feature store {self.dir} has {meta['num_features']} features, "
+                             f"expected {NUM_FEATURES}; bump FEATURE_EXTRACTOR_VERSION")
+        return meta
+
+    def _truncate_uncommitted(self):
+        """Drop rows written after the last commit (e.g. by an interrupted run)."""
+        rows = self.meta['rows']
+        widths = {'features': NUM_FEATURES * np.dtype(FEATURE_DTYPE).itemsize,
+                  'hashes': np.dtype(HASH_DTYPE).itemsize,
+                  'labels': np.dtype(LABEL_DTYPE).itemsize}
+        for name, path in self._paths.items():
+            size = rows * widths[name]
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+            elif os.path.getsize(path) > size:
+                logger.warning(f"Discarding uncommitted rows in {path}")
+                os.truncate(path, size)
+        self._written = rows
+
+    def _build_index(self):
+        """Sort the hashes of all written rows for binary-search lookups."""
+        hashes = self._map('hashes', self._written)
+        self._sorted_rows = np.argsort(hashes, kind='stable')
+        self._sorted_hashes = np.asarray(hashes[self._sorted_rows])
+        # Keep claims whose rows are still being extracted
+        self._recent = {h: row for h, row in getattr(self, '_recent', {}).items() if row < 0}
+
+    def _map(self, name, rows=None):
+        rows = self.meta['rows'] if rows is None else rows
+        dtype = {'features': FEATURE_DTYPE, 'hashes': HASH_DTYPE, 'labels': LABEL_DTYPE}[name]
+        shape = (rows, NUM_FEATURES) if name == 'features' else (rows,)
+        if rows == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(self._paths[name], dtype=dtype, mode='r', shape=shape)
+
+    def _update_labels(self, rows, labels):
+        if not len(rows):
+            return
+        with open(self._paths['labels'], 'r+b') as f:
+            for row, label in zip(rows.tolist(), labels.tolist()):
+                f.seek(row)
+                f.write(bytes([label & 0xFF]))
+        self.meta['label_updates'] += len(rows)
@@ -0,0 +1,182 @@
+import os
+import sys
+import json
+import logging
+import argparse
+import http.client
+from urllib.parse import urlsplit, quote
+
+from domain_filter import FilterSnapshot, apply_delta
+from domain_index import BLOCKED, ALLOWED
+
+logger = logging.getLogger(__name__)
+
+FILTER_PATH = '/filters/domains'
+DELTA_PATH = '/filters/domains/delta'
+PREDICT_PATH = '/predict'
+
+class FilterClient:
+    """
+    Checks URLs against the domain filter offline, asking the API only when it must.
+
+    The filter is fetched from /filters/domains and kept current with
+    deltas; a cache file lets it survive restarts. URLs on an allowed
+    domain are answered locally. URLs the filter does not list go to
+    /predict. URLs in the blocked filter are confirmed with /predict too,
+    unless confirm_blocked is off, since about one in a thousand unlisted
+    URLs is a false positive of the blocked filter. Lookups go through the
+    server's normalize_url, so the host checked is the one a browser would
+    connect to; a client in another language must normalize the same way
+    or the allowlist answers for the wrong host.
+    """
+
+    def __init__(self, server, cache_path=None, timeout=5.0, confirm_blocked=True):
+        """
+        Args:
+            server (str): Base URL of the API, e.g. http://localhost:5000
+            cache_path (str, optional): File keeping the last snapshot
+            timeout (float): Seconds to wait for the API
+            confirm_blocked (bool): Ask the API about URLs the blocked filter matches
+        """
+        parts = urlsplit(server)
+        connection = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._conn = connection(parts.hostname, parts.port, timeout=timeout)
+        self._prefix = parts.path.rstrip('/')
+        self.cache_path = cache_path
+        self.confirm_blocked = confirm_blocked
+        self.snapshot = None
+        self.local_hits = 0
+        self.server_calls = 0
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    self.snapshot = FilterSnapshot.from_bytes(f.read())
+            except ValueError as e:
+                logger.warning(f"Ignoring unreadable filter cache {cache_path}: {e}")
+
+    def _request(self, method, path, body=None, headers=None):
+        """Send a request over the kept-alive connection; returns (status, headers, body)."""
+        try:
+            self._conn.request(method, self._prefix + path, body, headers or {})
+            response = self._conn.getresponse()
+            return response.status, response.headers, response.read()
+        except (OSError, http.client.HTTPException):
+            self._conn.close()
+            raise
+
+    def refresh(self):
+        """
+        Bring the snapshot up to date.
+
+        Tries a delta from the version held first and falls back to a
+        conditional download of the whole snapshot.
+
+        Returns:
+            str: 'unchanged', 'delta' or 'full'
+
+        Raises:
+            OSError: If the API cannot be reached
+            ValueError: If the API answers with something other than a filter
+        """
+        if self.snapshot is not None:
+            status, _, body = self._request('GET', f"{DELTA_PATH}?since={quote(self.snapshot.version)}")
+            if status == 304:
+                return 'unchanged'
+            if status == 200:
+                try:
+                    self._store(apply_delta(self.snapshot, body))
+                    return 'delta'
+                except ValueError as e:
+                    logger.warning(f"Discarding domain filter delta: {e}")
+
+        headers = {'If-None-Match': f'"{self.snapshot.version}"'} if self.snapshot is not None else {}
+        status, _, body = self._request('GET', FILTER_PATH, headers=headers)
+        if status == 304:
+            return 'unchanged'
+        if status != 200:
+            raise ValueError(f"Domain filter request failed with status {status}")
+        self._store(FilterSnapshot.from_bytes(body))
+        return 'full'
+
+    def _store(self, snapshot):
+        self.snapshot = snapshot
+        if self.cache_path:
+            # Written aside and renamed, so a crash never leaves half a snapshot
+            partial = f"{self.cache_path}.tmp"
+            with open(partial, 'wb') as f:
+                f.write(snapshot.data)
+            os.replace(partial, self.cache_path)
+
+    def check(self, url):
+        """
+        Look a URL up in the snapshot without contacting the API.
+
+        Returns:
+            str or None: BLOCKED, ALLOWED, or None when the URL is not listed
+        """
+        if self.snapshot is None:
+            return None
+        return self.snapshot.check(url)
+
+    def predict(self, url):
+        """
+        Verdict for a URL, from the filter when it can answer, else from /predict.
+
+        Returns:
+            dict: The /predict response fields, plus 'source' ('filter' or 'server')
+        """
+        listed = self.check(url)
+        if listed == ALLOWED or (listed == BLOCKED and not self.confirm_blocked):
+            self.local_hits += 1
+            # Same shape as a /predict answer for a listed domain
+            result = 'Legitimate' if listed == ALLOWED else 'Phishing'
+            return {'result': result, 'confidence': 1.0, 'url': url, 'source': 'filter'}
+
+        self.server_calls += 1
+        status, _, body = self._request('POST', PREDICT_PATH, json.dumps({'url': url}),
+                                        {'Content-Type': 'application/json'})
+        response = json.loads(body)
+        if status != 200:
+            raise ValueError(response.get('error', f"Prediction failed with status {status}"))
+        response['source'] = 'server'
+        return response
+
+    def stats(self):
+        return {
+            'version': self.snapshot.version if self.snapshot is not None else None,
+            'local_hits': self.local_hits,
+            'server_calls': self.server_calls,
+        }
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Check URLs against the API's domain filter")
+    parser.add_argument('urls', nargs='*', help="URLs to check (default: one per line on stdin)")
+    parser.add_argument('--server', default='http://localhost:5000', help="base URL of the API")
+    parser.add_argument('--cache', help="file keeping the filter between runs")
+    parser.add_argument('--offline', action='store_true',
+                        help="only consult the filter; unlisted URLs are reported as such")
+    parser.add_argument('--no-confirm', action='store_true',
+                        help="trust blocked filter matches without asking the API")
+    args = parser.parse_args()
+
+    client = FilterClient(args.server, args.cache, confirm_blocked=not args.no_confirm)
+    try:
+        logger.info(f"Domain filter refresh: {client.refresh()}")
+    except (OSError, ValueError) as e:
+        if client.snapshot is None:
+            logger.error(f"Could not fetch the domain filter: {e}")
+            sys.exit(1)
+        logger.warning(f"Using cached domain filter {client.snapshot.version}: {e}")
+
+    urls = args.urls or (line.strip() for line in sys.stdin if line.strip())
+    for url in urls:
+        if args.offline:
+            print(json.dumps({'url': url, 'listed': client.check(url)}))
+            continue
+        try:
+            print(json.dumps(client.predict(url)))
+        except (OSError, ValueError) as e:
+            print(json.dumps({'url': url, 'error': str(e)}))
+    logger.info(f"Done: {client.stats()}")
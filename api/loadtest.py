@@ -0,0 +1,140 @@
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import http.client
+import subprocess
+import multiprocessing
+from urllib.parse import urlsplit
+
+from benchmark import load_corpus, API_DIR
+
+def _client(args):
+    """
+    Load-generating process: POST {"url": ...} bodies over one keep-alive connection.
+
+    Returns:
+        tuple: (latencies in seconds of successful requests, error count)
+    """
+    base_url, path, duration, urls, unique, seed = args
+    parts = urlsplit(base_url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    headers = {'Content-Type': 'application/json'}
+    latencies = []
+    errors = 0
+    i = seed
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        url = urls[i % len(urls)]
+        if unique:
+            # A fresh query string defeats the verdict cache so every request runs the model
+            url = f"{url}{'&' if '?' in url else '?'}lt={seed}-{i}"
+        i += 1
+        body = json.dumps({'url': url})
+        start = time.perf_counter()
+        try:
+            conn.request('POST', path, body, headers)
+            response = conn.getresponse()
+            response.read()
+            if 200 <= response.status < 300:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+    conn.close()
+    return latencies, errors
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p))]
+
+def run_load(base_url, concurrency=8, duration=10.0, urls=None, unique=True, path='/predict'):
+    """
+    Send requests to path (/predict by default) from concurrency client
+    processes for duration seconds.
+
+    Returns:
+        dict: Request count, errors, requests/sec and latency percentiles (ms)
+    """
+    urls = urls or load_corpus()
+    jobs = [(base_url, path, duration, urls, unique, n * 1000003) for n in range(concurrency)]
+    start = time.perf_counter()
+    with multiprocessing.Pool(concurrency) as pool:
+        results = pool.map(_client, jobs)
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(latency for client_latencies, _ in results for latency in client_latencies)
+    return {
+        'requests': len(latencies),
+        'errors': sum(errors for _, errors in results),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': _percentile(latencies, 0.50) * 1e3,
+        'p95_ms': _percentile(latencies, 0.95) * 1e3,
+        'p99_ms': _percentile(latencies, 0.99) * 1e3,
+    }
+
+def wait_until_up(base_url, timeout=60.0):
+    parts = urlsplit(base_url)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=2)
+            conn.request('GET', '/')
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not come up within {timeout}s")
+
+def run_scaling(worker_counts, port=5055, duration=10.0, clients_per_worker=2, unique=True):
+    """
+    Start serve.py with each worker count in turn and load it.
+
+    Returns:
+        list: (workers, run_load result) pairs
+    """
+    base_url = f"http://127.0.0.1:{port}"
+    urls = load_corpus()
+    results = []
+    for workers in worker_counts:
+        env = dict(os.environ, WEB_WORKERS=str(workers), WEB_BIND=f"127.0.0.1:{port}")
+        server = subprocess.Popen([sys.executable, 'serve.py'], cwd=API_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(base_url)
+            # Warm up every worker before measuring
+            run_load(base_url, workers * clients_per_worker, 1.0, urls, unique)
+            results.append((workers, run_load(base_url, workers * clients_per_worker, duration, urls, unique)))
+        finally:
+            # SIGTERM is a graceful shutdown: in-flight requests finish first
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load-test POST /predict")
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help="server to load (ignored with --scale)")
+    parser.add_argument('--concurrency', type=int, default=8, help="client processes")
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per measurement")
+    parser.add_argument('--cached', action='store_true', help="repeat corpus URLs so the verdict cache answers")
+    parser.add_argument('--scale', help="comma-separated worker counts to start serve.py with, e.g. 1,2,4")
+    parser.add_argument('--port', type=int, default=5055, help="port for the servers started by --scale")
+    args = parser.parse_args()
+
+    if args.scale:
+        counts = [int(n) for n in args.scale.split(',')]
+        print(f"{os.cpu_count()} CPUs; {args.duration:.0f}s per run, 2 clients per worker")
+        print(f"{'workers':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for workers, r in run_scaling(counts, args.port, args.duration, unique=not args.cached):
+            print(f"{workers:7d} {r['rps']:9.0f} {r['p50_ms']:8.2f} {r['p95_ms']:8.2f} "
+                  f"{r['p99_ms']:8.2f} {r['errors']:7d}")
+    else:
+        r = run_load(args.url, args.concurrency, args.duration, unique=not args.cached)
+        print(f"{r['requests']} requests, {r['errors']} errors: {r['rps']:.0f} req/s, "
+              f"p50 {r['p50_ms']:.2f} ms, p95 {r['p95_ms']:.2f} ms, p99 {r['p99_ms']:.2f} ms")
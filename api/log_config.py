@@ -0,0 +1,129 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+
+# Logging settings, overridable through the environment
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+# 'text' for human-readable lines, 'json' for one JSON object per line
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+# Log file; stderr when unset
+LOG_FILE = os.environ.get('LOG_FILE')
+# Records held for the writer thread before new ones are dropped
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+# Fraction of requests whose per-request lines are logged
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 0.01))
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON, including fields passed through extra=."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            record.exc_text = record.exc_text or self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a writer thread without blocking the caller.
+
+    Unlike QueueHandler, the message is not formatted here but on the
+    writer thread, and records are dropped (and counted) rather than
+    waited on when the queue is full, e.g. because the disk stalls.
+    Arguments are formatted later, so log immutable values.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Tracebacks reference live frames, so only they are rendered now
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+_handler = None
+_listener = None
+
+def configure_logging(level=None):
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Replaces the root logger's handlers; calling it again does nothing.
+    In forked workers the writer thread is started again automatically.
+
+    Args:
+        level (str, optional): Root level, LOG_LEVEL by default
+    """
+    global _handler, _listener
+    if _handler is not None:
+        return
+
+    output = logging.FileHandler(LOG_FILE) if LOG_FILE else logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    _handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    root = logging.getLogger()
+    root.handlers[:] = [_handler]
+    root.setLevel(level or LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_listener)
+
+def _stop_listener():
+    """Write out what is queued, then stop the writer thread."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+def _restart_listener():
+    """Give a forked child its own queue and writer thread; the parent's thread is not copied."""
+    global _listener
+    _handler.queue = queue.Queue(LOG_QUEUE_SIZE)
+    _listener = logging.handlers.QueueListener(_handler.queue, *_listener.handlers,
+                                               respect_handler_level=True)
+    _listener.start()
+
+def sample_request():
+    """
+    Decide whether to log the per-request lines of a request.
+
+    Returns:
+        bool: True for a LOG_SAMPLE_RATE fraction of calls
+    """
+    return random.random() < LOG_SAMPLE_RATE
+
+def log_stats():
+    """Return the log queue depth and drop count as a dict."""
+    if _handler is None:
+        return {'queued': 0, 'dropped': 0, 'sample_rate': LOG_SAMPLE_RATE}
+    return {'queued': _handler.queue.qsize(), 'dropped': _handler.dropped, 'sample_rate': LOG_SAMPLE_RATE}
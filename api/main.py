@@ -1,5 +1,4 @@
 from flask import Flask, request, jsonify
-import pickle
 import numpy as np
 from urllib.parse import urlparse
 import os
@@ -8,7 +7,7 @@ import logging
 import sys
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG, 
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -17,6 +16,7 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'api'))
 
 try:
     from feature_extractor import extract_url_features
+    from model_registry import ModelRegistry, DEFAULT_REGISTRY_DIR
 except ImportError as e:
     logger.error(f"Error importing feature_extractor: {e}")
     # Define a placeholder function if import fails
@@ -24,25 +24,15 @@ except ImportError as e:
         logger.warning("Using placeholder feature extractor")
         return np.zeros((1, 15))
 
-# Define paths relative to the current directory
-model_path = os.path.join(os.path.dirname(__file__), 'api', 'model.pkl')
-scaler_path = os.path.join(os.path.dirname(__file__), 'api', 'scaler.pkl')
-
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 
-# Load the pre-trained model and scaler
+# Serve the active model of the registry, picking up new versions without a restart
 try:
-    with open(model_path, 'rb') as f:
-        model = pickle.load(f)
-    with open(scaler_path, 'rb') as f:
-        scaler = pickle.load(f)
-    logger.info("Model and scaler loaded successfully!")
+    model_registry = ModelRegistry(os.environ.get('MODEL_REGISTRY_DIR', DEFAULT_REGISTRY_DIR))
 except Exception as e:
-    logger.error(f"Error loading model or scaler: {e}")
-    # Initialize empty model and scaler for demonstration if loading fails
-    model = None
-    scaler = None
+    logger.error(f"Error loading model registry: {e}")
+    model_registry = None
 
 @app.route('/predict', methods=['POST'])
 def predict():
@@ -55,7 +45,7 @@ def predict():
             return jsonify({"error": "Missing 'url' in request body"}), 400
             
         url = data['url']
-        logger.debug(f"Received URL for analysis: {url}")
+        logger.debug("Received URL for analysis: %s", url)
         
         domain = urlparse(url).netloc
         
@@ -65,7 +55,11 @@ def predict():
             return jsonify({"error": "Invalid URL"}), 400
         
         # For demonstration, if model failed to load
-        if model is None or scaler is None:
+        scorer = None
+        if model_registry is not None:
+            model_registry.maybe_reload()
+            scorer = model_registry.scorer
+        if scorer is None:
             # Return a random prediction for demonstration
             import random
             result = "Phishing" if random.random() > 0.7 else "Legitimate"
@@ -76,22 +70,10 @@ def predict():
                 "confidence": random.random()
             })
         
-        # Extract features and scale them
+        # Extract features, then scale and score them in one step
         url_features = extract_url_features(url, domain)
-        scaled_features = scaler.transform(url_features)
-        
-        # Make the prediction
-        prediction = model.predict(scaled_features)
-        
-        # Get prediction probability if available
-        confidence = 0.95  # Default high confidence
-        if hasattr(model, 'predict_proba'):
-            try:
-                proba = model.predict_proba(scaled_features)
-                # Get the probability of the predicted class
-                confidence = float(proba[0][int(prediction[0])])
-            except Exception as e:
-                logger.warning(f"Could not get prediction probability: {e}")
+        prediction, confidence = scorer.predict(url_features)
+        confidence = float(confidence[0])
         
         # Return result based on the prediction
         result = "Legitimate" if prediction[0] == 1 else "Phishing"
@@ -113,8 +95,8 @@ def health_check():
     return jsonify({
         "status": "API is running", 
         "endpoints": ["/predict"],
-        "model_loaded": model is not None,
-        "scaler_loaded": scaler is not None
+        "model_loaded": model_registry is not None and model_registry.scorer is not None,
+        "model_version": model_registry.version if model_registry is not None else None
     })
 
 if __name__ == '__main__':
@@ -0,0 +1,406 @@
+import os
+import re
+import json
+import time
+import atexit
+import threading
+import logging
+from contextlib import contextmanager
+from bisect import bisect_left
+
+# Content type of the Prometheus text exposition format
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds, from 10 microseconds to 1 second
+LATENCY_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001,
+                   0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+_NAME_RE = re.compile(r'^[a-zA-Z_][a-zA-Z0-9_]*$')
+
+logger = logging.getLogger(__name__)
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{n}="{v}"' for (n, _), v in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    """Base for metrics with optional labels; children are created per label combination."""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """
+        Child metric for one combination of label values.
+
+        Look children up once and keep them; the lookup is the slow part.
+        """
+        values = tuple(str(v) for v in values)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {values}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def render(self):
+        return self._render_samples(self.samples())
+
+    def _render_samples(self, samples):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, sample in sorted(samples.items()):
+            lines.extend(self._render_sample(values, sample))
+        return lines
+
+    def samples(self):
+        """Current value of each child, by label values."""
+        with self._lock:
+            children = list(self._children.items())
+        return {values: child.sample() for values, child in children}
+
+    def reset(self):
+        """Zero every child, keeping the children handed out by labels()."""
+        with self._lock:
+            children = list(self._children.values())
+        for child in children:
+            child.reset()
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def sample(self):
+        return self.value
+
+    def reset(self):
+        with self._lock:
+            self.value = 0
+
+class Counter(_Metric):
+    """Monotonically increasing count, exposed as <name>_total."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        """Increment a counter without labels."""
+        self._children[()].inc(amount)
+
+    def _render_sample(self, values, value):
+        return [f"{self.name}_total{_format_labels(self.labelnames, values)} {_format_value(value)}"]
+
+    @staticmethod
+    def _merge(a, b):
+        return a + b
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # The last slot counts values above the largest bound
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+
+    def sample(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * len(self.counts)
+            self.sum = 0.0
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets (latencies in seconds by default)."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(float(b) for b in buckets)
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        """Record a value on a histogram without labels."""
+        self._children[()].observe(value)
+
+    def _render_sample(self, values, sample):
+        counts, total = sample
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(self.labelnames, values, [('le', _format_value(bound))])
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+    @staticmethod
+    def _merge(a, b):
+        return [x + y for x, y in zip(a[0], b[0])], a[1] + b[1]
+
+@contextmanager
+def timed(histogram):
+    """
+    Observe how long the with block takes.
+
+    Costs about a microsecond, so meant for slow calls such as database
+    queries; time hot-path steps with time.perf_counter directly.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start)
+
+class StatsGauges:
+    """
+    Gauges read at scrape time from a function returning nested stats dicts.
+
+    Every numeric leaf becomes a gauge named after its path, e.g.
+    {'db_pool': {'in_use': 3}} with prefix 'phishing_api' gives
+    phishing_api_db_pool_in_use 3. Nothing is recorded between scrapes.
+    """
+
+    def __init__(self, prefix, stats):
+        """
+        Args:
+            prefix (str): Prefix of every gauge name
+            stats (callable): Returns a dict of dicts of numbers
+        """
+        self.prefix = prefix
+        self.stats = stats
+
+    def render(self):
+        lines = []
+        for name, value in self.samples():
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_value(value)}")
+        return lines
+
+    def samples(self):
+        """Current (name, value) of every gauge."""
+        return list(self._flatten(self.prefix, self.stats()))
+
+    def _flatten(self, name, value):
+        if isinstance(value, dict):
+            for key, child in value.items():
+                # Keys that cannot be part of a metric name (e.g. histogram bucket labels) are left out
+                if _NAME_RE.match(str(key)):
+                    yield from self._flatten(f"{name}_{key}", child)
+        elif isinstance(value, bool):
+            yield name, int(value)
+        elif isinstance(value, (int, float)):
+            yield name, value
+
+class Registry:
+    """Set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """Add a metric and return it."""
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """
+        Render every metric.
+
+        Returns:
+            str: Prometheus text exposition
+        """
+        lines = []
+        for metric in self.metrics():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def metrics(self):
+        with self._lock:
+            return list(self._metrics)
+
+    def reset(self):
+        """Zero every counter and histogram (e.g. before forking workers)."""
+        for metric in self.metrics():
+            if isinstance(metric, _Metric):
+                metric.reset()
+
+class SharedMetrics:
+    """
+    Totals of one registry across the worker processes of a server.
+
+    Every process writes its counters, histograms and gauges to its own
+    file in a shared directory, every interval seconds and at exit.
+    render() sums the counters and histograms of all files, so a scrape
+    reports the server's totals whichever worker answers it, and totals do
+    not drop when a worker exits. Gauges are per process; they are labelled
+    with the worker's pid and left out for workers that stopped writing.
+    """
+
+    def __init__(self, registry, directory, interval=1.0):
+        """
+        Args:
+            registry (Registry): This process's metrics
+            directory (str): Directory shared by the workers of one server
+            interval (float): Seconds between writes of this process's file
+        """
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self._started_pid = None
+        self._path_pid = None
+        self._path = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def clear(self):
+        """Delete every process's file, e.g. when the server starts."""
+        for name in os.listdir(self.directory):
+            if name.startswith('metrics-'):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def start(self):
+        """Write this process's file now and every interval (call in each worker)."""
+        with self._lock:
+            if self._started_pid == os.getpid():
+                return
+            self._started_pid = os.getpid()
+        self.write()
+        threading.Thread(target=self._run, name='metrics-writer', daemon=True).start()
+        atexit.register(self.write)
+
+    def write(self, gauges=True):
+        """
+        Write this process's current values.
+
+        Args:
+            gauges (bool): Include the gauges; off for a process that forks
+                workers and serves nothing itself
+        """
+        data = {'pid': os.getpid(), 'metrics': {}, 'gauges': []}
+        for metric in self.registry.metrics():
+            if isinstance(metric, _Metric):
+                data['metrics'][metric.name] = [[list(values), sample]
+                                                for values, sample in metric.samples().items()]
+            elif gauges and isinstance(metric, StatsGauges):
+                data['gauges'].extend(metric.samples())
+        with self._lock:
+            if self._path_pid != os.getpid():
+                # A random part keeps a reused pid from overwriting a dead worker's totals
+                self._path_pid = os.getpid()
+                self._path = os.path.join(self.directory, f"metrics-{self._path_pid}-{os.urandom(4).hex()}.json")
+            partial = f"{self._path}.tmp"
+            with open(partial, 'w') as f:
+                json.dump(data, f)
+            # Renamed into place so readers never see half a file
+            os.replace(partial, self._path)
+
+    def render(self):
+        """
+        Render the totals of every process that wrote to the directory.
+
+        Returns:
+            str: Prometheus text exposition
+        """
+        self.write()
+        metrics = {metric.name: metric for metric in self.registry.metrics() if isinstance(metric, _Metric)}
+        fresh_after = time.time() - max(5.0, 3 * self.interval)
+        totals = {name: {} for name in metrics}
+        gauges = {}  # name -> [(pid, value)]
+        for name in sorted(os.listdir(self.directory)):
+            if not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+                modified = os.stat(path).st_mtime
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics file {path}: {e}")
+                continue
+            for metric_name, samples in data['metrics'].items():
+                if metric_name not in metrics:
+                    continue
+                merged = totals[metric_name]
+                for values, sample in samples:
+                    values = tuple(values)
+                    merged[values] = metrics[metric_name]._merge(merged[values], sample) if values in merged else sample
+            if modified >= fresh_after:
+                for gauge_name, value in data['gauges']:
+                    gauges.setdefault(gauge_name, []).append((data['pid'], value))
+
+        lines = []
+        for metric_name, metric in metrics.items():
+            lines.extend(metric._render_samples(totals[metric_name]))
+        for gauge_name, values in gauges.items():
+            lines.append(f"# TYPE {gauge_name} gauge")
+            lines.extend(f"{gauge_name}{_format_labels(('pid',), (pid,))} {_format_value(value)}"
+                         for pid, value in values)
+        return '\n'.join(lines) + '\n'
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.write()
+            except OSError as e:
+                logger.warning(f"Could not write metrics to {self.directory}: {e}")
+
+# Metrics of this process; with several workers each one has its own, and
+# SharedMetrics adds them up
+REGISTRY = Registry()
@@ -0,0 +1,193 @@
+import os
+import time
+import queue
+import atexit
+import threading
+import logging
+from concurrent.futures import Future
+
+from metrics import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+# Upper bounds (seconds) of the queueing delay histogram buckets
+QUEUE_DELAY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.025, 0.05, 0.1)
+
+class BatcherClosed(RuntimeError):
+    """Raised for items submitted to, or left queued in, a closed batcher."""
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item calls into one batched call.
+
+    Callers submit one item each and get a Future. A background thread
+    waits for the first item, keeps collecting until max_batch_size items
+    are queued or max_wait has passed since that first item, then runs
+    them all through one call of the batch function and resolves each
+    caller's Future with its own result. Once closed it takes no more
+    items, and items it could not run fail instead of waiting forever.
+    """
+
+    def __init__(self, fn, max_batch_size=32, max_wait=0.002, name='micro-batcher',
+                 result_timeout=30.0, metric_prefix='micro_batcher'):
+        """
+        Args:
+            fn (callable): Takes a list of items, returns a list of results in the same order
+            max_batch_size (int): Maximum items per call of fn
+            max_wait (float): Seconds the first item of a batch may wait for more
+            name (str): Name of the background thread
+            result_timeout (float): Seconds a caller waits for its result
+            metric_prefix (str): Prefix of the batch size and queueing delay histograms
+        """
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self.result_timeout = result_timeout
+        self.batch_sizes = Histogram(f'{metric_prefix}_batch_size', "Items per batched call",
+                                     buckets=BATCH_SIZE_BUCKETS)
+        self.queue_delays = Histogram(f'{metric_prefix}_queue_delay_seconds',
+                                      "Time items wait before their batch runs", buckets=QUEUE_DELAY_BUCKETS)
+        self._lock = threading.Lock()
+        self._reset()
+        atexit.register(self.close)
+
+    def _reset(self):
+        """Start over with an empty queue and no worker (used at init and after a fork)."""
+        self._pid = os.getpid()
+        self._queue = queue.Queue()
+        self._worker = None
+        self._stopping = threading.Event()
+        self._closed = False
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.queue_delay_total = 0.0
+        self.queue_delay_max = 0.0
+
+    def submit(self, item):
+        """
+        Queue an item for the next batch.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the item's result
+
+        Raises:
+            BatcherClosed: If the batcher has been closed
+        """
+        self._ensure_worker()
+        future = Future()
+        with self._lock:
+            # Checked under the lock so close() cannot slip in before the put
+            if self._closed:
+                raise BatcherClosed(f"{self.name} is closed")
+            self._queue.put((item, future, time.perf_counter()))
+        return future
+
+    def __call__(self, item):
+        """
+        Submit an item and wait for its result.
+
+        Raises:
+            BatcherClosed: If the batcher is closed before running the item
+            concurrent.futures.TimeoutError: If no result arrives within result_timeout
+        """
+        return self.submit(item).result(self.result_timeout)
+
+    def close(self, timeout=5.0):
+        """Stop taking items, run what is queued, and fail whatever is left after timeout."""
+        if os.getpid() != self._pid:
+            return
+        with self._lock:
+            self._closed = True
+            worker = self._worker
+        if worker is not None:
+            self._stopping.set()
+            worker.join(timeout)
+        while True:
+            try:
+                _, future, _ = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            future.set_exception(BatcherClosed(f"{self.name} closed before running the item"))
+
+    def stats(self):
+        """Return batch size and queueing delay metrics as a dict."""
+        with self._lock:
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1e3,
+                'queued': self._queue.qsize(),
+                'batches': self.batches,
+                'items': self.items,
+                'errors': self.errors,
+                'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+                'mean_queue_delay_ms': self.queue_delay_total / self.items * 1e3 if self.items else 0.0,
+                'max_queue_delay_ms': self.queue_delay_max * 1e3,
+            }
+
+    def _ensure_worker(self):
+        """Start the worker thread on first use (and again in a forked child)."""
+        if self._worker is not None and os.getpid() == self._pid:
+            return
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reset()
+            if self._worker is None and not self._closed:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._run_batch(batch)
+            elif self._stopping.is_set():
+                return
+
+    def _next_batch(self):
+        """Wait for one item, then collect more until the batch is full or max_wait has passed."""
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first[2] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    # Past the deadline: still take whatever is already queued
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        try:
+            results = self.fn([item for item, _, _ in batch])
+        except Exception as e:
+            logger.error(f"Batch of {len(batch)} items failed: {e}", exc_info=True)
+            for _, future, _ in batch:
+                future.set_exception(e)
+            with self._lock:
+                self.errors += 1
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+        self.batch_sizes.observe(len(batch))
+        with self._lock:
+            self.batches += 1
+            self.items += len(batch)
+            for _, _, enqueued_at in batch:
+                delay = started - enqueued_at
+                self.queue_delay_total += delay
+                self.queue_delay_max = max(self.queue_delay_max, delay)
+                self.queue_delays.observe(delay)
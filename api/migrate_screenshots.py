@@ -0,0 +1,90 @@
+import os
+import sys
+import logging
+import argparse
+
+import mysql.connector
+
+from db import DB_CONFIG
+from blob_store import BlobStore, DEFAULT_SCREENSHOT_DIR
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def migrate_screenshots(store, batch_size=100, keep_blobs=False):
+    """
+    Move screenshots stored inline in phishing_reports into the blob store.
+
+    Rows are processed in id order, one batch per transaction, so the
+    migration can be interrupted and re-run. Blobs already in the store are
+    deduplicated by hash.
+
+    Args:
+        store (BlobStore): Destination blob store
+        batch_size (int): Rows read and updated per transaction
+        keep_blobs (bool): Leave the inline copy in place instead of clearing it
+
+    Returns:
+        int: Number of rows migrated
+    """
+    # Rows copied earlier with keep_blobs still hold the inline copy; a run
+    # without keep_blobs picks them up again and clears it
+    pending = "screenshot IS NOT NULL"
+    if keep_blobs:
+        pending += " AND screenshot_hash IS NULL"
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    migrated = 0
+    last_id = 0
+    try:
+        while True:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT id, screenshot FROM phishing_reports "
+                f"WHERE id > %s AND {pending} ORDER BY id LIMIT %s",
+                (last_id, batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                cursor.close()
+                break
+
+            for report_id, blob in rows:
+                digest, size = store.put_bytes(bytes(blob))
+                if keep_blobs:
+                    cursor.execute(
+                        "UPDATE phishing_reports SET screenshot_hash=%s WHERE id=%s",
+                        (digest, report_id)
+                    )
+                else:
+                    cursor.execute(
+                        "UPDATE phishing_reports SET screenshot_hash=%s, screenshot=NULL WHERE id=%s",
+                        (digest, report_id)
+                    )
+                logger.debug(f"Report {report_id}: {size} bytes -> {digest}")
+            conn.commit()
+            cursor.close()
+
+            migrated += len(rows)
+            last_id = rows[-1][0]
+            logger.info(f"Migrated {migrated} screenshots (up to report {last_id})")
+    finally:
+        conn.close()
+    return migrated
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Move inline report screenshots into the blob store")
+    parser.add_argument('--store', default=os.environ.get('SCREENSHOT_DIR', DEFAULT_SCREENSHOT_DIR),
+                        help="blob store directory")
+    parser.add_argument('--batch-size', type=int, default=100, help="rows per transaction")
+    parser.add_argument('--keep-blobs', action='store_true',
+                        help="keep the inline copies (clear them later with another run)")
+    args = parser.parse_args()
+
+    try:
+        count = migrate_screenshots(BlobStore(args.store), args.batch_size, args.keep_blobs)
+    except mysql.connector.Error as e:
+        logger.error(f"Migration failed: {e}")
+        sys.exit(1)
+    logger.info(f"Done: {count} screenshots migrated to {args.store}")
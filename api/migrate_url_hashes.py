@@ -0,0 +1,166 @@
+import sys
+import logging
+import argparse
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from db import DB_CONFIG
+from verdict_cache import url_key
+
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Columns keying each table by normalized URL; the API and feature_loader.py
+# add them too, this only covers databases neither has touched yet
+SCHEMA_CHANGES = [
+    "ALTER TABLE phishing_reports ADD COLUMN normalized_url TEXT NULL AFTER url, "
+    "ADD COLUMN url_hash BINARY(32) NULL AFTER normalized_url, "
+    "ADD COLUMN report_count INT NOT NULL DEFAULT 1, "
+    "ADD COLUMN last_reported_at TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP AFTER reported_at, "
+    "ADD UNIQUE KEY uq_url_hash (url_hash)",
+    "ALTER TABLE phishing_features ADD COLUMN normalized_url varchar(2048) NULL AFTER url, "
+    "ADD COLUMN url_hash binary(32) NULL AFTER normalized_url, "
+    "ADD UNIQUE KEY uq_url_hash (url_hash)",
+]
+
+# Folds a duplicate report (second id) into the row keeping its URL (first
+# id): counts add up, the most advanced review status wins, and what the
+# kept row is missing is taken from the duplicate
+MERGE_REPORT = (
+    "UPDATE phishing_reports t JOIN phishing_reports d ON d.id = %s "
+    "SET t.status = IF(d.status + 0 > t.status + 0, d.status, t.status), "
+    "t.report_count = t.report_count + d.report_count, "
+    "t.description = COALESCE(t.description, d.description), "
+    "t.screenshot_hash = COALESCE(t.screenshot_hash, d.screenshot_hash), "
+    "t.screenshot = COALESCE(t.screenshot, d.screenshot), "
+    "t.reported_at = LEAST(COALESCE(t.reported_at, d.reported_at), COALESCE(d.reported_at, t.reported_at)), "
+    "t.last_reported_at = GREATEST(COALESCE(t.last_reported_at, t.reported_at, d.reported_at), "
+    "COALESCE(d.last_reported_at, d.reported_at, t.reported_at)) "
+    "WHERE t.id = %s"
+)
+
+def _ensure_schema(conn):
+    cursor = conn.cursor()
+    for statement in SCHEMA_CHANGES:
+        try:
+            cursor.execute(statement)
+        except mysql.connector.Error as e:
+            if e.errno != errorcode.ER_DUP_FIELDNAME:
+                raise
+    cursor.close()
+
+def key_rows(conn, table, batch_size=1000):
+    """
+    Fill in normalized_url and url_hash for the rows of a table that lack them.
+
+    Rows are processed in id order, one batch per transaction, so the
+    migration can be interrupted and re-run. A row whose URL is already
+    held by another row is merged into it: reports add up their counts
+    (see MERGE_REPORT), duplicate feature rows are dropped.
+
+    Args:
+        conn: Database connection
+        table (str): 'phishing_reports' or 'phishing_features'
+        batch_size (int): Rows read and updated per transaction
+
+    Returns:
+        tuple: (rows keyed, rows merged into another)
+    """
+    keyed = merged = 0
+    last_id = 0
+    # Reports from before the migration got the migration time as last_reported_at
+    reset_last_reported = ", last_reported_at = reported_at" if table == 'phishing_reports' else ""
+    while True:
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT id, url FROM {table} WHERE id > %s AND url_hash IS NULL ORDER BY id LIMIT %s",
+            (last_id, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            cursor.close()
+            break
+
+        keys = [(row_id, *url_key(url)) for row_id, url in rows]
+        digests = list({digest for _, _, digest in keys})
+        cursor.execute(
+            f"SELECT id, url_hash FROM {table} WHERE url_hash IN ({', '.join(['%s'] * len(digests))})",
+            digests
+        )
+        owners = {bytes(digest): row_id for row_id, digest in cursor.fetchall()}
+
+        for row_id, normalized, digest in keys:
+            owner = owners.get(digest)
+            if owner is None:
+                cursor.execute(
+                    f"UPDATE {table} SET normalized_url=%s, url_hash=%s{reset_last_reported} WHERE id=%s",
+                    (normalized, digest, row_id)
+                )
+                owners[digest] = row_id
+                keyed += 1
+                continue
+            if table == 'phishing_reports':
+                cursor.execute(MERGE_REPORT, (row_id, owner))
+            cursor.execute(f"DELETE FROM {table} WHERE id=%s", (row_id,))
+            logger.debug(f"{table} row {row_id} merged into {owner}")
+            merged += 1
+        conn.commit()
+        cursor.close()
+
+        last_id = rows[-1][0]
+        logger.info(f"{table}: {keyed} rows keyed, {merged} merged (up to id {last_id})")
+    return keyed, merged
+
+def migrate_url_hashes(batch_size=1000):
+    """
+    Key existing reports and features by normalized URL hash.
+
+    Returns:
+        dict: (rows keyed, rows merged) per table
+    """
+    conn = mysql.connector.connect(**DB_CONFIG)
+    try:
+        _ensure_schema(conn)
+        results = {table: key_rows(conn, table, batch_size) for table in ('phishing_reports', 'phishing_features')}
+        if results['phishing_reports'][1]:
+            # Merged reports may have changed status; have the API workers
+            # re-read their Blacklisted URLs
+            cursor = conn.cursor()
+            try:
+                cursor.execute("UPDATE listing_version SET version = version + 1 WHERE id = 1")
+                conn.commit()
+            except mysql.connector.Error as e:
+                if e.errno != errorcode.ER_NO_SUCH_TABLE:
+                    raise
+            finally:
+                cursor.close()
+        if results['phishing_features'][1]:
+            # Dropped feature rows are still counted in domain_analysis; have
+            # domain_analysis.py rebuild it on its next run
+            cursor = conn.cursor()
+            try:
+                cursor.execute("UPDATE domain_analysis_watermark SET last_id = NULL")
+                conn.commit()
+            except mysql.connector.Error as e:
+                if e.errno != errorcode.ER_NO_SUCH_TABLE:
+                    raise
+            finally:
+                cursor.close()
+    finally:
+        conn.close()
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Key reports and features by normalized URL hash")
+    parser.add_argument('--batch-size', type=int, default=1000, help="rows per transaction")
+    args = parser.parse_args()
+
+    try:
+        results = migrate_url_hashes(args.batch_size)
+    except mysql.connector.Error as e:
+        logger.error(f"Migration failed: {e}")
+        sys.exit(1)
+    for table, (keyed, merged) in results.items():
+        logger.info(f"Done: {table}: {keyed} rows keyed, {merged} duplicates merged")
@@ -0,0 +1,418 @@
+import os
+import json
+import time
+import pickle
+import shutil
+import hashlib
+import tempfile
+import threading
+import logging
+from datetime import datetime, timezone
+
+from feature_extractor import NUM_FEATURES, FEATURE_EXTRACTOR_VERSION
+from scorer import build_scorer, LinearScorer, save_linear_scorer, load_linear_scorer
+
+logger = logging.getLogger(__name__)
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Default registry location, next to the API code
+DEFAULT_REGISTRY_DIR = os.path.join(API_DIR, 'models')
+
+# Loose model files imported into an empty registry, in order of preference:
+# next to the API code, then in the repository root
+LEGACY_MODEL_PATHS = [
+    (os.path.join(API_DIR, 'model.pkl'), os.path.join(API_DIR, 'scaler.pkl')),
+    (os.path.join(os.path.dirname(API_DIR), 'model.pkl'), os.path.join(os.path.dirname(API_DIR), 'scaler.pkl')),
+]
+
+# Per-version manifest and the registry-wide pointer to the active version
+MANIFEST_FILE = 'manifest.json'
+ACTIVE_FILE = 'active.json'
+
+# Artifact formats: linear models as NumPy arrays, anything else pickled
+LINEAR_NPZ = 'linear-npz'
+PICKLE = 'pickle'
+
+class IncompatibleModel(ValueError):
+    """Raised when a model artifact does not match the running feature extractor."""
+
+def _sha256(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def _write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _model_features(model, scaler):
+    """Number of input features a model and scaler pair expects."""
+    n = getattr(scaler, 'n_features_in_', None)
+    if n is None and getattr(model, 'coef_', None) is not None:
+        n = model.coef_.shape[1]
+    return n
+
+def list_versions(root=DEFAULT_REGISTRY_DIR):
+    """Return the published version names, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root)
+                  if os.path.exists(os.path.join(root, name, MANIFEST_FILE)))
+
+def read_manifest(root, version):
+    """Return the manifest of a version as a dict."""
+    with open(os.path.join(root, version, MANIFEST_FILE)) as f:
+        return json.load(f)
+
+def read_active(root=DEFAULT_REGISTRY_DIR):
+    """
+    Read the active version pointer.
+
+    Returns:
+        dict or None: {'active': version, 'previous': version or None}
+    """
+    try:
+        with open(os.path.join(root, ACTIVE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def set_active(root, version, previous=None):
+    """Point the registry at a version, remembering the one to roll back to."""
+    if previous is None:
+        pointer = read_active(root)
+        previous = pointer['active'] if pointer and pointer['active'] != version else None
+    _write_json_atomic(os.path.join(root, ACTIVE_FILE), {'active': version, 'previous': previous})
+
+def publish_model(model, scaler, root=DEFAULT_REGISTRY_DIR, metrics=None, notes=None, activate=True,
+                  feature_version=FEATURE_EXTRACTOR_VERSION, artifact_format=None):
+    """
+    Add a model and scaler to the registry as a new version.
+
+    Models that fold into a LinearScorer are stored as a NumPy .npz
+    archive, which loads without sklearn or pickle; other models are
+    pickled. The version directory is written under a temporary name and
+    renamed into place, so watchers never see a half-written artifact.
+
+    Args:
+        model: Fitted classifier
+        scaler: Fitted scaler applied before the classifier
+        root (str): Registry directory
+        metrics (dict, optional): Evaluation metrics to record
+        notes (str, optional): Free-form description (e.g. the training sources)
+        activate (bool): Make the new version the active one
+        feature_version (int): Feature extractor version the model was trained with
+        artifact_format (str, optional): LINEAR_NPZ or PICKLE; chosen from the model by default
+
+    Returns:
+        str: The new version name
+
+    Raises:
+        IncompatibleModel: If the model does not take NUM_FEATURES features
+        ValueError: If LINEAR_NPZ is requested for a model that is not linear
+    """
+    num_features = _model_features(model, scaler)
+    if num_features != NUM_FEATURES:
+        raise IncompatibleModel(f"Model takes {num_features} features, the extractor produces {NUM_FEATURES}")
+
+    os.makedirs(root, exist_ok=True)
+    versions = list_versions(root)
+    version = f"v{int(versions[-1][1:]) + 1 if versions else 1:04d}"
+
+    scorer = build_scorer(model, scaler)
+    if artifact_format is None:
+        artifact_format = LINEAR_NPZ if isinstance(scorer, LinearScorer) else PICKLE
+    elif artifact_format == LINEAR_NPZ and not isinstance(scorer, LinearScorer):
+        raise ValueError(f"{type(model).__name__} cannot be stored as {LINEAR_NPZ}")
+
+    tmp_dir = tempfile.mkdtemp(prefix='.publish-', dir=root)
+    try:
+        files = {}
+        if artifact_format == LINEAR_NPZ:
+            path = os.path.join(tmp_dir, 'model.npz')
+            save_linear_scorer(scorer, path, {'version': version, 'model_type': type(model).__name__})
+            files['model.npz'] = _sha256(path)
+        else:
+            for name, obj in (('model.pkl', model), ('scaler.pkl', scaler)):
+                path = os.path.join(tmp_dir, name)
+                with open(path, 'wb') as f:
+                    pickle.dump(obj, f)
+                files[name] = _sha256(path)
+        _write_json_atomic(os.path.join(tmp_dir, MANIFEST_FILE), {
+            'version': version,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'format': artifact_format,
+            'model_type': type(model).__name__,
+            'scaler_type': type(scaler).__name__,
+            'num_features': num_features,
+            'feature_extractor_version': feature_version,
+            'metrics': metrics or {},
+            'notes': notes,
+            'files': files,
+        })
+        os.rename(tmp_dir, os.path.join(root, version))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"Published model {version} to {root}")
+    if activate:
+        set_active(root, version)
+    return version
+
+def model_available(root=DEFAULT_REGISTRY_DIR):
+    """Whether the API has a model to serve: an active version, or loose files it would import."""
+    if read_active(root) is not None:
+        return True
+    return any(os.path.exists(model_path) and os.path.exists(scaler_path)
+               for model_path, scaler_path in LEGACY_MODEL_PATHS)
+
+def import_legacy_model(root, model_path, scaler_path):
+    """
+    Publish a loose model.pkl/scaler.pkl pair as the first registry version.
+
+    Returns:
+        str or None: The new version, or None if the files do not exist
+    """
+    if not (os.path.exists(model_path) and os.path.exists(scaler_path)):
+        return None
+    with open(model_path, 'rb') as f:
+        model = pickle.load(f)
+    with open(scaler_path, 'rb') as f:
+        scaler = pickle.load(f)
+    return publish_model(model, scaler, root, notes=f"Imported from {model_path}")
+
+def load_version(root, version):
+    """
+    Load and validate one registry version.
+
+    Returns:
+        tuple: (scorer, manifest)
+
+    Raises:
+        IncompatibleModel: If the version does not match the feature extractor
+        ValueError: If an artifact file does not match its manifest checksum
+    """
+    manifest = read_manifest(root, version)
+    if manifest['num_features'] != NUM_FEATURES:
+        raise IncompatibleModel(f"Model {version} takes {manifest['num_features']} features, "
+                                f"the extractor produces {NUM_FEATURES}")
+    if manifest['feature_extractor_version'] != FEATURE_EXTRACTOR_VERSION:
+        raise IncompatibleModel(f"Model {version} was trained with feature extractor version "
+                                f"{manifest['feature_extractor_version']}, running {FEATURE_EXTRACTOR_VERSION}")
+
+    for name, checksum in manifest['files'].items():
+        path = os.path.join(root, version, name)
+        if _sha256(path) != checksum:
+            raise ValueError(f"{path} does not match its manifest checksum")
+
+    if manifest.get('format', PICKLE) == LINEAR_NPZ:
+        # Plain arrays: no pickle, and sklearn is never imported
+        scorer, _ = load_linear_scorer(os.path.join(root, version, 'model.npz'))
+        if scorer.n_features != NUM_FEATURES:
+            raise IncompatibleModel(f"Model {version} artifacts do not take {NUM_FEATURES} features")
+        return scorer, manifest
+
+    # Unpickling imports sklearn on demand for the model classes
+    objects = {}
+    for name in ('model.pkl', 'scaler.pkl'):
+        with open(os.path.join(root, version, name), 'rb') as f:
+            objects[name] = pickle.load(f)
+    model, scaler = objects['model.pkl'], objects['scaler.pkl']
+    if _model_features(model, scaler) != NUM_FEATURES:
+        raise IncompatibleModel(f"Model {version} artifacts do not take {NUM_FEATURES} features")
+    return build_scorer(model, scaler), manifest
+
+class _Loaded:
+    """A loaded version; replaced as a whole on swap."""
+
+    __slots__ = ('scorer', 'manifest', 'version')
+
+    def __init__(self, scorer, manifest):
+        self.scorer = scorer
+        self.manifest = manifest
+        self.version = manifest['version']
+
+class ModelRegistry:
+    """
+    Serves the active model of a registry directory and hot-swaps it.
+
+    Requests read the current scorer through a single attribute, so a swap
+    never blocks them: a new version is loaded and validated first, then
+    replaces the current one in one assignment. The replaced version stays
+    loaded for an instant rollback. Changes of the active pointer (made by
+    the trainer or another worker) are noticed by maybe_reload and loaded
+    in a background thread.
+    """
+
+    def __init__(self, root=DEFAULT_REGISTRY_DIR, poll_interval=5.0, on_swap=None):
+        """
+        Args:
+            root (str): Registry directory
+            poll_interval (float): Seconds between checks of the active pointer
+            on_swap (callable, optional): Called after the serving model changes
+        """
+        self.root = root
+        self.poll_interval = poll_interval
+        self.on_swap = on_swap
+        self._current = None
+        self._previous = None
+        self._pointer_mtime = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    @property
+    def scorer(self):
+        """Scorer of the serving version, or None if no model is loaded."""
+        current = self._current
+        return current.scorer if current is not None else None
+
+    @property
+    def version(self):
+        """Name of the serving version, or None."""
+        current = self._current
+        return current.version if current is not None else None
+
+    def reload(self):
+        """
+        Load the version the active pointer names, if it is not already serving.
+
+        A version that fails to load or validate is logged and the current
+        one keeps serving.
+
+        Returns:
+            bool: True if the serving model changed
+        """
+        with self._lock:
+            return self._reload()
+
+    def maybe_reload(self):
+        """Start a background reload if the active pointer changed; checked at most every poll_interval."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.poll_interval
+        if self._pointer_mtime_ns() == self._pointer_mtime:
+            return False
+        if not self._lock.acquire(blocking=False):
+            return False
+
+        def run():
+            try:
+                self._reload()
+            finally:
+                self._lock.release()
+        threading.Thread(target=run, name='model-reload', daemon=True).start()
+        return True
+
+    def activate(self, version):
+        """
+        Load a version, serve it and make it the active one.
+
+        Raises:
+            IncompatibleModel: If the version does not match the feature extractor
+            FileNotFoundError: If the version does not exist
+        """
+        with self._lock:
+            if self._current is not None and self._current.version == version:
+                return
+            loaded = _Loaded(*load_version(self.root, version))
+            set_active(self.root, version, previous=self.version)
+            self._swap(loaded)
+
+    def rollback(self):
+        """
+        Serve the previously loaded version again.
+
+        Raises:
+            ValueError: If there is no previous version loaded
+        """
+        with self._lock:
+            if self._previous is None:
+                raise ValueError("No previous model version to roll back to")
+            set_active(self.root, self._previous.version, previous=self.version)
+            self._swap(self._previous)
+
+    def stats(self):
+        """Return the serving and rollback versions as a dict."""
+        current, previous = self._current, self._previous
+        return {
+            'active': current.version if current is not None else None,
+            'previous': previous.version if previous is not None else None,
+            'model_type': current.manifest.get('model_type') if current is not None else None,
+            'metrics': current.manifest.get('metrics', {}) if current is not None else {},
+        }
+
+    def _reload(self):
+        self._pointer_mtime = self._pointer_mtime_ns()
+        pointer = read_active(self.root)
+        if pointer is None:
+            logger.warning(f"No active model in {self.root}")
+            return False
+        version = pointer['active']
+        if self._current is not None and self._current.version == version:
+            return False
+        try:
+            loaded = _Loaded(*load_version(self.root, version))
+        except Exception as e:
+            logger.error(f"Could not load model {version}, keeping {self.version}: {e}")
+            return False
+        self._swap(loaded)
+        return True
+
+    def _swap(self, loaded):
+        self._previous, self._current = self._current, loaded
+        self._pointer_mtime = self._pointer_mtime_ns()
+        previous = self._previous.version if self._previous is not None else None
+        logger.info(f"Serving model {loaded.version} (previous: {previous})")
+        if self.on_swap is not None:
+            self.on_swap()
+
+    def _pointer_mtime_ns(self):
+        try:
+            return os.stat(os.path.join(self.root, ACTIVE_FILE)).st_mtime_ns
+        except OSError:
+            return None
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Manage the model registry")
+    parser.add_argument('--registry', default=os.environ.get('MODEL_REGISTRY_DIR', DEFAULT_REGISTRY_DIR),
+                        help="registry directory")
+    commands = parser.add_subparsers(dest='command', required=True)
+    publish = commands.add_parser('publish', help="export a pickled model and scaler as a new version")
+    publish.add_argument('model', help="model.pkl to export")
+    publish.add_argument('scaler', help="scaler.pkl to export")
+    publish.add_argument('--no-activate', action='store_true', help="do not serve the new version")
+    activate = commands.add_parser('activate', help="serve a published version")
+    activate.add_argument('version')
+    commands.add_parser('list', help="show published versions")
+    args = parser.parse_args()
+
+    if args.command == 'publish':
+        with open(args.model, 'rb') as f:
+            model = pickle.load(f)
+        with open(args.scaler, 'rb') as f:
+            scaler = pickle.load(f)
+        publish_model(model, scaler, args.registry, notes=f"Exported from {args.model}",
+                      activate=not args.no_activate)
+    elif args.command == 'activate':
+        load_version(args.registry, args.version)
+        set_active(args.registry, args.version)
+        logger.info(f"Activated model {args.version}")
+    else:
+        pointer = read_active(args.registry) or {}
+        for version in list_versions(args.registry):
+            manifest = read_manifest(args.registry, version)
+            marker = '*' if version == pointer.get('active') else ' '
+            print(f"{marker} {version}  {manifest['created_at']}  {manifest.get('format', PICKLE):10}  "
+                  f"{manifest['model_type']:20}  {json.dumps(manifest['metrics'])}")
@@ -1,116 +1,470 @@
-import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import accuracy_score, classification_report
-import pickle
 import os
+import csv
+import sys
+import time
+import pickle
 import logging
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import SGDClassifier
+
+from feature_extractor import extract_url_features_many
+from feature_store import FeatureStore, hash_urls, DEFAULT_FEATURE_STORE_DIR
+from model_registry import publish_model, read_active, load_version, DEFAULT_REGISTRY_DIR
+from scorer import build_scorer
 
-logging.basicConfig(level=logging.INFO, 
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is then not reported
+    resource = None
+
+logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def train_model():
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(API_DIR)
+
+# Class labels, as used by the API: 1 for legitimate, 0 for phishing
+PHISHING = 0
+LEGITIMATE = 1
+LABEL_NAMES = {'phishing': PHISHING, 'legitimate': LEGITIMATE}
+
+# Numeric label columns follow no single convention (phishing-urls.csv uses
+# 1 for phishing, the API the opposite), so their meaning must be given
+NUMERIC_LABELS = ('0', '1')
+
+# Labeled URL lists in the repository, as path[:label] source specs. Both
+# are phishing URLs: training also needs a list of legitimate ones
+DEFAULT_SOURCES = [
+    os.path.join(ROOT_DIR, '1000-phishing.txt') + ':phishing',
+    os.path.join(ROOT_DIR, 'phishing-urls.csv') + ':phishing',
+]
+
+# URLs read from one source per chunk
+DEFAULT_CHUNK_SIZE = 10000
+
+# Training progress kept between runs so new data is learned incrementally
+STATE_FILE = 'trainer_state.pkl'
+
+# One URL in HOLDOUT_MODULUS (by URL hash) is kept out of training for evaluation
+HOLDOUT_MODULUS = 10
+
+# Rows read from the feature store per block; blocks are visited in random order
+STORE_BLOCK_ROWS = 4096
+
+def parse_source(spec):
+    """
+    Split a source spec of the form path[:label].
+
+    The label is a class name (phishing or legitimate) for every URL in
+    the file, or, for a CSV file whose label column holds 0/1, which class
+    1 stands for, e.g. data.csv:1=phishing. Without a label, a CSV label
+    column must hold class names.
+
+    Returns:
+        tuple: (path, class label, {column value: class label}, or None)
+
+    Raises:
+        ValueError: If a numeric label mapping names no known class
+    """
+    path, sep, label = spec.rpartition(':')
+    label = label.lower()
+    if sep and label in LABEL_NAMES:
+        return path, LABEL_NAMES[label]
+    value, eq, name = label.partition('=')
+    if sep and eq and value in NUMERIC_LABELS:
+        if name not in LABEL_NAMES:
+            raise ValueError(f"Unknown class {name!r} in {spec}; use phishing or legitimate")
+        other = NUMERIC_LABELS[1 - NUMERIC_LABELS.index(value)]
+        return path, {value: LABEL_NAMES[name], other: 1 - LABEL_NAMES[name]}
+    return spec, None
+
+def _column_label(value, classes, path):
+    """Class label of a CSV label column value, given the source's mapping (or None)."""
+    value = value.strip().lower()
+    label = (classes or LABEL_NAMES).get(value)
+    if label is not None:
+        return label
+    if classes is None and value in NUMERIC_LABELS:
+        raise ValueError(f"{path} has numeric labels; say which class 1 is, as "
+                         f"{path}:1=phishing or {path}:1=legitimate")
+    raise ValueError(f"Unknown label {value!r} in {path}")
+
+def _csv_url(row):
+    """Return the URL of a CSV row, rebuilding it from split columns if needed."""
+    url = row.get('URL') or row.get('url')
+    if url:
+        return url
+    if row.get('Domain'):
+        # phishing-urls.csv stores Protocol, Domain and Path separately
+        return f"{row.get('Protocol') or 'http'}://{row['Domain']}{row.get('Path') or ''}"
+    return None
+
+def iter_source_chunks(path, label=None, start=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream labeled URLs from a text or CSV file in chunks.
+
+    Text files hold one URL per line. CSV files need a URL column (or
+    Protocol/Domain/Path columns) and, when no label is given, a label
+    column. Quoted fields spanning several lines are not supported.
+
+    Args:
+        path (str): File to read
+        label (int or dict, optional): Label of every URL in the file, or
+            the class of each value of the CSV label column
+        start (int): Byte offset to resume from
+        chunk_size (int): URLs per chunk
+
+    Yields:
+        tuple: (list of URLs, list of labels, byte offset after the chunk)
     """
-    Train a machine learning model to detect phishing URLs.
-    This is provided as an example and would need a dataset to run.
+    is_csv = path.lower().endswith('.csv')
+    with open(path, 'rb') as f:
+        header = None
+        if is_csv:
+            header_line = f.readline()
+            header = next(csv.reader([header_line.decode('utf-8-sig')]))
+            if not isinstance(label, int) and 'label' not in header:
+                raise ValueError(f"{path} has no label column; give a label as {path}:phishing|legitimate")
+            start = max(start, len(header_line))
+        elif not isinstance(label, int):
+            raise ValueError(f"No label given for {path}; use {path}:phishing|legitimate")
+        f.seek(start)
+
+        offset = start
+        urls, labels = [], []
+        for raw in f:
+            offset += len(raw)
+            line = raw.decode('utf-8', errors='replace').strip()
+            if not line or line.startswith('#'):
+                continue
+            if is_csv:
+                row = dict(zip(header, next(csv.reader([line]))))
+                url = _csv_url(row)
+                if not url:
+                    continue
+                urls.append(url)
+                labels.append(label if isinstance(label, int) else _column_label(row['label'], label, path))
+            else:
+                urls.append(line)
+                labels.append(label)
+            if len(urls) >= chunk_size:
+                yield urls, labels, offset
+                urls, labels = [], []
+        if urls:
+            yield urls, labels, offset
+
+def iter_mixed_batches(sources, offsets, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Interleave chunks of several sources into shuffled mixed batches.
+
+    Sources are usually single-class files, so one chunk of each is taken
+    in turn and shuffled together; SGD then never sees long single-class
+    runs.
+
+    Args:
+        sources (list): (path, label) pairs
+        offsets (dict): Byte offset to resume each path from
+        chunk_size (int): URLs per chunk of each source
+
+    Yields:
+        tuple: (list of URLs, label array, {path: byte offset after the batch})
+    """
+    rng = np.random.default_rng(42)
+    readers = {path: iter_source_chunks(path, label, offsets.get(path, 0), chunk_size)
+               for path, label in sources}
+    while readers:
+        urls, labels, ends = [], [], {}
+        for path, reader in list(readers.items()):
+            chunk = next(reader, None)
+            if chunk is None:
+                del readers[path]
+                continue
+            urls.extend(chunk[0])
+            labels.extend(chunk[1])
+            ends[path] = chunk[2]
+        if urls:
+            order = rng.permutation(len(urls))
+            yield [urls[i] for i in order], np.asarray(labels, dtype=np.int64)[order], ends
+
+def _extract(urls):
+    """Worker entry point: feature matrix of a batch of URLs."""
+    return extract_url_features_many(urls)
+
+def ingest_sources(store, sources, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Add the URLs of labeled sources to the feature store.
+
+    Each source is read from where the previous ingest stopped, and only
+    URLs not yet in the store are extracted, across a process pool with at
+    most two batches per worker in flight, so memory stays bounded however
+    large the corpus is.
+
+    Args:
+        store (FeatureStore): Destination store
+        sources (list): (path, label) pairs
+        workers (int, optional): Worker processes (defaults to the CPU count)
+        chunk_size (int): URLs read from each source per batch
+
+    Returns:
+        tuple: (URLs read, URLs added to the store)
+    """
+    offsets = {path: store.source_offset(path) for path, _ in sources}
+    workers = workers or os.cpu_count() or 1
+    in_flight = deque()
+
+    def finish():
+        future, hashes, labels, ends = in_flight.popleft()
+        if future is not None:
+            store.append(hashes, future.result(), labels)
+        store.commit(ends)
+        return len(hashes)
+
+    read = added = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for urls, labels, ends in iter_mixed_batches(sources, offsets, chunk_size):
+            read += len(urls)
+            hashes = hash_urls(urls)
+            new = store.claim(hashes, labels)
+            future = None
+            if new.any():
+                future = pool.submit(_extract, [url for url, is_new in zip(urls, new) if is_new])
+            in_flight.append((future, hashes[new], labels[new], ends))
+            if len(in_flight) >= 2 * workers:
+                added += finish()
+        while in_flight:
+            added += finish()
+    return read, added
+
+def iter_store_batches(columns, start=0, batch_size=DEFAULT_CHUNK_SIZE, rng=None, holdout=False):
+    """
+    Read feature store rows from start onwards in batches.
+
+    Args:
+        columns (tuple): FeatureStore.load() output
+        start (int): First row to read
+        batch_size (int): Approximate rows per batch
+        rng (numpy.random.Generator, optional): Shuffles blocks and rows if given
+        holdout (bool): Yield the held-out rows instead of the training rows
+
+    Yields:
+        tuple: (float64 feature matrix, int64 label array)
+    """
+    features, hashes, labels = columns
+    rows = len(labels)
+    blocks = np.arange(start, rows, STORE_BLOCK_ROWS)
+    if rng is not None:
+        blocks = rng.permutation(blocks)
+    per_batch = max(1, batch_size // STORE_BLOCK_ROWS)
+
+    for i in range(0, len(blocks), per_batch):
+        parts = [slice(b, min(b + STORE_BLOCK_ROWS, rows)) for b in blocks[i:i + per_batch]]
+        in_holdout = np.concatenate([hashes[part] for part in parts]) % HOLDOUT_MODULUS == 0
+        keep = in_holdout if holdout else ~in_holdout
+        X = np.concatenate([features[part] for part in parts])[keep].astype(np.float64)
+        y = np.concatenate([labels[part] for part in parts])[keep].astype(np.int64)
+        if rng is not None:
+            order = rng.permutation(len(y))
+            X, y = X[order], y[order]
+        if len(y):
+            yield X, y
+
+def evaluate_model(scorer, columns, batch_size=DEFAULT_CHUNK_SIZE):
+    """
+    Measure accuracy on the held-out rows of the feature store.
+
+    Args:
+        scorer: Scorer from build_scorer (takes raw features)
+        columns (tuple): FeatureStore.load() output
+        batch_size (int): Approximate rows per batch
+
+    Returns:
+        tuple: (accuracy or None if there are no held-out rows, rows evaluated)
+    """
+    correct = total = 0
+    for X, y in iter_store_batches(columns, batch_size=batch_size, holdout=True):
+        predicted, _ = scorer.predict(X)
+        correct += int((predicted == y).sum())
+        total += len(y)
+    return (correct / total if total else None), total
+
+def peak_memory_mb():
+    """Peak resident memory of this process plus its largest worker in MB (None if unknown)."""
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    unit = 1 if sys.platform == 'darwin' else 1024
+    return (own + children) * unit / (1024 * 1024)
+
+def _dump_atomic(obj, path):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(obj, f)
+    os.replace(tmp_path, path)
+
+def _load_state(state_path, store):
+    """Load the trainer state if it can be continued with the store's current contents."""
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, 'rb') as f:
+        state = pickle.load(f)
+    if state.get('feature_version') != store.version:
+        logger.info("Feature extractor version changed; retraining from scratch")
+        return None
+    if state['rows'] > store.rows or state.get('label_updates') != store.meta['label_updates']:
+        logger.info("Stored features or labels changed; retraining from scratch")
+        return None
+    return state
+
+def train_model(sources=None, registry_dir=DEFAULT_REGISTRY_DIR, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                epochs=1, full=False, store_dir=DEFAULT_FEATURE_STORE_DIR, state_dir=API_DIR, activate=True):
+    """
+    Train the phishing URL classifier from labeled URL lists.
+
+    New URLs from the sources are first added to the feature store (see
+    ingest_sources). The model is then fitted from the memory-mapped store
+    batch by batch (StandardScaler + SGD logistic regression via
+    partial_fit), so neither step holds the corpus in memory and
+    retraining does no string processing. A fresh run makes one pass to
+    fit the scaler, then epochs passes to fit the model. Later runs only
+    learn from rows added since, keeping the scaler fixed; changed labels,
+    a new feature extractor version or full=True start over. Each trained
+    model is published to the model registry with its held-out metrics.
+
+    Args:
+        sources (list, optional): path[:label] specs (defaults to DEFAULT_SOURCES,
+            which hold no legitimate URLs)
+        registry_dir (str): Model registry the new version is published to
+        workers (int, optional): Feature extraction processes
+        chunk_size (int): URLs per batch
+        epochs (int): Passes over the data on a fresh run
+        full (bool): Ignore the saved state and retrain from scratch
+        store_dir (str): Feature store directory
+        state_dir (str): Directory of the trainer state
+        activate (bool): Make the published version the one the API serves
+
+    Returns:
+        bool: True if a model was published (or nothing needed training)
     """
     try:
         logger.info("Starting model training...")
-        
-        # This is a placeholder. In a real implementation, you would:
-        # 1. Load your phishing URL dataset
-        # 2. Extract features
-        # 3. Train a model
-        # 4. Save the model
-
-        # Example code (commented out as we don't have the dataset):
-        '''
-        # Create a sample dataset for demonstration
-        urls = [
-            "https://legitimate-bank.com/login",
-            "https://phishing-site.xyz/login",
-            # Add more examples...
-        ]
-        labels = [1, 0]  # 1 for legitimate, 0 for phishing
-        
-        # Extract features
-        features = []
-        for url in urls:
-            domain = urlparse(url).netloc
-            url_features = extract_url_features(url, domain)
-            features.append(url_features[0])  # Flatten the array
-            
-        # Create DataFrame
-        df = pd.DataFrame(features, columns=[
-            'url_length', 'num_dots', 'contains_https', 'num_special_chars',
-            'num_digits', 'has_ip_in_domain', 'domain_length', 'num_subdomains',
-            'has_shortening_service', 'obfuscation_ratio', 'num_hyphens',
-            'longest_word', 'has_at_symbol', 'has_double_slash', 'has_suspicious_tld'
-        ])
-        df['label'] = labels
-        
-        # Split data
-        X = df.drop('label', axis=1)
-        y = df['label']
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-        
-        # Scale features
-        scaler = StandardScaler()
-        X_train_scaled = scaler.fit_transform(X_train)
-        X_test_scaled = scaler.transform(X_test)
-        
-        # Train model
-        model = LogisticRegression(random_state=42)
-        model.fit(X_train_scaled, y_train)
-        
-        # Evaluate
-        y_pred = model.predict(X_test_scaled)
-        accuracy = accuracy_score(y_test, y_pred)
-        report = classification_report(y_test, y_pred)
-        
-        logger.info(f"Model accuracy: {accuracy:.4f}")
-        logger.info(f"Classification report:\n{report}")
-        
-        # Save model and scaler
-        with open('model.pkl', 'wb') as f:
-            pickle.dump(model, f)
-            
-        with open('scaler.pkl', 'wb') as f:
-            pickle.dump(scaler, f)
-            
-        logger.info("Model and scaler saved successfully")
-        '''
-        
-        # Create dummy model and scaler for demonstration
-        logger.info("Creating dummy model and scaler for demonstration...")
-        model = LogisticRegression(random_state=42)
-        scaler = StandardScaler()
-        
-        # Dummy data
-        X = np.random.rand(100, 15)
-        y = np.random.randint(0, 2, 100)
-        
-        # Fit model and scaler on dummy data
-        scaler.fit(X)
-        model.fit(scaler.transform(X), y)
-        
-        # Save model and scaler
-        with open('model.pkl', 'wb') as f:
-            pickle.dump(model, f)
-            
-        with open('scaler.pkl', 'wb') as f:
-            pickle.dump(scaler, f)
-            
-        logger.info("Dummy model and scaler saved successfully")
-        
+        sources = [parse_source(spec) for spec in (sources or DEFAULT_SOURCES)]
+        state_path = os.path.join(state_dir, STATE_FILE)
+        store = FeatureStore(store_dir)
+
+        start = time.perf_counter()
+        read, added = ingest_sources(store, sources, workers, chunk_size)
+        elapsed = time.perf_counter() - start
+        logger.info(f"Read {read} URLs, extracted {added} new ones in {elapsed:.1f}s "
+                    f"({read / elapsed if elapsed else 0:.0f} URLs/sec); feature store has {store.rows} rows")
+
+        columns = store.load()
+        state = None if full else _load_state(state_path, store)
+        if state is None:
+            state = {
+                'scaler': StandardScaler(),
+                'model': SGDClassifier(loss='log_loss', alpha=1e-5, random_state=42),
+                'feature_version': store.version,
+                'rows': 0,
+            }
+            passes = ['scaler'] + ['model'] * epochs
+        else:
+            logger.info(f"Resuming from {state['rows']} trained rows; learning new rows only")
+            passes = ['model']
+
+        first_row = state['rows']
+        if first_row == store.rows:
+            logger.info("No new training data; model unchanged")
+            return True
+
+        # Training rows (held-out URLs excluded) seen by the model in total
+        _, hashes, labels = columns
+        counts = np.bincount(labels[hashes % HOLDOUT_MODULUS != 0], minlength=2)
+        if counts.min() == 0:
+            logger.error(f"Training data has only one class ({counts[PHISHING]} phishing, "
+                         f"{counts[LEGITIMATE]} legitimate URLs); add a legitimate URL list, "
+                         f"e.g. legit.txt:legitimate. Nothing saved.")
+            return False
+
+        scaler, model = state['scaler'], state['model']
+        classes = np.array([PHISHING, LEGITIMATE])
+        rng = np.random.default_rng(42)
+        trained = 0
+        start = time.perf_counter()
+        for stage in passes:
+            for X, y in iter_store_batches(columns, first_row, chunk_size, rng):
+                if stage == 'scaler':
+                    scaler.partial_fit(X)
+                else:
+                    model.partial_fit(scaler.transform(X), y, classes=classes)
+                    trained += len(y)
+        elapsed = time.perf_counter() - start
+        peak = peak_memory_mb()
+        logger.info(f"Trained on {trained} rows in {elapsed:.1f}s "
+                    f"({trained / elapsed if elapsed else 0:.0f} rows/sec), "
+                    f"peak memory {f'{peak:.0f} MB' if peak is not None else 'n/a'}")
+
+        accuracy, evaluated = evaluate_model(build_scorer(model, scaler), columns, chunk_size)
+        if accuracy is not None:
+            logger.info(f"Held-out accuracy: {accuracy:.4f} on {evaluated} URLs")
+
+        state['rows'] = store.rows
+        state['label_updates'] = store.meta['label_updates']
+
+        # Publish the model, then save the state that lets the next run resume
+        version = publish_model(model, scaler, registry_dir, metrics={
+            'holdout_accuracy': accuracy,
+            'holdout_rows': evaluated,
+            'phishing_rows': int(counts[PHISHING]),
+            'legitimate_rows': int(counts[LEGITIMATE]),
+        }, notes=f"Trained on {', '.join(os.path.basename(path) for path, _ in sources)}",
+            activate=activate)
+        _dump_atomic(state, state_path)
+        logger.info(f"Model {version} published to {registry_dir} ({counts[PHISHING]} phishing, "
+                    f"{counts[LEGITIMATE]} legitimate training URLs)")
         return True
-        
+
     except Exception as e:
         logger.error(f"Error training model: {e}", exc_info=True)
         return False
 
 if __name__ == "__main__":
-    train_model()
+    parser = argparse.ArgumentParser(description="Train the phishing URL classifier")
+    parser.add_argument('--source', action='append',
+                        help="labeled URL file as path[:phishing|legitimate], or path.csv:1=phishing|legitimate "
+                             "for a 0/1 label column (repeatable; defaults to the repository's "
+                             "phishing lists, which cannot train a model on their own)")
+    parser.add_argument('--registry', default=DEFAULT_REGISTRY_DIR, help="model registry directory")
+    parser.add_argument('--store', default=DEFAULT_FEATURE_STORE_DIR, help="feature store directory")
+    parser.add_argument('--state-dir', default=API_DIR, help="where the trainer state is kept")
+    parser.add_argument('--workers', type=int, default=None, help="feature extraction processes")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="URLs per batch")
+    parser.add_argument('--epochs', type=int, default=1, help="passes over the data on a fresh run")
+    parser.add_argument('--full', action='store_true', help="retrain from scratch")
+    parser.add_argument('--no-activate', action='store_true',
+                        help="publish without switching the API to the new version")
+    parser.add_argument('--evaluate', action='store_true',
+                        help="only report the held-out accuracy of the active model")
+    args = parser.parse_args()
+
+    if args.evaluate:
+        pointer = read_active(args.registry)
+        if pointer is None:
+            logger.error(f"No active model in {args.registry}")
+            sys.exit(1)
+        scorer, _ = load_version(args.registry, pointer['active'])
+        accuracy, evaluated = evaluate_model(scorer, FeatureStore(args.store).load())
+        logger.info(f"Held-out accuracy of {pointer['active']}: {accuracy} on {evaluated} URLs")
+        sys.exit(0)
+
+    ok = train_model(args.source, args.registry, args.workers, args.chunk_size, args.epochs, args.full,
+                     args.store, args.state_dir, not args.no_activate)
+    sys.exit(0 if ok else 1)
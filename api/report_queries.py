@@ -0,0 +1,139 @@
+import base64
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+REPORT_STATUSES = ('Pending', 'Verified', 'Blacklisted')
+
+# Page size limits for the admin report listing
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(reported_at, report_id):
+    """Encode the position after a report as an opaque page cursor."""
+    raw = f"{reported_at.isoformat()}|{report_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Decode a page cursor made by encode_cursor.
+
+    Returns:
+        tuple: (reported_at datetime, report id)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        reported_at, report_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(reported_at), int(report_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def _parse_date(value, end_of_day=False):
+    """Parse an ISO date or datetime; a bare date as end bound covers the whole day."""
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def parse_report_filters(args):
+    """
+    Read listing filters from request arguments.
+
+    Supported arguments: status, from and to (ISO dates or datetimes,
+    to is inclusive for bare dates), domain, cursor and limit.
+
+    Args:
+        args (Mapping): Request query arguments
+
+    Returns:
+        dict: Validated filters
+
+    Raises:
+        ValueError: If an argument is invalid
+    """
+    filters = {}
+
+    status = args.get('status')
+    if status:
+        if status not in REPORT_STATUSES:
+            raise ValueError(f"Invalid status: {status}")
+        filters['status'] = status
+
+    try:
+        if args.get('from'):
+            filters['from'] = _parse_date(args['from'])
+        if args.get('to'):
+            filters['to'] = _parse_date(args['to'], end_of_day=True)
+    except ValueError:
+        raise ValueError("Dates must be ISO formatted (YYYY-MM-DD or YYYY-MM-DDTHH:MM:SS)")
+
+    domain = (args.get('domain') or '').strip().lower()
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    if domain:
+        filters['domain'] = domain
+
+    if args.get('cursor'):
+        filters['cursor'] = decode_cursor(args['cursor'])
+
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be an integer")
+    filters['limit'] = max(1, min(limit, MAX_PAGE_SIZE))
+    return filters
+
+def fetch_reports_page(conn, filters):
+    """
+    Fetch one page of reports, newest first, using keyset pagination.
+
+    Pages are anchored on (reported_at, id) of the last row instead of an
+    OFFSET, so every page is an index range scan on the composite
+    (status|domain, reported_at, id) indexes.
+
+    Args:
+        conn: Database connection
+        filters (dict): Output of parse_report_filters
+
+    Returns:
+        tuple: (list of report dicts, cursor of the next page or None)
+    """
+    clauses, params = [], []
+    if 'status' in filters:
+        clauses.append("status = %s")
+        params.append(filters['status'])
+    if 'domain' in filters:
+        clauses.append("domain = %s")
+        params.append(filters['domain'])
+    if 'from' in filters:
+        clauses.append("reported_at >= %s")
+        params.append(filters['from'])
+    if 'to' in filters:
+        clauses.append("reported_at < %s")
+        params.append(filters['to'])
+    if 'cursor' in filters:
+        clauses.append("(reported_at, id) < (%s, %s)")
+        params.extend(filters['cursor'])
+
+    where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+    limit = filters['limit']
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        "SELECT id, url, description, report_count, reported_at, status FROM phishing_reports "
+        f"{where}ORDER BY reported_at DESC, id DESC LIMIT %s",
+        (*params, limit + 1)
+    )
+    reports = cursor.fetchall()
+    cursor.close()
+
+    # One extra row tells us whether there is a next page
+    next_cursor = None
+    if len(reports) > limit:
+        reports = reports[:limit]
+        last = reports[-1]
+        next_cursor = encode_cursor(last['reported_at'], last['id'])
+    return reports, next_cursor
@@ -0,0 +1,272 @@
+import os
+import re
+import time
+import uuid
+import queue
+import atexit
+import threading
+import logging
+from collections import OrderedDict
+
+from verdict_cache import url_key
+
+logger = logging.getLogger(__name__)
+
+# Ticket states reported by ReportQueue.status
+QUEUED = 'queued'
+STORED = 'stored'
+FAILED = 'failed'
+
+# Tickets are the issue time in milliseconds (12 hex digits) followed by 20
+# random hex digits, so any worker can tell how old a ticket it never saw is
+TICKET_PATTERN = re.compile(r'[0-9a-f]{32}')
+
+class QueueFull(Exception):
+    """Raised when the report queue has no room left."""
+
+def new_ticket():
+    """Return a ticket for a report submitted now."""
+    return f"{int(time.time() * 1000):012x}{uuid.uuid4().hex[:20]}"
+
+def ticket_age(ticket):
+    """Seconds since a ticket was issued, or None if it is not a well-formed ticket."""
+    if not TICKET_PATTERN.fullmatch(ticket):
+        return None
+    return time.time() - int(ticket[:12], 16) / 1000
+
+class ReportQueue:
+    """
+    Bounded in-process queue of user reports with a background DB writer.
+
+    Submitting a report only enqueues it and returns a ticket. A writer
+    thread drains the queue in batches, each written with one multi-row
+    upsert in a single transaction. A URL has one row, keyed by the hash
+    of its normalized form; reporting it again only increments its
+    report_count. Tickets are recorded in report_tickets along with the
+    URL hash, so a retried batch never counts a report twice and, once
+    written, the report id can be looked up by ticket from any worker
+    process. Until then only the worker holding the report knows it; the
+    others report a recent ticket as queued, since it may still be in
+    another worker's queue, and do not see a failed write.
+    """
+
+    def __init__(self, pool, max_size=10000, batch_size=200, flush_interval=0.5,
+                 max_retries=3, retry_delay=1.0, ticket_ttl=300.0):
+        """
+        Args:
+            pool (ConnectionPool): Database connection pool
+            max_size (int): Reports held before submissions are rejected
+            batch_size (int): Maximum reports per INSERT
+            flush_interval (float): Seconds the writer waits to fill a batch
+            max_retries (int): Attempts per batch before its reports are dropped
+            retry_delay (float): Seconds before the first retry (doubled each time)
+            ticket_ttl (float): Seconds a ticket not yet in the database is
+                reported as queued by workers that did not issue it
+        """
+        self.pool = pool
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.ticket_ttl = ticket_ttl
+        self._lock = threading.Lock()
+        self._reset()
+        atexit.register(self.close)
+
+    def _reset(self):
+        """Start over with an empty queue and no writer (used at init and after a fork)."""
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_size)
+        self._pending = set()
+        self._failed = OrderedDict()  # ticket -> error, bounded by max_size
+        self._writer = None
+        self._stopping = threading.Event()
+        self.submitted = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    def submit(self, url, description=None, screenshot_hash=None):
+        """
+        Enqueue a report for writing.
+
+        Returns:
+            str: Ticket to look the report up with
+
+        Raises:
+            QueueFull: If the queue is at capacity
+        """
+        self._ensure_writer()
+        ticket = new_ticket()
+        with self._lock:
+            self._pending.add(ticket)
+        try:
+            self._queue.put_nowait((ticket, url, description, screenshot_hash))
+        except queue.Full:
+            with self._lock:
+                self._pending.discard(ticket)
+                self.rejected += 1
+            raise QueueFull(f"Report queue is full ({self.max_size} reports)")
+        with self._lock:
+            self.submitted += 1
+        return ticket
+
+    def status(self, ticket):
+        """
+        Look up a ticket.
+
+        Returns:
+            dict or None: {'status': QUEUED}, {'status': STORED, 'report_id': id,
+            'report_count': reports of the URL}, {'status': FAILED, 'error': message},
+            or None for unknown tickets. A ticket issued less than ticket_ttl
+            ago that is not in the database is QUEUED, as another worker may
+            hold it
+        """
+        age = ticket_age(ticket)
+        if age is None:
+            return None
+        with self._lock:
+            if ticket in self._pending:
+                return {'status': QUEUED}
+            if ticket in self._failed:
+                return {'status': FAILED, 'error': self._failed[ticket]}
+
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT r.id, r.report_count FROM report_tickets t "
+                "JOIN phishing_reports r ON r.url_hash = t.url_hash WHERE t.ticket=%s",
+                (ticket,)
+            )
+            row = cursor.fetchone()
+            cursor.close()
+        if row is None:
+            return {'status': QUEUED} if age < self.ticket_ttl else None
+        return {'status': STORED, 'report_id': row[0], 'report_count': row[1]}
+
+    def close(self, timeout=10.0):
+        """Stop the writer after it has flushed what is queued."""
+        writer = self._writer
+        if writer is None or os.getpid() != self._pid:
+            return
+        self._stopping.set()
+        writer.join(timeout)
+        if writer.is_alive():
+            logger.warning(f"Report writer did not finish; about {self._queue.qsize()} reports not written")
+
+    def stats(self):
+        """Return queue depth and throughput counters as a dict."""
+        with self._lock:
+            return {
+                'max_size': self.max_size,
+                'queued': self._queue.qsize(),
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'written': self.written,
+                'batches': self.batches,
+                'failed': self.failed,
+            }
+
+    def _ensure_writer(self):
+        """Start the writer thread on first use (and again in a forked child)."""
+        if self._writer is not None and os.getpid() == self._pid:
+            return
+        with self._lock:
+            if os.getpid() != self._pid:
+                self._reset()
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name='report-writer', daemon=True)
+                self._writer.start()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write_with_retries(batch)
+            elif self._stopping.is_set():
+                return
+
+    def _next_batch(self):
+        """Wait for one report, then take whatever else is queued up to batch_size."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write_with_retries(self, batch):
+        delay = self.retry_delay
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self._write(batch)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Dropping {len(batch)} reports after {attempt} attempts: {e}")
+                    self._mark_failed(batch, str(e))
+                    return
+                logger.warning(f"Writing {len(batch)} reports failed (attempt {attempt}), retrying: {e}")
+                time.sleep(delay)
+                delay *= 2
+
+        with self._lock:
+            for item in batch:
+                self._pending.discard(item[0])
+            self.written += len(batch)
+            self.batches += 1
+        logger.debug(f"Wrote batch of {len(batch)} reports")
+
+    def _write(self, batch):
+        """Upsert a batch of reports and record their tickets in one transaction."""
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            # Tickets already written by an earlier attempt whose commit was not acknowledged
+            cursor.execute(
+                f"SELECT ticket FROM report_tickets WHERE ticket IN ({', '.join(['%s'] * len(batch))})",
+                [item[0] for item in batch]
+            )
+            written = {row[0] for row in cursor.fetchall()}
+
+            reports, tickets = [], []
+            for ticket, url, description, screenshot_hash in batch:
+                if ticket in written:
+                    continue
+                normalized, digest = url_key(url)
+                reports.extend((url, normalized, digest, description, screenshot_hash))
+                tickets.extend((ticket, digest))
+
+            if tickets:
+                # A URL already reported (possibly earlier in this batch) only gains a count;
+                # its first description and screenshot are kept, or filled in if missing
+                cursor.execute(
+                    "INSERT INTO phishing_reports (url, normalized_url, url_hash, description, screenshot_hash) "
+                    f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * (len(tickets) // 2))} AS new "
+                    "ON DUPLICATE KEY UPDATE report_count = phishing_reports.report_count + 1, "
+                    "last_reported_at = CURRENT_TIMESTAMP, "
+                    "description = COALESCE(phishing_reports.description, new.description), "
+                    "screenshot_hash = COALESCE(phishing_reports.screenshot_hash, new.screenshot_hash)",
+                    reports
+                )
+                cursor.execute(
+                    "INSERT INTO report_tickets (ticket, url_hash) "
+                    f"VALUES {', '.join(['(%s, %s)'] * (len(tickets) // 2))}",
+                    tickets
+                )
+            conn.commit()
+            cursor.close()
+
+    def _mark_failed(self, batch, error):
+        with self._lock:
+            for item in batch:
+                self._pending.discard(item[0])
+                self._failed[item[0]] = error
+            while len(self._failed) > self.max_size:
+                self._failed.popitem(last=False)
+            self.failed += len(batch)
@@ -1,5 +1,6 @@
 import os
 import sys
+import importlib.util
 import logging
 import subprocess
 import time
@@ -8,15 +9,24 @@ logging.basicConfig(level=logging.INFO,
                     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# The API code lives next to this script
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
 def check_dependencies():
     """Check if required packages are installed and install them if not."""
-    required_packages = ['flask', 'flask-cors', 'numpy', 'scikit-learn']
+    # Package name -> module name; looked up without importing to keep startup fast
+    required_packages = {'flask': 'flask', 'flask-cors': 'flask_cors', 'numpy': 'numpy',
+                         'scikit-learn': 'sklearn'}
+    # The server serve.py runs the API under; gunicorn needs fork(), which Windows lacks
+    if os.name == 'nt':
+        required_packages['waitress'] = 'waitress'
+    else:
+        required_packages['gunicorn'] = 'gunicorn'
     
-    for package in required_packages:
-        try:
-            __import__(package.replace('-', '_'))
+    for package, module in required_packages.items():
+        if importlib.util.find_spec(module) is not None:
             logger.info(f"✓ {package} is installed")
-        except ImportError:
+        else:
             logger.info(f"Installing {package}...")
             try:
                 subprocess.check_call([sys.executable, "-m", "pip", "install", package])
@@ -27,47 +37,64 @@ def check_dependencies():
     return True
 
 def check_model_files():
-    """Check if the model and scaler files exist and create them if not."""
-    model_path = os.path.join("api", "model.pkl")
-    scaler_path = os.path.join("api", "scaler.pkl")
-    
-    if not os.path.exists(model_path) or not os.path.exists(scaler_path):
-        logger.info("Model or scaler file not found. Attempting to train a new model...")
-        os.chdir("api")
-        try:
-            from model_trainer import train_model
-            success = train_model()
-            if not success:
-                logger.warning("Model training failed, using fallback random predictions.")
-            os.chdir("..")
-        except Exception as e:
-            logger.error(f"Error running model trainer: {e}")
-            os.chdir("..")
-    else:
-        logger.info("Model and scaler files found.")
+    """
+    Check if the API has a model to load (see model_registry.model_available) and train one if not.
+
+    The repository only ships phishing URLs, so training also needs a file
+    of legitimate URLs, one per line, named by TRAINING_LEGITIMATE_URLS.
+    """
+    sys.path.insert(0, API_DIR)
+    from model_registry import model_available, DEFAULT_REGISTRY_DIR
+
+    # The same registry and loose model files app.py loads from
+    registry_dir = os.environ.get('MODEL_REGISTRY_DIR', DEFAULT_REGISTRY_DIR)
+    if model_available(registry_dir):
+        logger.info("Model found.")
+        return
+
+    legitimate_urls = os.environ.get('TRAINING_LEGITIMATE_URLS')
+    if not legitimate_urls:
+        logger.error("No model found, and none can be trained without legitimate URLs: set "
+                     "TRAINING_LEGITIMATE_URLS to a file of them, one per line. The API will "
+                     "refuse predictions until a model is published.")
+        return
+
+    logger.info("No model found. Attempting to train a new model...")
+    try:
+        from model_trainer import train_model, DEFAULT_SOURCES
+        success = train_model(DEFAULT_SOURCES + [f"{legitimate_urls}:legitimate"], registry_dir=registry_dir)
+        if not success:
+            logger.warning("Model training failed; the API will refuse predictions until a model is published.")
+    except Exception as e:
+        logger.error(f"Error running model trainer: {e}")
 
 def run_api():
-    """Run the Flask API."""
+    """Run the Flask API under serve.py, falling back to the Flask server if that fails."""
     try:
         logger.info("Starting Phishing Detector API...")
         logger.info("API will be available at http://localhost:5000")
         logger.info("Press Ctrl+C to stop the server")
         
-        # Start the Flask app
-        os.chdir("api")
-        os.system(f"{sys.executable} app.py")
+        # Start the API under the multi-worker production server (see serve.py)
+        returncode = subprocess.run([sys.executable, "serve.py"], cwd=API_DIR).returncode
+        if returncode == 0:
+            return
+        logger.error(f"serve.py exited with status {returncode}")
+    except KeyboardInterrupt:
+        logger.info("\nShutting down API server...")
+        return
+
+    try:
+        # Try the Flask server on an alternative port
+        logger.info("Trying the Flask server on port 5001 instead...")
+        sys.path.insert(0, API_DIR)
+        os.chdir(API_DIR)
+        from app import app
+        app.run(host='0.0.0.0', port=5001)
     except KeyboardInterrupt:
         logger.info("\nShutting down API server...")
     except Exception as e:
-        logger.error(f"Error starting API: {e}")
-        try:
-            # Try an alternative port
-            logger.info("Trying port 5001 instead...")
-            os.environ['FLASK_APP'] = 'app.py'
-            os.environ['FLASK_RUN_PORT'] = '5001'
-            os.system(f"{sys.executable} -m flask run --host=0.0.0.0")
-        except Exception as e2:
-            logger.error(f"Alternative approach also failed: {e2}")
+        logger.error(f"Alternative approach also failed: {e}")
 
 if __name__ == "__main__":
     logger.info("Initializing Phishing Detector...")
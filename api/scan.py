@@ -0,0 +1,379 @@
+import os
+import csv
+import sys
+import json
+import time
+import logging
+import argparse
+from collections import deque
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from feature_extractor import extract_url_features_many
+from feature_store import file_fingerprint
+from model_registry import load_version, read_active, DEFAULT_REGISTRY_DIR
+from domain_index import DomainIndex, BLOCKED, ALLOWED
+from scorer import MIN_CONFIDENCE
+
+logger = logging.getLogger(__name__)
+
+API_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Domain lists applied before the model, as in the API
+DEFAULT_ALLOWLIST = os.path.join(API_DIR, 'data', 'allowlist.txt')
+DEFAULT_BLOCKLIST = os.path.join(API_DIR, 'data', 'blocklist.txt')
+
+# Log lines read per chunk; one chunk is scored by one worker call
+DEFAULT_CHUNK_SIZE = 20000
+
+FORMATS = ('csv', 'ndjson', 'parquet')
+OUTPUT_FIELDS = ('url', 'result', 'confidence', 'source')
+
+# Where a verdict came from
+SOURCE_NAMES = ('model', 'allowlist', 'blocklist')
+SOURCE_MODEL, SOURCE_ALLOWLIST, SOURCE_BLOCKLIST = range(3)
+
+# Progress is logged this often (seconds)
+PROGRESS_INTERVAL = 10.0
+
+def extract_url(line, column=None):
+    """
+    Pull the URL out of a log line.
+
+    Without a column, the first whitespace-separated token containing
+    '://' is used, or the whole line if it is a single token (e.g. a
+    hostname from a DNS log). URLs without a scheme get http://.
+
+    Args:
+        line (str): Log line
+        column (int, optional): Index of the URL among the line's tokens
+
+    Returns:
+        str or None: URL, or None if the line has none
+    """
+    tokens = line.split()
+    if not tokens:
+        return None
+    if column is not None:
+        if column >= len(tokens):
+            return None
+        token = tokens[column]
+    else:
+        token = next((t for t in tokens if '://' in t), tokens[0] if len(tokens) == 1 else None)
+        if token is None:
+            return None
+    token = token.strip('"\'')
+    return token if '://' in token else f"http://{token}"
+
+def iter_input_chunks(path, start=0, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream the lines of a file (or stdin for '-') in chunks.
+
+    Args:
+        path (str): File to read, or '-'
+        start (int): Byte offset to resume from (files only)
+        chunk_size (int): Lines per chunk
+
+    Yields:
+        tuple: (list of lines, byte offset after the chunk)
+    """
+    f = sys.stdin.buffer if path == '-' else open(path, 'rb')
+    try:
+        if start:
+            f.seek(start)
+        offset = start
+        lines = []
+        for raw in f:
+            offset += len(raw)
+            lines.append(raw.decode('utf-8', errors='replace'))
+            if len(lines) >= chunk_size:
+                yield lines, offset
+                lines = []
+        if lines:
+            yield lines, offset
+    finally:
+        if f is not sys.stdin.buffer:
+            f.close()
+
+# Model and domain index of a worker process, loaded once by _init_worker
+_worker = {}
+
+def _init_worker(registry_dir, version, lists, column):
+    scorer, _ = load_version(registry_dir, version)
+    _worker['scorer'] = scorer
+    _worker['index'] = DomainIndex(*lists) if lists else None
+    _worker['column'] = column
+
+def _score_lines(lines):
+    """
+    Worker entry point: verdicts for a chunk of log lines.
+
+    Returns:
+        tuple: (URLs, phishing flags, confidences, verdict sources, lines without a URL)
+    """
+    column = _worker['column']
+    urls, domains, hosts = [], [], []
+    invalid = 0
+    for line in lines:
+        url = extract_url(line, column)
+        try:
+            parts = urlsplit(url) if url else None
+            host = parts.hostname if parts else None
+        except ValueError:
+            host = None
+        if not host:
+            invalid += 1
+            continue
+        urls.append(url)
+        domains.append(parts.netloc)
+        hosts.append(host)
+
+    if not urls:
+        return [], np.zeros(0, bool), np.zeros(0), np.zeros(0, np.uint8), invalid
+
+    # One feature matrix and one model call for the whole chunk
+    labels, confidence = _worker['scorer'].predict(extract_url_features_many(urls, domains))
+    confidence = np.asarray(confidence, dtype=np.float64)
+    phishing = (labels != 1) | (confidence < MIN_CONFIDENCE)
+    source = np.full(len(urls), SOURCE_MODEL, dtype=np.uint8)
+
+    index = _worker['index']
+    if index is not None:
+        for i, host in enumerate(hosts):
+            listing = index.lookup(host)
+            if listing is not None:
+                phishing[i] = listing == BLOCKED
+                confidence[i] = 1.0
+                source[i] = SOURCE_BLOCKLIST if listing == BLOCKED else SOURCE_ALLOWLIST
+    return urls, phishing, confidence, source, invalid
+
+class _TextWriter:
+    """CSV or NDJSON verdicts appended to a file (or written to stdout)."""
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        if path == '-':
+            self._file = sys.stdout
+        else:
+            self._file = open(path, 'a', encoding='utf-8', newline='')
+        self._csv = csv.writer(self._file) if fmt == 'csv' else None
+        if self._csv is not None and (path == '-' or self._file.tell() == 0):
+            self._csv.writerow(OUTPUT_FIELDS)
+
+    def write(self, urls, phishing, confidence, source):
+        results = np.where(phishing, 'Phishing', 'Legitimate').tolist()
+        rows = zip(urls, results, confidence.tolist(), (SOURCE_NAMES[s] for s in source.tolist()))
+        if self._csv is not None:
+            self._csv.writerows(rows)
+        else:
+            self._file.write(''.join(json.dumps(dict(zip(OUTPUT_FIELDS, row))) + '\n' for row in rows))
+
+    def checkpoint(self):
+        """Flush and return the position to truncate back to on resume."""
+        self._file.flush()
+        if self.path == '-':
+            return None
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+class _ParquetWriter:
+    """Verdicts written as a directory of Parquet files, one per chunk."""
+
+    def __init__(self, path):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.parts = len([name for name in os.listdir(path) if name.endswith('.parquet')])
+
+    def write(self, urls, phishing, confidence, source):
+        table = self._pa.table({
+            'url': urls,
+            'result': np.where(phishing, 'Phishing', 'Legitimate'),
+            'confidence': confidence,
+            'source': np.asarray(SOURCE_NAMES)[source],
+        })
+        tmp_path = os.path.join(self.path, f".part-{self.parts:08d}.tmp")
+        self._pq.write_table(table, tmp_path)
+        os.replace(tmp_path, os.path.join(self.path, f"part-{self.parts:08d}.parquet"))
+        self.parts += 1
+
+    def checkpoint(self):
+        return self.parts
+
+    def close(self):
+        pass
+
+def _open_output(path, fmt, position):
+    """Open the output, first dropping anything written after the checkpoint at position."""
+    if fmt == 'parquet':
+        if position is not None and os.path.isdir(path):
+            for name in os.listdir(path):
+                if name.endswith('.parquet') and int(name[5:13]) >= position:
+                    os.remove(os.path.join(path, name))
+        return _ParquetWriter(path)
+    if position is not None and os.path.exists(path) and os.path.getsize(path) > position:
+        os.truncate(path, position)
+    return _TextWriter(path, fmt)
+
+def _load_state(state_path, fmt, inputs):
+    """Load the state of an interrupted scan with the same output format, or None."""
+    if not state_path or not os.path.exists(state_path):
+        return None
+    with open(state_path) as f:
+        state = json.load(f)
+    if state['format'] != fmt:
+        raise SystemExit(f"{state_path} is from a {state['format']} scan; use --fresh to start over")
+    # Inputs rewritten (not just appended to) since are scanned again
+    for path in inputs:
+        saved = state['inputs'].get(os.path.abspath(path))
+        if saved and (os.path.getsize(path) < saved[0] or file_fingerprint(path, saved[0]) != saved[1]):
+            logger.warning(f"{path} changed since the interrupted scan; scanning it again")
+            del state['inputs'][os.path.abspath(path)]
+    return state
+
+def _save_state(state_path, state):
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(state, f)
+    os.replace(tmp_path, state_path)
+
+def scan(inputs, output='-', fmt='csv', workers=None, chunk_size=DEFAULT_CHUNK_SIZE, column=None,
+         registry_dir=DEFAULT_REGISTRY_DIR, lists=(DEFAULT_ALLOWLIST, DEFAULT_BLOCKLIST), fresh=False):
+    """
+    Score every URL in a set of log files with the active model.
+
+    Input is read in chunks and scored across a process pool that loads
+    the model once per worker, with at most two chunks per worker in
+    flight, so memory stays bounded for any input size. Verdicts are
+    written in input order. When writing to a file, progress is
+    checkpointed after every chunk, and an interrupted scan resumes from
+    its last checkpoint when run again with the same output.
+
+    Args:
+        inputs (list): Files to read ('-' for stdin)
+        output (str): Output file (a directory for parquet), '-' for stdout
+        fmt (str): 'csv', 'ndjson' or 'parquet'
+        workers (int, optional): Worker processes (defaults to the CPU count)
+        chunk_size (int): Lines per chunk
+        column (int, optional): Token index of the URL in each line
+        registry_dir (str): Model registry to take the active model from
+        lists (tuple, optional): (allowlist, blocklist) files, None to skip them
+        fresh (bool): Ignore the state of an interrupted scan
+
+    Returns:
+        dict: Line, URL and phishing counts, elapsed seconds and URLs/sec
+    """
+    active = read_active(registry_dir)
+    if active is None:
+        raise SystemExit(f"No active model in {registry_dir}")
+    workers = workers or os.cpu_count() or 1
+
+    resumable = output != '-' and '-' not in inputs
+    state_path = f"{output.rstrip(os.sep)}.scan-state.json" if resumable else None
+    state = None if fresh else _load_state(state_path, fmt, inputs)
+    if state is None:
+        # A new scan replaces what an earlier one wrote to the output
+        state = {'format': fmt, 'inputs': {}, 'output_position': 0 if resumable else None,
+                 'lines': 0, 'urls': 0, 'phishing': 0, 'invalid': 0}
+    else:
+        logger.info(f"Resuming interrupted scan: {state['urls']} URLs already scanned")
+    writer = _open_output(output, fmt, state['output_position'])
+
+    start = last_report = time.perf_counter()
+    scanned = 0
+    in_flight = deque()
+
+    def finish():
+        nonlocal scanned, last_report
+        future, path, offset, n_lines = in_flight.popleft()
+        urls, phishing, confidence, source, invalid = future.result()
+        writer.write(urls, phishing, confidence, source)
+        state['lines'] += n_lines
+        state['urls'] += len(urls)
+        state['phishing'] += int(phishing.sum())
+        state['invalid'] += invalid
+        scanned += len(urls)
+        if resumable:
+            state['output_position'] = writer.checkpoint()
+            state['inputs'][os.path.abspath(path)] = [offset, file_fingerprint(path, offset)]
+            _save_state(state_path, state)
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            logger.info(f"{state['urls']} URLs scanned, {scanned / (now - start):.0f} URLs/sec")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(registry_dir, active['active'], lists, column)) as pool:
+            for path in inputs:
+                saved = state['inputs'].get(os.path.abspath(path)) if path != '-' else None
+                for lines, offset in iter_input_chunks(path, saved[0] if saved else 0, chunk_size):
+                    in_flight.append((pool.submit(_score_lines, lines), path, offset, len(lines)))
+                    if len(in_flight) >= 2 * workers:
+                        finish()
+            while in_flight:
+                finish()
+        if not resumable:
+            writer.checkpoint()
+    finally:
+        writer.close()
+
+    if resumable:
+        # A finished scan starts over next time
+        os.remove(state_path)
+    elapsed = time.perf_counter() - start
+    return {
+        'model_version': active['active'],
+        'lines': state['lines'],
+        'urls': state['urls'],
+        'phishing': state['phishing'],
+        'invalid': state['invalid'],
+        'seconds': elapsed,
+        'urls_per_sec': scanned / elapsed if elapsed else 0.0,
+    }
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Score the URLs in log files offline with the active model")
+    parser.add_argument('inputs', nargs='*', default=['-'], help="files to scan ('-' or nothing for stdin)")
+    parser.add_argument('-o', '--output', default='-',
+                        help="output file, a directory for parquet (default: stdout, not resumable)")
+    parser.add_argument('-f', '--format', choices=FORMATS,
+                        help="output format (default: from the output extension, else csv)")
+    parser.add_argument('--column', type=int,
+                        help="token index of the URL in each line (default: first token with ://)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="lines per chunk")
+    parser.add_argument('--registry', default=os.environ.get('MODEL_REGISTRY_DIR', DEFAULT_REGISTRY_DIR),
+                        help="model registry directory")
+    parser.add_argument('--no-lists', action='store_true', help="skip the allowlist/blocklist")
+    parser.add_argument('--fresh', action='store_true', help="ignore an interrupted scan and start over")
+    args = parser.parse_args()
+
+    fmt = args.format
+    if fmt is None:
+        ext = os.path.splitext(args.output)[1].lstrip('.').lower()
+        fmt = {'jsonl': 'ndjson'}.get(ext, ext) if ext in ('csv', 'ndjson', 'jsonl', 'parquet') else 'csv'
+    if fmt == 'parquet' and args.output == '-':
+        parser.error("parquet output needs --output")
+
+    summary = scan(args.inputs, args.output, fmt, args.workers, args.chunk_size, args.column,
+                   args.registry, None if args.no_lists else (DEFAULT_ALLOWLIST, DEFAULT_BLOCKLIST),
+                   args.fresh)
+    logger.info(f"Scanned {summary['urls']} URLs ({summary['invalid']} lines without a URL) with model "
+                f"{summary['model_version']} in {summary['seconds']:.1f}s: {summary['urls_per_sec']:.0f} URLs/sec, "
+                f"{summary['phishing']} phishing")
@@ -0,0 +1,172 @@
+import json
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Default confidence for models that cannot produce probabilities
+DEFAULT_CONFIDENCE = 0.95
+
+# Verdicts less confident than this are reported as Phishing
+MIN_CONFIDENCE = 0.7
+
+# Identifies linear scorer artifacts written by save_linear_scorer
+LINEAR_FORMAT = 'linear-scorer'
+LINEAR_FORMAT_VERSION = 1
+
+class LinearScorer:
+    """
+    A StandardScaler followed by a binary linear classifier, folded into a
+    single affine map so a prediction is one dot product and a sigmoid.
+    """
+
+    def __init__(self, weights, bias, classes):
+        self.weights = np.ascontiguousarray(weights, dtype=np.float64)
+        self.bias = float(bias)
+        self.classes = np.asarray(classes)
+        self.n_features = len(self.weights)
+
+    def predict(self, features):
+        """
+        Score a feature matrix.
+
+        Args:
+            features (numpy.ndarray): N x F matrix of raw (unscaled) features
+
+        Returns:
+            tuple: (labels, confidence) arrays with one entry per row
+        """
+        decision = features @ self.weights + self.bias
+        labels = self.classes[(decision > 0).astype(np.intp)]
+        # The predicted class is always the more likely one, so its
+        # probability is the sigmoid of the absolute decision value
+        confidence = 1.0 / (1.0 + np.exp(-np.abs(decision)))
+        return labels, confidence
+
+def save_linear_scorer(scorer, file, metadata=None):
+    """
+    Write a LinearScorer as an .npz archive of plain arrays.
+
+    The archive holds the weights, bias and classes plus a JSON header,
+    so it can be loaded with NumPy alone and without unpickling anything.
+
+    Args:
+        scorer (LinearScorer): Scorer to save
+        file: Path or writable binary file
+        metadata (dict, optional): Extra header fields
+
+    Raises:
+        ValueError: If the class labels are not numeric
+    """
+    if scorer.classes.dtype.kind not in 'biu':
+        raise ValueError(f"Class labels of type {scorer.classes.dtype} cannot be stored without pickle")
+    header = {'format': LINEAR_FORMAT, 'format_version': LINEAR_FORMAT_VERSION,
+              'num_features': scorer.n_features, **(metadata or {})}
+    np.savez(file,
+             header=np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8),
+             weights=scorer.weights,
+             bias=np.array([scorer.bias]),
+             classes=scorer.classes)
+
+def load_linear_scorer(file):
+    """
+    Load a scorer written by save_linear_scorer.
+
+    Args:
+        file: Path or readable binary file
+
+    Returns:
+        tuple: (LinearScorer, header dict)
+
+    Raises:
+        ValueError: If the file is not a supported linear scorer artifact
+    """
+    with np.load(file, allow_pickle=False) as archive:
+        header = json.loads(archive['header'].tobytes().decode('utf-8'))
+        if header.get('format') != LINEAR_FORMAT or header.get('format_version') != LINEAR_FORMAT_VERSION:
+            raise ValueError(f"Unsupported scorer artifact: {header.get('format')} "
+                             f"version {header.get('format_version')}")
+        scorer = LinearScorer(archive['weights'], archive['bias'][0], archive['classes'])
+    if scorer.n_features != header['num_features']:
+        raise ValueError(f"Scorer artifact has {scorer.n_features} weights, header says {header['num_features']}")
+    return scorer, header
+
+class SklearnScorer:
+    """Fallback scorer that runs the scaler and model through sklearn."""
+
+    def __init__(self, model, scaler):
+        self.model = model
+        self.scaler = scaler
+        self.n_features = getattr(scaler, 'n_features_in_', None)
+
+    def predict(self, features):
+        """
+        Score a feature matrix.
+
+        Args:
+            features (numpy.ndarray): N x F matrix of raw (unscaled) features
+
+        Returns:
+            tuple: (labels, confidence) arrays with one entry per row
+        """
+        scaled_features = self.scaler.transform(features)
+        labels = self.model.predict(scaled_features)
+
+        confidence = np.full(len(labels), DEFAULT_CONFIDENCE)
+        if hasattr(self.model, 'predict_proba'):
+            try:
+                proba = self.model.predict_proba(scaled_features)
+                # Get the probability of the predicted class
+                confidence = proba[np.arange(len(labels)), labels.astype(np.intp)]
+            except Exception as e:
+                logger.warning(f"Could not get prediction probability: {e}")
+        return labels, confidence
+
+def _is_foldable(model, scaler):
+    """Check whether the model and scaler reduce to an affine map plus a sigmoid."""
+    if type(scaler).__name__ != 'StandardScaler':
+        return False
+    name = type(model).__name__
+    # SGD with log loss is logistic regression fitted by stochastic gradient descent
+    if name == 'SGDClassifier':
+        if getattr(model, 'loss', None) not in ('log_loss', 'log'):
+            return False
+    elif name != 'LogisticRegression':
+        return False
+    classes = getattr(model, 'classes_', None)
+    coef = getattr(model, 'coef_', None)
+    if classes is None or coef is None or len(classes) != 2 or coef.shape[0] != 1:
+        return False
+    # A binary multinomial fit uses a softmax over (-d, d), not a sigmoid of d
+    if getattr(model, 'multi_class', 'auto') == 'multinomial':
+        return False
+    return coef.shape[1] == getattr(scaler, 'n_features_in_', coef.shape[1])
+
+def build_scorer(model, scaler):
+    """
+    Build the fastest scorer available for a model and scaler.
+
+    A StandardScaler + binary LogisticRegression (or log-loss
+    SGDClassifier) is folded into a LinearScorer; anything else falls back to the sklearn calls.
+
+    Args:
+        model: Fitted classifier
+        scaler: Fitted scaler applied before the classifier
+
+    Returns:
+        LinearScorer or SklearnScorer
+    """
+    if not _is_foldable(model, scaler):
+        logger.info(f"Using sklearn scorer for {type(scaler).__name__} + {type(model).__name__}")
+        return SklearnScorer(model, scaler)
+
+    coef = model.coef_[0].astype(np.float64)
+    intercept = float(model.intercept_[0])
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros_like(coef)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones_like(coef)
+
+    # w . (x - mean) / scale + b  ==  (w / scale) . x + (b - (w / scale) . mean)
+    weights = coef / scale
+    bias = intercept - weights @ mean
+    logger.info(f"Folded StandardScaler + {type(model).__name__} into a linear scorer")
+    return LinearScorer(weights, bias, model.classes_)
@@ -0,0 +1,145 @@
+import os
+import gc
+import sys
+import logging
+import argparse
+
+from log_config import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Server settings, overridable through the environment
+BIND = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+WORKERS = int(os.environ.get('WEB_WORKERS', os.cpu_count() or 1))
+THREADS = int(os.environ.get('WEB_THREADS', 2))
+TIMEOUT = int(os.environ.get('WEB_TIMEOUT', 30))
+GRACEFUL_TIMEOUT = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+KEEPALIVE = int(os.environ.get('WEB_KEEPALIVE', 5))
+MAX_REQUESTS = int(os.environ.get('WEB_MAX_REQUESTS', 0))
+# Directory where workers add up their metrics (see app.render_metrics)
+METRICS_DIR = os.environ.get('METRICS_DIR')
+
+def load_app():
+    """
+    Import the app once, in the process that forks the workers.
+
+    The model, domain index and every other module-level object are built
+    here and inherited by the workers copy-on-write.
+
+    Returns:
+        The app module
+    """
+    import app as app_module
+
+    # Startup queries opened connections; each worker opens its own
+    app_module.db_pool.close_all()
+    if app_module.shared_metrics is not None:
+        # Totals start over with the server. What loading recorded is
+        # written once here and zeroed, so the workers do not each count it
+        app_module.shared_metrics.clear()
+        app_module.shared_metrics.write(gauges=False)
+        app_module.REGISTRY.reset()
+    # Keep the garbage collector away from everything loaded so far, so
+    # collections in the workers do not write to (and copy) those pages
+    gc.freeze()
+    return app_module
+
+def serve_gunicorn(app_module):
+    """Serve the app with gunicorn: a pre-forked worker per core, threaded for I/O."""
+    from gunicorn.app.base import BaseApplication
+
+    def post_fork(server, worker):
+        server.log.info(f"Worker {worker.pid} started")
+        app_module.watch_domain_index()
+        if app_module.shared_metrics is not None:
+            app_module.shared_metrics.start()
+
+    def worker_exit(server, worker):
+        # Write reports still queued in this worker before it goes away
+        app_module.report_queue.close()
+        if app_module.shared_metrics is not None:
+            app_module.shared_metrics.write()
+
+    options = {
+        'bind': BIND,
+        'workers': WORKERS,
+        'threads': THREADS,
+        # gthread workers honour keep-alive, sync workers do not
+        'worker_class': 'gthread',
+        'timeout': TIMEOUT,
+        'graceful_timeout': GRACEFUL_TIMEOUT,
+        'keepalive': KEEPALIVE,
+        'max_requests': MAX_REQUESTS,
+        'max_requests_jitter': MAX_REQUESTS // 10,
+        'preload_app': True,
+        'post_fork': post_fork,
+        'worker_exit': worker_exit,
+    }
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app_module.app
+
+    logger.info(f"Serving on {BIND} with gunicorn: {WORKERS} workers x {THREADS} threads")
+    Server().run()
+
+def serve_waitress(app_module):
+    """Serve the app with waitress (single process, threaded), e.g. on Windows."""
+    from waitress import serve
+
+    host, port = BIND.rsplit(':', 1)
+    threads = WORKERS * THREADS
+    logger.info(f"Serving on {BIND} with waitress: {threads} threads")
+    try:
+        # Idle keep-alive connections are closed after channel_timeout
+        serve(app_module.app, host=host, port=int(port), threads=threads, channel_timeout=TIMEOUT)
+    finally:
+        app_module.report_queue.close()
+
+def serve_hypercorn():
+    """
+    Serve the asyncio app (async_app.py) with hypercorn, one event loop per worker.
+
+    Workers are started fresh rather than forked, so each imports the app itself.
+    """
+    from hypercorn.config import Config
+    from hypercorn.run import run
+
+    config = Config()
+    config.application_path = 'async_app:app'
+    config.bind = [BIND]
+    config.workers = WORKERS
+    config.keep_alive_timeout = KEEPALIVE
+    config.graceful_timeout = GRACEFUL_TIMEOUT
+    config.accesslog = None
+    if METRICS_DIR:
+        # Workers import the app themselves; only stale files need clearing here
+        from metrics import SharedMetrics, REGISTRY
+        SharedMetrics(REGISTRY, METRICS_DIR).clear()
+    logger.info(f"Serving async app on {BIND} with hypercorn: {WORKERS} workers")
+    sys.exit(run(config))
+
+if __name__ == '__main__':
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Serve the phishing detection API")
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help="serve the asyncio app (needs quart, quart-cors and hypercorn)")
+    args = parser.parse_args()
+    if args.use_async:
+        serve_hypercorn()
+    try:
+        # gunicorn needs fork() and fcntl, which Windows lacks
+        import gunicorn.app.base  # noqa: F401
+        serve = serve_gunicorn
+    except ImportError:
+        try:
+            import waitress  # noqa: F401
+            serve = serve_waitress
+        except ImportError:
+            logger.error("Install gunicorn (Linux/macOS) or waitress (Windows) to serve the API")
+            sys.exit(1)
+    serve(load_app())
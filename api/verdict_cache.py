@@ -0,0 +1,160 @@
+import time
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# Ports that are implied by the scheme and dropped during normalization
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Schemes browsers parse with '\\' as a path separator (WHATWG URL standard)
+SPECIAL_SCHEMES = {'http', 'https', 'ws', 'wss', 'ftp', 'file'}
+
+def normalize_url(url):
+    """
+    Normalize a URL so equivalent spellings share one cache entry.
+
+    Lowercases the scheme and host, drops the port when it is the scheme's
+    default and strips the fragment. Path, query and user info are kept
+    as-is since they change the URL features. The host is the one a
+    browser would connect to: before the query, '\\' is read as '/', so
+    http://evil.com\\@google.com/ belongs to evil.com, not google.com.
+
+    Args:
+        url (str): URL to normalize
+
+    Returns:
+        tuple: (normalized URL, lowercase host)
+    """
+    url = url.strip()
+    scheme, sep, _ = url.partition(':')
+    if sep and '\\' in url and scheme.lower() in SPECIAL_SCHEMES:
+        end = min((i for i in (url.find('?'), url.find('#')) if i >= 0), default=len(url))
+        url = url[:end].replace('\\', '/') + url[end:]
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    host = parts.hostname or ''
+    try:
+        port = parts.port
+    except ValueError:
+        # Not a valid port; keep the netloc as written, apart from case
+        return urlunsplit((scheme, parts.netloc.lower(), parts.path, parts.query, '')), host
+
+    netloc = f'[{host}]' if ':' in host else host
+    if port is not None and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f'{netloc}:{port}'
+    userinfo, sep, _ = parts.netloc.rpartition('@')
+    if sep:
+        netloc = f'{userinfo}@{netloc}'
+    return urlunsplit((scheme, netloc, parts.path, parts.query, '')), host
+
+def url_key(url):
+    """
+    Key of a URL in phishing_reports and phishing_features.
+
+    Args:
+        url (str): URL as submitted
+
+    Returns:
+        tuple: (normalized URL, SHA-256 digest of it as 32 bytes)
+    """
+    try:
+        normalized = normalize_url(url)[0]
+    except ValueError:
+        # Unparseable URLs are keyed as written
+        normalized = url.strip()
+    return normalized, hashlib.sha256(normalized.encode('utf-8', 'surrogatepass')).digest()
+
+class VerdictCache:
+    """
+    Thread-safe LRU cache of verdicts with a time-to-live.
+
+    Entries are indexed by host as well, so every verdict for a domain can be
+    dropped at once when its reports change status.
+    """
+
+    def __init__(self, max_size=100000, ttl=600, clock=time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, host, value)
+        self._hosts = {}  # host -> set of keys
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= self._clock():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value, host=''):
+        """Store a value, evicting the least recently used entries if full."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (self._clock() + self.ttl, host, value)
+            self._hosts.setdefault(host, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_host(self, host):
+        """Drop every cached verdict for a host. Returns the number dropped."""
+        with self._lock:
+            keys = list(self._hosts.get(host, ()))
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self):
+        """Drop every cached verdict."""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._hosts.clear()
+
+    def stats(self):
+        """Return the cache counters as a dict."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+    def _remove(self, key):
+        """Remove a key from the entries and the host index (lock held)."""
+        _, host, _ = self._entries.pop(key)
+        keys = self._hosts.get(host)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._hosts[host]
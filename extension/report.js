@@ -13,18 +13,14 @@ document.addEventListener('DOMContentLoaded', () => {
   const reportUrl = params.get('url') || '';
   urlInput.value = reportUrl;
 
-  let screenshotData = null;
+  let screenshotFile = null;
   screenshotInput.addEventListener('change', (e) => {
     const file = e.target.files[0];
     if (file) {
       // Show file name instead of preview
       screenshotName.textContent = file.name;
       screenshotName.style.display = 'inline';
-      const reader = new FileReader();
-      reader.onload = (ev) => {
-        screenshotData = ev.target.result.split(',')[1];
-      };
-      reader.readAsDataURL(file);
+      screenshotFile = file;
     }
   });
 
@@ -36,16 +32,23 @@ document.addEventListener('DOMContentLoaded', () => {
     }
     statusDiv.textContent = 'Submitting...';
     try {
+      // Send the screenshot as raw bytes in a multipart body (no base64)
+      const form = new FormData();
+      form.append('url', reportUrl);
+      form.append('description', description);
+      if (screenshotFile) {
+        form.append('screenshot', screenshotFile, screenshotFile.name);
+      }
       const resp = await fetch('http://localhost:5000/report', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ url: reportUrl, description, screenshot: screenshotData })
+        body: form
       });
       const result = await resp.json();
       if (resp.ok) {
-        statusDiv.textContent = `Report submitted! ID: ${result.report_id}`;
+        // Reports are queued server-side; the ticket resolves to the report id once written
+        statusDiv.textContent = `Report submitted! Reference: ${result.ticket}`;
         // Trigger desktop notification via background script
-        chrome.runtime.sendMessage({ action: 'reportSuccess', reportId: result.report_id });
+        chrome.runtime.sendMessage({ action: 'reportSuccess', ticket: result.ticket });
       } else {
         statusDiv.textContent = `Error: ${result.error}`;
       }
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The API modules import each other as top-level modules, as when run from api/
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+REPO_DIR = os.path.dirname(API_DIR)
+sys.path.insert(0, API_DIR)
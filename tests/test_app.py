@@ -0,0 +1,20 @@
+import pytest
+
+import app as api
+
+@pytest.fixture
+def client():
+    api.verdict_cache.clear()
+    return api.app.test_client()
+
+def test_backslash_userinfo_is_not_allowlisted(client):
+    # Browsers go to evil.com; google.com is only in the path
+    response = client.post('/predict', json={'url': 'http://evil.com\\@google.com/login'})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data['result'], data['confidence']) != ('Legitimate', 1.0)
+
+def test_allowlisted_domain_skips_the_model(client):
+    response = client.post('/predict', json={'url': 'https://mail.google.com/'})
+    assert response.get_json()['result'] == 'Legitimate'
+    assert response.get_json()['confidence'] == 1.0
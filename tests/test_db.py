@@ -0,0 +1,115 @@
+import sqlite3
+import threading
+
+import pytest
+
+from db import ConnectionPool, PoolTimeout
+
+class MySQLLikeConnection:
+    """
+    SQLite connection that behaves like mysql-connector with autocommit off:
+    the first statement after a commit or rollback opens a transaction, and
+    reads inside it see the snapshot taken by the first read.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.closed = False
+
+    def cursor(self):
+        if not self._conn.in_transaction:
+            self._conn.execute("BEGIN")
+        return self._conn.cursor()
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self.closed = True
+        self._conn.close()
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'pool.db')
+    conn = sqlite3.connect(path)
+    # WAL gives readers a snapshot that concurrent commits do not change
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE reports (id INTEGER PRIMARY KEY, url TEXT)")
+    conn.commit()
+    conn.close()
+    return path
+
+def make_pool(db_path, **kwargs):
+    return ConnectionPool(lambda: MySQLLikeConnection(db_path), health_check=lambda conn: True, **kwargs)
+
+def count_reports(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM reports")
+    return cursor.fetchone()[0]
+
+def test_released_connection_sees_rows_committed_after_its_last_use(db_path):
+    pool = make_pool(db_path, size=1)
+    with pool.connection() as conn:
+        first = conn
+        assert count_reports(conn) == 0
+
+    writer = sqlite3.connect(db_path)
+    writer.execute("INSERT INTO reports (url) VALUES ('http://example.com/')")
+    writer.commit()
+    writer.close()
+
+    with pool.connection() as conn:
+        assert conn is first
+        assert count_reports(conn) == 1
+
+def test_connections_are_reused_and_bounded(db_path):
+    pool = make_pool(db_path, size=2, timeout=0.05)
+    with pool.connection() as a, pool.connection() as b:
+        assert a is not b
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
+    with pool.connection() as c:
+        assert c in (a, b)
+    stats = pool.stats()
+    assert stats['created'] == 2
+    assert stats['timeouts'] == 1
+    assert stats['in_use'] == 0
+
+def test_error_rolls_back_uncommitted_writes(db_path):
+    pool = make_pool(db_path, size=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.cursor().execute("INSERT INTO reports (url) VALUES ('http://example.com/')")
+            raise RuntimeError("handler failed")
+    with pool.connection() as conn:
+        assert count_reports(conn) == 0
+    assert pool.stats()['errors'] == 1
+
+def test_broken_connection_is_replaced(db_path):
+    pool = make_pool(db_path, size=1)
+    with pool.connection() as conn:
+        broken = conn
+        conn.close()
+    with pool.connection() as conn:
+        assert conn is not broken
+        assert count_reports(conn) == 0
+
+def test_waiters_get_a_released_connection(db_path):
+    pool = make_pool(db_path, size=1, timeout=5.0)
+    results = []
+
+    def wait():
+        with pool.connection() as conn:
+            results.append(conn is not None)
+
+    with pool.connection():
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        waiter.join(0.05)
+        assert waiter.is_alive()
+    waiter.join(5.0)
+    assert results == [True]
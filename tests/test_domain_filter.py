@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+import app as api
+from bloom_filter import BloomFilter
+from domain_filter import FilterSnapshot, encode_delta, apply_delta
+from domain_index import ALLOWED, BLOCKED
+from filter_client import FilterClient
+
+@pytest.fixture
+def snapshot():
+    return FilterSnapshot.build(['google.com'], ['evil.example'], ['http://bad.test/login'], 1e-3, 1e-6)
+
+def test_bloom_filter_round_trip():
+    bloom = BloomFilter.build([f'key{i}' for i in range(1000)], 1e-3)
+    copy, end = BloomFilter.from_bytes(bloom.to_bytes())
+    assert end == len(bloom.to_bytes())
+    assert all(f'key{i}' in copy for i in range(1000))
+    assert sum(f'other{i}' in copy for i in range(10000)) < 50
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://mail.google.com/', ALLOWED),
+    ('http://a.evil.example/', BLOCKED),
+    ('http://bad.test/login', BLOCKED),
+    ('http://bad.test/other', None),
+    ('http://evil.com\\@google.com/login', None),
+])
+def test_check(snapshot, url, expected):
+    assert snapshot.check(url) == expected
+    assert FilterSnapshot.from_bytes(snapshot.data).check(url) == expected
+
+def test_delta_reproduces_the_new_snapshot(snapshot):
+    new = FilterSnapshot.build(['google.com'], ['evil.example', 'worse.example'], [], 1e-3, 1e-6)
+    delta = encode_delta(snapshot, new)
+    assert len(delta) < len(new.data)
+    assert apply_delta(snapshot, delta).version == new.version
+    with pytest.raises(ValueError):
+        apply_delta(new, delta)
+
+@pytest.fixture
+def server():
+    api.verdict_cache.clear()
+    httpd = make_server('127.0.0.1', 0, api.app, threaded=True)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_port}'
+    httpd.shutdown()
+
+def test_client_refreshes_and_answers_allowlisted_urls_locally(server, tmp_path):
+    cache = str(tmp_path / 'filter.bin')
+    client = FilterClient(server, cache)
+    assert client.refresh() == 'full'
+    assert client.refresh() == 'unchanged'
+    assert FilterClient(server, cache).refresh() == 'unchanged'
+
+    result = client.predict('https://mail.google.com/')
+    assert (result['result'], result['source']) == ('Legitimate', 'filter')
+    assert client.stats()['server_calls'] == 0
+
+def test_client_sends_backslash_userinfo_to_the_server(server):
+    client = FilterClient(server)
+    client.refresh()
+    result = client.predict('http://evil.com\\@google.com/login')
+    assert result['source'] == 'server'
+    assert (result['result'], result['confidence']) != ('Legitimate', 1.0)
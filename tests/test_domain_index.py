@@ -0,0 +1,87 @@
+import time
+import threading
+
+import pytest
+
+from domain_index import DomainIndex, BLOCKED
+
+class SharedListings:
+    """Stands in for the phishing_reports and listing_version tables."""
+
+    def __init__(self):
+        self.urls = set()
+        self.version = 0
+        self.queries = 0
+
+    def block(self, url):
+        self.urls.add(url)
+        self.version += 1
+
+    def load_urls(self):
+        self.queries += 1
+        return set(self.urls)
+
+@pytest.fixture
+def lists(tmp_path):
+    allowlist = tmp_path / 'allowlist.txt'
+    allowlist.write_text("example.com\n")
+    blocklist = tmp_path / 'blocklist.txt'
+    blocklist.write_text("")
+    return str(allowlist), str(blocklist)
+
+def make_index(lists, shared):
+    return DomainIndex(*lists, url_source=shared.load_urls, version_source=lambda: shared.version,
+                       reload_interval=0)
+
+def test_blocked_urls_reach_other_workers(lists):
+    shared = SharedListings()
+    worker_a, worker_b = make_index(lists, shared), make_index(lists, shared)
+
+    # Worker A handles the status change; B only sees the new version
+    shared.block('http://example.com/login')
+    worker_a.block_url('http://example.com/login')
+    assert worker_b.lookup('example.com', 'http://example.com/login') != BLOCKED
+
+    assert worker_b.maybe_reload()
+    assert worker_b.lookup('example.com', 'http://example.com/login') == BLOCKED
+    assert worker_b.snapshot().blocked_urls == worker_a.snapshot().blocked_urls
+
+def test_unchanged_version_does_not_requery(lists):
+    shared = SharedListings()
+    index = make_index(lists, shared)
+    queries = shared.queries
+    assert not index.maybe_reload()
+    assert shared.queries == queries
+
+def test_failed_url_query_is_retried(lists):
+    shared = SharedListings()
+    index = make_index(lists, shared)
+    shared.block('http://example.com/login')
+    index.url_source = lambda: 1 / 0
+    assert index.maybe_reload()
+    assert index.lookup('example.com', 'http://example.com/login') != BLOCKED
+    index.url_source = shared.load_urls
+    assert index.maybe_reload()
+    assert index.lookup('example.com', 'http://example.com/login') == BLOCKED
+
+def test_watch_reloads_off_the_caller_thread(lists):
+    shared = SharedListings()
+    index = make_index(lists, shared)
+    index.reload_interval = 0.01
+    reloaded = threading.Event()
+    threads = threading.active_count()
+    index.watch(on_reload=reloaded.set)
+    index.watch(on_reload=reloaded.set)
+    assert threading.active_count() == threads + 1
+
+    # A hanging version query holds up the watcher, never a lookup
+    release = threading.Event()
+    index.version_source = lambda: release.wait() and shared.version
+    shared.block('http://example.com/login')
+    start = time.monotonic()
+    assert index.lookup('example.com', 'http://example.com/login') != BLOCKED
+    assert time.monotonic() - start < 0.1
+
+    release.set()
+    assert reloaded.wait(5)
+    assert index.lookup('example.com', 'http://example.com/login') == BLOCKED
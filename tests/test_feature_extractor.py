@@ -0,0 +1,68 @@
+import os
+import re
+from urllib.parse import urlparse
+
+import numpy as np
+import pytest
+
+from feature_extractor import extract_url_features, extract_url_features_many
+
+def baseline_features(url, domain=None):
+    """The original per-character extractor, kept as the reference."""
+    if domain is None:
+        domain = urlparse(url).netloc
+    features = []
+    features.append(len(url))
+    features.append(url.count('.'))
+    features.append(1 if 'https' in url else 0)
+    features.append(sum(1 for char in url if not char.isalnum() and char != '.'))
+    features.append(sum(c.isdigit() for c in url))
+    features.append(1 if any(c.isdigit() for c in domain) else 0)
+    features.append(len(domain))
+    features.append(domain.count('.'))
+    features.append(1 if 'bit.ly' in url or 'goo.gl' in url or 't.co' in url or 'tinyurl' in url else 0)
+    features.append(sum(1 for char in url if not char.isalnum() and char != '.') / len(url) if len(url) > 0 else 0)
+    features.append(domain.count('-'))
+    domain_without_tld = domain.split('.')
+    domain_words = re.split(r'[^a-zA-Z]', domain_without_tld[0]) if domain_without_tld else []
+    longest_word = max([len(word) for word in domain_words]) if domain_words else 0
+    features.append(longest_word)
+    features.append(1 if '@' in url else 0)
+    double_slash_position = url.find('//')
+    features.append(1 if double_slash_position > 7 or (double_slash_position > -1 and 'http' not in url[:double_slash_position]) else 0)
+    suspicious_tlds = ['.xyz', '.top', '.club', '.online', '.site']
+    features.append(1 if any(tld in domain for tld in suspicious_tlds) else 0)
+    return np.array(features).reshape(1, -1)
+
+PHISHING_LIST = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '1000-phishing.txt')
+
+def load_urls():
+    with open(PHISHING_LIST, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+# Inputs the phishing list does not cover
+EDGE_CASES = [
+    '', 'example.com', 'https://', 'http://192.168.0.1:8080/a', 'https://xn--bcher-kva.example/',
+    'https://bücher.example/ü?q=ß', 'http://user@evil.example//login', '//cdn.example.top/x',
+    'https://a-b-c.site/path//x', 'http://bit.ly/abc', 'ftp://files.example.club/', 'http://[::1]/',
+    'https://t.com/' + 'a' * 5000, 'http://example.com/٣٤',
+]
+
+@pytest.fixture(scope='module')
+def urls():
+    return load_urls() + EDGE_CASES
+
+def test_scalar_matches_baseline(urls):
+    for url in urls:
+        np.testing.assert_array_equal(extract_url_features(url), baseline_features(url), err_msg=url)
+
+def test_bulk_matches_baseline(urls):
+    expected = np.vstack([baseline_features(url) for url in urls])
+    np.testing.assert_array_equal(extract_url_features_many(urls), expected)
+    # Chunk boundaries must not change the result
+    np.testing.assert_array_equal(extract_url_features_many(urls, chunk_size=7), expected)
+
+def test_bulk_with_given_domains_matches_baseline(urls):
+    domains = [urlparse(url).netloc.upper() for url in urls]
+    expected = np.vstack([baseline_features(url, domain) for url, domain in zip(urls, domains)])
+    np.testing.assert_array_equal(extract_url_features_many(urls, domains), expected)
@@ -0,0 +1,47 @@
+import feature_loader
+from feature_loader import load_features, MAX_URL_LENGTH
+
+class FeatureTable:
+    """Stands in for a mysql-connector connection to phishing_features, keyed by url_hash."""
+
+    def __init__(self, stored=()):
+        self.hashes = set(stored)
+        self._rows = []
+        self.rowcount = 0
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        # Existence lookups pass the hashes; the schema check passes nothing
+        self._rows = [(h,) for h in params or () if h in self.hashes]
+
+    def executemany(self, query, rows):
+        # INSERT IGNORE: a hash already present is not inserted again
+        new = {row[2] for row in rows} - self.hashes
+        self.hashes |= new
+        self.rowcount = len(new)
+
+    def fetchall(self):
+        return self._rows
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+def test_counts_add_up_to_urls_read(tmp_path, monkeypatch):
+    path = tmp_path / 'urls.txt'
+    path.write_text("http://a.example/\nhttp://b.example/\nhttp://a.example/\n"
+                    f"http://c.example/{'x' * MAX_URL_LENGTH}\nhttp://stored.example/\n")
+    table = FeatureTable({feature_loader.url_key('http://stored.example/')[1]})
+    monkeypatch.setattr(feature_loader.mysql.connector, 'connect', lambda **config: table)
+
+    counts = load_features([str(path)], workers=1)
+    assert counts['read'] == 5
+    assert counts['inserted'] == 2
+    # The repeated a.example and the stored URL
+    assert counts['skipped'] == 2
+    assert counts['too_long'] == 1
+    assert counts['inserted'] + counts['skipped'] + counts['too_long'] == counts['read']
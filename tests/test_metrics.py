@@ -0,0 +1,83 @@
+import threading
+
+from metrics import Registry, SharedMetrics, StatsGauges
+
+def make_registry(stats=None):
+    registry = Registry()
+    requests = registry.counter('requests', "Requests", ('verdict',))
+    latency = registry.histogram('latency_seconds', "Latency", buckets=(0.1, 1.0))
+    registry.register(StatsGauges('app', lambda: stats or {'pool': {'in_use': 1}}))
+    return registry, requests, latency
+
+def test_counter_is_exact_under_concurrent_increments():
+    registry, requests, _ = make_registry()
+    child = requests.labels('Phishing')
+
+    def work():
+        for _ in range(10000):
+            child.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert child.value == 80000
+    assert 'requests_total{verdict="Phishing"} 80000' in registry.render()
+
+def test_histogram_renders_cumulative_buckets():
+    registry, _, latency = make_registry()
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value)
+    text = registry.render()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1.0"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert 'latency_seconds_count 3' in text
+
+def test_reset_keeps_children_usable():
+    registry, requests, latency = make_registry()
+    child = requests.labels('Phishing')
+    child.inc(5)
+    latency.observe(0.5)
+    registry.reset()
+    child.inc()
+    assert 'requests_total{verdict="Phishing"} 1' in registry.render()
+    assert 'latency_seconds_count 0' in registry.render()
+
+def test_shared_metrics_add_up_workers(tmp_path):
+    # Two registries stand in for two worker processes sharing the directory
+    worker_a, requests_a, latency_a = make_registry()
+    worker_b, requests_b, latency_b = make_registry()
+    shared_a = SharedMetrics(worker_a, str(tmp_path))
+    shared_b = SharedMetrics(worker_b, str(tmp_path))
+
+    requests_a.labels('Phishing').inc(3)
+    latency_a.observe(0.05)
+    requests_b.labels('Phishing').inc(4)
+    requests_b.labels('Legitimate').inc()
+    latency_b.observe(5.0)
+    shared_b.write()
+
+    text = shared_a.render()
+    assert 'requests_total{verdict="Phishing"} 7' in text
+    assert 'requests_total{verdict="Legitimate"} 1' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_count 2' in text
+    # Each worker's gauges are kept apart, under one TYPE line
+    assert text.count('# TYPE app_pool_in_use gauge') == 1
+    assert text.count('app_pool_in_use{pid=') == 2
+    assert shared_b.render() == text
+
+def test_shared_metrics_keep_totals_of_exited_workers(tmp_path):
+    worker_a, requests_a, _ = make_registry()
+    worker_b, requests_b, _ = make_registry()
+    shared_a = SharedMetrics(worker_a, str(tmp_path))
+    requests_b.labels('Phishing').inc(2)
+    SharedMetrics(worker_b, str(tmp_path)).write()
+    del worker_b, requests_b
+
+    requests_a.labels('Phishing').inc()
+    assert 'requests_total{verdict="Phishing"} 3' in shared_a.render()
+    shared_a.clear()
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+from concurrent.futures import Future, TimeoutError
+
+import pytest
+
+from micro_batcher import MicroBatcher, BatcherClosed
+
+def test_concurrent_items_share_a_batch():
+    calls = []
+    batcher = MicroBatcher(lambda items: calls.append(list(items)) or [i * 2 for i in items],
+                           max_batch_size=8, max_wait=0.2)
+    futures = [batcher.submit(i) for i in range(5)]
+    assert [f.result(5) for f in futures] == [0, 2, 4, 6, 8]
+    assert calls == [[0, 1, 2, 3, 4]]
+    stats = batcher.stats()
+    assert (stats['batches'], stats['items']) == (1, 5)
+    assert '_batch_size_bucket{le="8.0"} 1' in '\n'.join(batcher.batch_sizes.render())
+    batcher.close()
+
+def test_submit_after_close_raises():
+    batcher = MicroBatcher(lambda items: items)
+    assert batcher(1) == 1
+    batcher.close()
+    with pytest.raises(BatcherClosed):
+        batcher.submit(2)
+
+def test_close_fails_items_it_could_not_run():
+    release = threading.Event()
+
+    def slow(items):
+        release.wait(5)
+        return items
+
+    batcher = MicroBatcher(slow, max_batch_size=1, max_wait=0)
+    running = batcher.submit('first')
+    waiting = batcher.submit('second')
+    batcher.close(timeout=0.1)
+    with pytest.raises(BatcherClosed):
+        waiting.result(1)
+    release.set()
+    assert running.result(5) == 'first'
+
+def test_call_times_out():
+    release = threading.Event()
+    batcher = MicroBatcher(lambda items: release.wait(5) and items, result_timeout=0.05)
+    with pytest.raises(TimeoutError):
+        batcher('item')
+    release.set()
+    batcher.close()
+
+def test_lane_rejects_before_submitting():
+    from async_app import Lane, Busy
+
+    lane = Lane('test', workers=1, backlog=0)
+    submitted = []
+    blocker = Future()
+
+    def submit(item):
+        submitted.append(item)
+        return blocker if item == 'first' else Future()
+
+    async def scenario():
+        first = asyncio.ensure_future(lane.wait(submit, 'first'))
+        await asyncio.sleep(0)
+        with pytest.raises(Busy):
+            await lane.wait(submit, 'second')
+        blocker.set_result('done')
+        return await first
+
+    assert asyncio.run(scenario()) == 'done'
+    assert submitted == ['first']
+    lane.shutdown()
@@ -0,0 +1,14 @@
+import os
+
+import model_registry
+from model_registry import model_available, LEGACY_MODEL_PATHS
+
+def test_model_available_finds_root_model_files(tmp_path):
+    # An empty registry still has the repository-root model.pkl/scaler.pkl to import
+    assert os.path.exists(LEGACY_MODEL_PATHS[1][0])
+    assert model_available(str(tmp_path / 'models'))
+
+def test_model_available_false_without_any_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, 'LEGACY_MODEL_PATHS',
+                        [(str(tmp_path / 'model.pkl'), str(tmp_path / 'scaler.pkl'))])
+    assert not model_available(str(tmp_path / 'models'))
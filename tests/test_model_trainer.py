@@ -0,0 +1,42 @@
+import os
+
+import pytest
+
+from model_trainer import parse_source, iter_source_chunks, PHISHING, LEGITIMATE
+
+PHISHING_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'phishing-urls.csv')
+
+def read_labels(path, label):
+    return [l for _, labels, _ in iter_source_chunks(path, label) for l in labels]
+
+@pytest.mark.parametrize('spec, expected', [
+    ('urls.txt:phishing', ('urls.txt', PHISHING)),
+    ('urls.txt:Legitimate', ('urls.txt', LEGITIMATE)),
+    ('data.csv:1=phishing', ('data.csv', {'1': PHISHING, '0': LEGITIMATE})),
+    ('data.csv:0=phishing', ('data.csv', {'0': PHISHING, '1': LEGITIMATE})),
+    ('data.csv:1=legitimate', ('data.csv', {'1': LEGITIMATE, '0': PHISHING})),
+    ('C:\\data\\urls.csv', ('C:\\data\\urls.csv', None)),
+    # Bare numbers are no longer a class name
+    ('data.csv:1', ('data.csv:1', None)),
+])
+def test_parse_source(spec, expected):
+    assert parse_source(spec) == expected
+
+def test_unknown_class_is_rejected():
+    with pytest.raises(ValueError):
+        parse_source('data.csv:1=spam')
+
+def test_numeric_label_column_needs_its_meaning():
+    with pytest.raises(ValueError, match='1=phishing'):
+        read_labels(PHISHING_CSV, None)
+
+def test_phishing_csv_label_one_is_phishing():
+    path, label = parse_source(PHISHING_CSV + ':1=phishing')
+    labels = read_labels(path, label)
+    assert len(labels) == 998
+    assert set(labels) == {PHISHING}
+
+def test_named_label_column(tmp_path):
+    path = tmp_path / 'mixed.csv'
+    path.write_text("url,label\nhttp://a.example/,phishing\nhttps://b.example/,Legitimate\n")
+    assert read_labels(str(path), None) == [PHISHING, LEGITIMATE]
@@ -0,0 +1,51 @@
+import time
+from contextlib import contextmanager
+
+from report_queue import ReportQueue, new_ticket, ticket_age, QUEUED, STORED
+
+class TicketTable:
+    """Stands in for the pool; report_tickets rows are ticket -> (report id, report_count)."""
+
+    def __init__(self):
+        self.rows = {}
+        self.lookups = 0
+
+    @contextmanager
+    def connection(self):
+        yield self
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params):
+        self.lookups += 1
+        self._row = self.rows.get(params[0])
+
+    def fetchone(self):
+        return self._row
+
+    def close(self):
+        pass
+
+def test_tickets_carry_their_issue_time():
+    ticket = new_ticket()
+    assert len(ticket) == 32
+    assert 0 <= ticket_age(ticket) < 1
+    assert ticket_age('not-a-ticket') is None
+    assert ticket_age(ticket.upper()) is None
+
+def test_ticket_queued_in_another_worker_is_not_unknown():
+    table = TicketTable()
+    # Issued by another worker's queue: this one has never seen it
+    ticket = new_ticket()
+    assert ReportQueue(table).status(ticket) == {'status': QUEUED}
+
+    table.rows[ticket] = (7, 2)
+    assert ReportQueue(table).status(ticket) == {'status': STORED, 'report_id': 7, 'report_count': 2}
+
+def test_old_or_malformed_tickets_are_unknown():
+    table = TicketTable()
+    old = f"{int((time.time() - 600) * 1000):012x}" + '0' * 20
+    assert ReportQueue(table, ticket_ttl=300).status(old) is None
+    assert ReportQueue(table).status('../../etc') is None
+    assert table.lookups == 1
@@ -0,0 +1,70 @@
+import io
+import os
+import pickle
+
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+
+from feature_extractor import extract_url_features_many
+from scorer import LinearScorer, SklearnScorer, build_scorer, save_linear_scorer, load_linear_scorer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_URLS = [
+    'https://www.google.com/', 'https://github.com/login', 'http://192.168.1.10/admin.php',
+    'http://paypal.com.secure-login.xyz/verify', 'http://bit.ly/3abc', 'https://en.wikipedia.org/wiki/Phishing',
+    'http://user@evil.example//account/update?id=42', '',
+]
+
+def load_pickle(name):
+    with open(os.path.join(REPO_DIR, name), 'rb') as f:
+        return pickle.load(f)
+
+@pytest.fixture(scope='module')
+def shipped():
+    return load_pickle('model.pkl'), load_pickle('scaler.pkl')
+
+@pytest.fixture(scope='module')
+def features():
+    with open(os.path.join(REPO_DIR, '1000-phishing.txt'), encoding='utf-8') as f:
+        urls = [line.strip() for line in f if line.strip()]
+    return extract_url_features_many(urls + SAMPLE_URLS)
+
+def sklearn_predictions(model, scaler, features):
+    scaled = scaler.transform(features)
+    labels = model.predict(scaled)
+    proba = model.predict_proba(scaled)
+    return labels, proba[np.arange(len(labels)), np.searchsorted(model.classes_, labels)]
+
+def test_shipped_model_folds_into_a_linear_scorer(shipped, features):
+    model, scaler = shipped
+    scorer = build_scorer(model, scaler)
+    assert isinstance(scorer, LinearScorer)
+
+    labels, confidence = scorer.predict(features)
+    expected_labels, expected_confidence = sklearn_predictions(model, scaler, features)
+    np.testing.assert_array_equal(labels, expected_labels)
+    np.testing.assert_allclose(confidence, expected_confidence, rtol=0, atol=1e-9)
+
+def test_linear_scorer_survives_npz_round_trip(shipped, features):
+    scorer = build_scorer(*shipped)
+    buffer = io.BytesIO()
+    save_linear_scorer(scorer, buffer, {'notes': 'test'})
+    buffer.seek(0)
+    loaded, header = load_linear_scorer(buffer)
+    assert header['notes'] == 'test'
+    for got, expected in zip(loaded.predict(features), scorer.predict(features)):
+        np.testing.assert_array_equal(got, expected)
+
+def test_unfoldable_model_falls_back_to_sklearn(shipped, features):
+    _, scaler = shipped
+    labels = np.arange(len(features)) % 2
+    model = DecisionTreeClassifier(max_depth=3, random_state=0).fit(scaler.transform(features), labels)
+    scorer = build_scorer(model, scaler)
+    assert isinstance(scorer, SklearnScorer)
+
+    got_labels, got_confidence = scorer.predict(features)
+    expected_labels, expected_confidence = sklearn_predictions(model, scaler, features)
+    np.testing.assert_array_equal(got_labels, expected_labels)
+    np.testing.assert_allclose(got_confidence, expected_confidence, rtol=0, atol=1e-9)
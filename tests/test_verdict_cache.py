@@ -0,0 +1,46 @@
+import pytest
+
+from verdict_cache import VerdictCache, normalize_url
+from domain_index import DomainIndex, ALLOWED, BLOCKED
+
+@pytest.mark.parametrize('url, expected', [
+    ('HTTP://Example.COM:80/a?b=1#frag', ('http://example.com/a?b=1', 'example.com')),
+    ('https://example.com:8443/', ('https://example.com:8443/', 'example.com')),
+    ('http://user@Example.com/', ('http://user@example.com/', 'example.com')),
+    # Browsers read '\' as '/' before the query, so the host is evil.com
+    ('http://evil.com\\@google.com/login', ('http://evil.com/@google.com/login', 'evil.com')),
+    ('https://example.com\\a\\b?q=\\x', ('https://example.com/a/b?q=\\x', 'example.com')),
+    ('http://google.com@evil.com/', ('http://google.com@evil.com/', 'evil.com')),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+@pytest.fixture
+def index(tmp_path):
+    allowlist = tmp_path / 'allowlist.txt'
+    allowlist.write_text("google.com\n")
+    blocklist = tmp_path / 'blocklist.txt'
+    blocklist.write_text("evil.example\n")
+    return DomainIndex(str(allowlist), str(blocklist), reload_interval=0)
+
+@pytest.mark.parametrize('url, expected', [
+    ('https://mail.google.com/', ALLOWED),
+    ('http://login.evil.example/', BLOCKED),
+    ('http://evil.com\\@google.com/login', None),
+    ('http://google.com\\@evil.example/', ALLOWED),
+    ('http://google.com.evil.com/', None),
+])
+def test_lookup_uses_the_host_a_browser_would(index, url, expected):
+    normalized_url, host = normalize_url(url)
+    assert index.lookup(host, normalized_url) == expected
+
+def test_cache_expires_and_invalidates_by_host():
+    now = [0.0]
+    cache = VerdictCache(max_size=2, ttl=10, clock=lambda: now[0])
+    cache.put('http://a.com/', ('Phishing', 0.9), 'a.com')
+    cache.put('http://b.com/', ('Legitimate', 0.8), 'b.com')
+    assert cache.get('http://a.com/') == ('Phishing', 0.9)
+    assert cache.invalidate_host('a.com') == 1
+    assert cache.get('http://a.com/') is None
+    now[0] = 11.0
+    assert cache.get('http://b.com/') is None
@@ -27,11 +27,21 @@ DROP TABLE IF EXISTS `phishing_reports`;
 CREATE TABLE `phishing_reports` (
   `id` int NOT NULL AUTO_INCREMENT,
   `url` text NOT NULL,
+  `normalized_url` text,
+  `url_hash` binary(32) DEFAULT NULL,
   `description` text,
   `screenshot` LONGBLOB,
+  `screenshot_hash` char(64) DEFAULT NULL,
   `reported_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `last_reported_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  `report_count` int NOT NULL DEFAULT 1,
   `status` enum('Pending','Verified','Blacklisted') DEFAULT 'Pending',
-  PRIMARY KEY (`id`)
+  `domain` varchar(255) GENERATED ALWAYS AS (LEFT(REGEXP_REPLACE(REGEXP_REPLACE(REGEXP_REPLACE(LOWER(`url`), '^https?://(www\\.)?', ''), '/.*$', ''), '^[^/]*@', ''), 255)) STORED,
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_url_hash` (`url_hash`),
+  KEY `idx_reported_at` (`reported_at`,`id`),
+  KEY `idx_status_reported_at` (`status`,`reported_at`,`id`),
+  KEY `idx_domain_reported_at` (`domain`,`reported_at`,`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -43,6 +53,37 @@ LOCK TABLES `phishing_reports` WRITE;
 /*!40000 ALTER TABLE `phishing_reports` DISABLE KEYS */;
 /*!40000 ALTER TABLE `phishing_reports` ENABLE KEYS */;
 UNLOCK TABLES;
+
+--
+-- Table structure for table `report_tickets`
+--
+
+DROP TABLE IF EXISTS `report_tickets`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `report_tickets` (
+  `ticket` char(32) NOT NULL,
+  `url_hash` binary(32) NOT NULL,
+  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`ticket`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Table structure for table `listing_version`
+--
+
+DROP TABLE IF EXISTS `listing_version`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!50503 SET character_set_client = utf8mb4 */;
+CREATE TABLE `listing_version` (
+  `id` tinyint NOT NULL,
+  `version` bigint NOT NULL DEFAULT '0',
+  PRIMARY KEY (`id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+INSERT INTO `listing_version` (`id`, `version`) VALUES (1, 0);
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
@@ -58,11 +99,14 @@ UNLOCK TABLES;
 -- Drop existing tables if they exist
 DROP TABLE IF EXISTS `phishing_features`;
 DROP TABLE IF EXISTS `domain_analysis`;
+DROP TABLE IF EXISTS `domain_analysis_watermark`;
 
 -- Create optimized phishing_features table
 CREATE TABLE `phishing_features` (
   `id` int NOT NULL AUTO_INCREMENT,
   `url` varchar(2048) NOT NULL,
+  `normalized_url` varchar(2048) DEFAULT NULL,
+  `url_hash` binary(32) DEFAULT NULL,
   `url_length` int NOT NULL,
   `num_dots` int NOT NULL,
   `uses_https` tinyint(1) NOT NULL,
@@ -88,6 +132,7 @@ CREATE TABLE `phishing_features` (
     )
   ) STORED,
   PRIMARY KEY (`id`),
+  UNIQUE KEY `uq_url_hash` (`url_hash`),
   KEY `idx_domain` (`domain`),
   KEY `idx_has_ip` (`has_ip`),
   KEY `idx_suspicious_tld` (`suspicious_tld`),
@@ -97,12 +142,16 @@ CREATE TABLE `phishing_features` (
   FULLTEXT KEY `idx_url_fulltext` (`url`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
--- Create a domain analysis table for aggregated statistics
+-- Create a domain analysis table for aggregated statistics, kept as
+-- running sums so new feature rows can be added without a rebuild
 CREATE TABLE `domain_analysis` (
   `domain` varchar(255) NOT NULL,
   `total_urls` int NOT NULL DEFAULT 0,
   `suspicious_count` int NOT NULL DEFAULT 0,
-  `avg_obfuscation_ratio` float NOT NULL DEFAULT 0,
+  `obfuscation_ratio_sum` double NOT NULL DEFAULT 0,
+  `avg_obfuscation_ratio` float GENERATED ALWAYS AS (
+    obfuscation_ratio_sum / total_urls
+  ) STORED,
   `last_seen` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
   `risk_score` float GENERATED ALWAYS AS (
     (suspicious_count / total_urls) * 100
@@ -111,6 +160,16 @@ CREATE TABLE `domain_analysis` (
   KEY `idx_risk_score` (`risk_score`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
 
+-- Last phishing_features id folded into domain_analysis; NULL forces a rebuild
+CREATE TABLE `domain_analysis_watermark` (
+  `job` varchar(64) NOT NULL,
+  `last_id` int NULL,
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (`job`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci;
+
+INSERT INTO `domain_analysis_watermark` (`job`, `last_id`) VALUES ('domain_analysis', 0);
+
 -- Create a view for high-risk URLs
 CREATE OR REPLACE VIEW `high_risk_urls` AS
 SELECT 
@@ -148,6 +207,7 @@ SELECT
   pf.obfuscation_ratio,
   da.risk_score,
   pr.id AS report_id,
+  pr.report_count,
   pr.description,
   pr.reported_at,
   pr.status
@@ -156,39 +216,72 @@ FROM
 JOIN 
   `domain_analysis` da ON pf.domain = da.domain
 LEFT JOIN 
-  `phishing_reports` pr ON pf.url = pr.url
+  `phishing_reports` pr ON pf.url_hash = pr.url_hash
 ORDER BY 
   pr.reported_at DESC,
   da.risk_score DESC;
 
--- Create stored procedure for updating domain analysis
-DELIMITER //
+-- Create stored procedure for updating domain analysis: adds the feature
+-- rows past the watermark to the running sums in one transaction, or
+-- rebuilds the table when the watermark is NULL. It takes the id horizon
+-- first and waits for inserts that already hold a lower id to write their
+-- row; the locking read of the whole range then waits for any of them
+-- still uncommitted, so no row is passed over by the watermark.
+-- api/domain_analysis.py locks its ranges the same way, but adds rows in
+-- one transaction per batch and also rebuilds on request (--rebuild).
 DROP PROCEDURE IF EXISTS update_domain_analysis;
+DELIMITER //
 CREATE PROCEDURE update_domain_analysis()
 BEGIN
-  TRUNCATE TABLE domain_analysis;
-  INSERT INTO domain_analysis (domain, total_urls, suspicious_count, avg_obfuscation_ratio, last_seen)
-  SELECT 
-    domain,
-    COUNT(*) AS total_urls,
-    SUM(CASE WHEN has_ip = 1 OR suspicious_tld = 1 OR has_at_symbol = 1 OR is_shortened = 1 THEN 1 ELSE 0 END) AS suspicious_count,
-    AVG(obfuscation_ratio) AS avg_obfuscation_ratio,
-    NOW() AS last_seen
-  FROM 
-    phishing_features
-  GROUP BY 
-    domain;
-  SET @log_message = CONCAT('Domain analysis updated with ', (SELECT COUNT(*) FROM domain_analysis), ' domains');
+  DECLARE v_last_id INT;
+  DECLARE v_horizon INT;
+  DECLARE v_rows INT;
+  INSERT IGNORE INTO domain_analysis_watermark (job, last_id) VALUES ('domain_analysis', NULL);
+  SELECT COALESCE(MAX(id), 0) INTO v_horizon FROM phishing_features;
+  DO SLEEP(2);
+  START TRANSACTION;
+  SELECT last_id INTO v_last_id FROM domain_analysis_watermark
+  WHERE job = 'domain_analysis' FOR UPDATE;
+  IF v_last_id IS NULL THEN
+    DELETE FROM domain_analysis;
+    SET v_last_id = 0;
+  END IF;
+  SELECT COUNT(*) INTO v_rows FROM phishing_features
+  WHERE id > v_last_id AND id <= v_horizon FOR SHARE;
+  IF v_rows > 0 THEN
+    INSERT INTO domain_analysis (domain, total_urls, suspicious_count, obfuscation_ratio_sum, last_seen)
+    SELECT * FROM (
+      SELECT 
+        domain,
+        COUNT(*) AS urls,
+        SUM(CASE WHEN has_ip = 1 OR suspicious_tld = 1 OR has_at_symbol = 1 OR is_shortened = 1 THEN 1 ELSE 0 END) AS suspicious,
+        SUM(obfuscation_ratio) AS obfuscation,
+        NOW() AS seen
+      FROM 
+        phishing_features
+      WHERE 
+        id > v_last_id AND id <= v_horizon
+      GROUP BY 
+        domain
+    ) AS batch
+    ON DUPLICATE KEY UPDATE
+      total_urls = total_urls + batch.urls,
+      suspicious_count = suspicious_count + batch.suspicious,
+      obfuscation_ratio_sum = obfuscation_ratio_sum + batch.obfuscation,
+      last_seen = batch.seen;
+  END IF;
+  UPDATE domain_analysis_watermark SET last_id = GREATEST(v_last_id, v_horizon)
+  WHERE job = 'domain_analysis';
+  COMMIT;
+  SET @log_message = CONCAT('Domain analysis updated with ', v_rows, ' feature rows up to ', GREATEST(v_last_id, v_horizon));
 END //
 DELIMITER ;
 
--- Load data from CSV files into tables (adjust file paths as needed)
-LOAD DATA LOCAL INFILE 'phishing-urls.csv'
-INTO TABLE phishing_features
-FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
-LINES TERMINATED BY '\n'
-IGNORE 1 LINES
-(url, url_length, num_dots, uses_https, num_special_chars, num_digits, has_ip, domain_length, num_subdomains, is_shortened, obfuscation_ratio, num_hyphens, longest_word, has_at_symbol, has_double_slash, suspicious_tld);
+-- Load phishing_features from URL lists or CSV files (phishing-urls.csv
+-- holds Protocol/Domain/Path, not features); the loader computes the
+-- features the API uses and skips URLs already stored:
+--   python api/feature_loader.py phishing-urls.csv 1000-phishing.txt
 
 -- Removed CSV import for domain_analysis; use stored procedure instead
 -- After import, run: CALL update_domain_analysis();
+-- or keep it current with: python api/domain_analysis.py --interval 60